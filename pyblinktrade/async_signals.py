@@ -0,0 +1,150 @@
+import sys
+import asyncio
+import inspect
+from concurrent.futures import Future
+from timeit import default_timer as _timer
+
+from pyblinktrade.signals import Signal
+
+class AsyncSignal(Signal):
+  """
+  Signal for asyncio code. Slots are connected exactly like Signal slots, with
+  the same weak references and per-sender subscriptions, but can be coroutine
+  functions or coroutine methods.
+
+  Emitting calls every slot and runs the returned coroutines concurrently on
+  the event loop. signal(sender, data) returns a future which resolves to
+  True once all of them finished and at least one succeeded, and
+  signal.fire(sender, data) does the same without waiting. A slot which
+  doesn't finish within timeout seconds is cancelled and reported as an error,
+  through the same error channel as Signal slots.
+
+  Slot coroutines run on loop, or on the running event loop when the signal
+  has no loop; emitting outside a running loop then raises RuntimeError.
+  """
+  def __init__(self, timeout=None, loop=None):
+    Signal.__init__(self)
+    self.timeout = timeout
+    self.loop = loop
+    # keeps fire and forget emits alive until they finish
+    self._pending = set()
+
+  def __call__(self, sender, data=None, error_signal_on_error=True, timeout=None):
+    return self.emit(sender, data, error_signal_on_error, timeout)
+
+  def emit(self, sender, data=None, error_signal_on_error=True, timeout=None):
+    return self._emit(sender, (data,), False, error_signal_on_error, timeout)
+
+  def emit_many(self, sender, items, error_signal_on_error=True, timeout=None):
+    """
+    Emits every item of a list, like Signal.emit_many, and returns a future
+    like emit. Slots decorated with batch_slot are called once with the list.
+    """
+    return self._emit(sender, items, True, error_signal_on_error, timeout)
+
+  def _emit(self, sender, items, batched, error_signal_on_error, timeout):
+    if timeout is None:
+      timeout = self.timeout
+    loop = self._get_loop()
+    profiler = self._profiler
+
+    sent = False
+    slots = []
+    tasks = []
+    errors = []
+    # batch slots aren't called with an empty list, as in Signal.emit_many
+    batch = (items,) if items else ()
+    for ref, func in self._slots(sender):
+      target = ref()
+      if target is None:
+        continue
+      calls = batch if batched and getattr(target if func is None else func, 'signal_batch', False) else items
+
+      for data in calls:
+        start = _timer()
+        try:
+          result = target(sender, data) if func is None else func(target, sender, data)
+        # pylint: disable=W0702
+        except:
+          errors.append((target, func, sys.exc_info()))
+          if profiler is not None:
+            profiler.record(self, target, func, sender, _timer() - start)
+          continue
+
+        if inspect.isawaitable(result):
+          if timeout is not None:
+            result = asyncio.wait_for(result, timeout)
+          task = asyncio.ensure_future(result, loop=loop)
+          if profiler is not None:
+            # timed until the coroutine finished
+            task.add_done_callback(lambda task, target=target, func=func, start=start:
+                                   profiler.record(self, target, func, sender, _timer() - start))
+          slots.append((target, func))
+          tasks.append(task)
+        else:
+          sent = True
+          if profiler is not None:
+            profiler.record(self, target, func, sender, _timer() - start)
+    if errors:
+      self._slots_failed(sender, errors, error_signal_on_error)
+
+    done = loop.create_future()
+    if not tasks:
+      done.set_result(sent)
+      return done
+
+    def on_slots_done(gathered):
+      self._pending.discard(gathered)
+      succeeded = sent
+      errors = []
+      for (target, func), outcome in zip(slots, gathered.result()):
+        if isinstance(outcome, BaseException):
+          errors.append((target, func, (type(outcome), outcome, outcome.__traceback__)))
+        else:
+          succeeded = True
+          if self._failing_slots:
+            self._slot_succeeded(target, func)
+      if errors:
+        self._slots_failed(sender, errors, error_signal_on_error)
+      if not done.done():
+        done.set_result(succeeded)
+
+    gathered = asyncio.gather(*tasks, return_exceptions=True)
+    self._pending.add(gathered)
+    gathered.add_done_callback(on_slots_done)
+    return done
+
+  def submit(self, sender, data=None, error_signal_on_error=True, executor=None):
+    """
+    Emits the signal on its loop from any thread, returning a
+    concurrent.futures.Future which resolves once the slots finished. Slots
+    run on the event loop, so there is no executor to submit them to.
+    """
+    if executor is not None:
+      raise TypeError('AsyncSignal slots run on the event loop, not on an executor')
+    loop = self._get_loop()
+    future = Future()
+
+    def start():
+      if not future.set_running_or_notify_cancel():
+        return
+      try:
+        done = self.emit(sender, data, error_signal_on_error)
+      except Exception as e:
+        future.set_exception(e)
+        return
+      done.add_done_callback(lambda done: future.set_result(done.result()))
+
+    loop.call_soon_threadsafe(start)
+    return future
+
+  def _get_loop(self):
+    if self.loop is not None:
+      return self.loop
+    try:
+      return asyncio.get_running_loop()
+    except RuntimeError:
+      raise RuntimeError('AsyncSignal emitted outside a running event loop, create it with a loop')
+
+  def fire(self, sender, data=None, error_signal_on_error=True, timeout=None):
+    self.emit(sender, data, error_signal_on_error, timeout)
@@ -0,0 +1,53 @@
+# Runs the benchmark suite and compares it against a saved baseline.
+#
+#   python -m pyblinktrade.bench -o results.json
+#   python -m pyblinktrade.bench -b results.json -k '^signal\.'
+import sys
+import json
+import argparse
+
+from pyblinktrade.bench import suite
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m pyblinktrade.bench')
+  parser.add_argument('-k', '--pattern', help='only run benchmarks matching this regular expression')
+  parser.add_argument('-o', '--output', help='write the results as json to this file')
+  parser.add_argument('-b', '--baseline', help='compare the results against this json file')
+  parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                      help='slowdown ratio reported as a regression (default: 0.1)')
+  parser.add_argument('-r', '--repeat', type=int, default=5)
+  parser.add_argument('--min-time', type=float, default=0.05, help='minimum duration of each run in seconds')
+  parser.add_argument('-l', '--list', action='store_true', help='list the benchmarks and exit')
+  args = parser.parse_args(argv)
+
+  if args.list:
+    for name in suite.load():
+      print(name)
+    return 0
+
+  def progress(name, seconds):
+    sys.stderr.write('%-60s %12.3f us\n' % (name, seconds * 1e6))
+
+  results = suite.run(args.pattern, args.repeat, args.min_time, progress)
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
+  else:
+    print(json.dumps(results, indent=2))
+
+  if not args.baseline:
+    return 0
+
+  with open(args.baseline) as f:
+    baseline = json.load(f)
+
+  regressions = 0
+  sys.stderr.write('\n%-60s %12s %12s %8s\n' % ('benchmark', 'baseline us', 'current us', 'ratio'))
+  for name, base, seconds, ratio, regressed in suite.compare(results, baseline, args.threshold):
+    sys.stderr.write('%-60s %12.3f %12.3f %8.2f%s\n' % (name, base * 1e6, seconds * 1e6, ratio,
+                                                         '  REGRESSION' if regressed else ''))
+    regressions += regressed
+  return 1 if regressions else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
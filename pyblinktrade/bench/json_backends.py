@@ -0,0 +1,50 @@
+# Compares the installed json backends on Blinktrade message shapes.
+#
+#   python -m pyblinktrade.bench.json_backends
+import sys
+import timeit
+
+from pyblinktrade import json_backend
+from pyblinktrade.bench.messages import MESSAGES
+from pyblinktrade.bench.suite import add_benchmark
+
+def run(number=10000, repeat=3):
+  results = []
+  previous = json_backend.get_backend().name
+  try:
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      for msg_name, msg in MESSAGES:
+        raw = backend.dumps(msg)
+        loads = min(timeit.repeat(lambda: backend.loads(raw), number=number, repeat=repeat)) / number
+        dumps = min(timeit.repeat(lambda: backend.dumps(msg), number=number, repeat=repeat)) / number
+        results.append((name, msg_name, len(raw), loads, dumps))
+  finally:
+    json_backend.set_backend(previous)
+  return results
+
+def _backend_call(name, method, msg):
+  def factory():
+    previous = json_backend.get_backend().name
+    backend = json_backend.set_backend(name)
+    json_backend.set_backend(previous)
+    if method == 'loads':
+      raw = backend.dumps(msg)
+      return lambda: backend.loads(raw)
+    return lambda: backend.dumps(msg)
+  return factory
+
+for _name in json_backend.available_backends():
+  for _msg_name, _msg in MESSAGES:
+    for _method in ('loads', 'dumps'):
+      add_benchmark('json_backend.%s.%s.%s' % (_name, _method, _msg_name), _backend_call(_name, _method, _msg))
+del _name, _msg_name, _msg, _method
+
+def main():
+  number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  print('%-8s %-30s %8s %12s %12s' % ('backend', 'message', 'bytes', 'loads (us)', 'dumps (us)'))
+  for name, msg_name, size, loads, dumps in run(number):
+    print('%-8s %-30s %8d %12.2f %12.2f' % (name, msg_name, size, loads * 1e6, dumps * 1e6))
+
+if __name__ == '__main__':
+  main()
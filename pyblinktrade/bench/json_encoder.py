@@ -0,0 +1,26 @@
+# JsonEncoder with the Decimal and datetime payloads found in reports and statements
+import json
+import datetime
+import decimal
+
+from pyblinktrade.bench.suite import benchmark
+from pyblinktrade.json_encoder import JsonEncoder
+
+STATEMENT = {
+  'MsgType': 'U35',
+  'LedgerListReqID': 4839207,
+  'LedgerListGrp': [
+    [i, 'BTC', decimal.Decimal('0.15000000'), decimal.Decimal('1.53000000'), 'D', 'DEPOSIT',
+     datetime.datetime(2016, 3, 26, 21, 47, 10), datetime.date(2016, 3, 26), datetime.time(21, 47, 10)]
+    for i in range(50)
+  ]
+}
+
+@benchmark('json_encoder.dumps')
+def json_encoder_dumps():
+  return lambda: json.dumps(STATEMENT, cls=JsonEncoder)
+
+@benchmark('json_encoder.encode')
+def json_encoder_encode():
+  encoder = JsonEncoder()
+  return lambda: encoder.encode(STATEMENT)
@@ -0,0 +1,36 @@
+# Every MessageBuilder method
+from pyblinktrade.bench.suite import add_benchmark
+from pyblinktrade.message_builder import MessageBuilder
+
+BUILDER_CALLS = {
+  'testRequestMessage': ((), {'request_id': 1409175237411}),
+  'login': ((5, 'trader', 'abc12345'), {'second_factor': '123456'}),
+  'getDepositList': ((['0', '1', '2'],), {'opt_filter': ['trader'], 'client_id': 90800003}),
+  'updateProfile': (({'Email': 'trader@example.com'},), {'opt_user_id': 90800003}),
+  'getWithdrawList': ((['1', '2'],), {'opt_filter': ['trader'], 'client_id': 90800003}),
+  'getBrokerList': ((['1'],), {'country': 'BR'}),
+  'verifyCustomer': ((5, 90800003, 1, {'Name': 'Trader'}), {}),
+  'processDeposit': (('CONFIRM',), {'opt_secret': 'abcd', 'opt_depositId': '4fa8e1f2', 'opt_amount': 150000000}),
+  'requestBalances': ((), {'client_id': 90800003}),
+  'requestPositions': ((), {'client_id': 90800003}),
+  'requestMarketData': ((4839201, ['BTCUSD'], ['0', '1', '2']), {}),
+  'processWithdraw': (('PROGRESS', 730), {'percent_fee': 0.5, 'fixed_fee': 100}),
+  'sendLimitedBuyOrder': (('BTCUSD', 25000000, 41030000000000, 8374382), {}),
+  'sendLimitedSellOrder': (('BTCUSD', 25000000, 41030000000000, 8374383), {}),
+  'sendLimitedBuyOrderBytes': (('BTCUSD', 25000000, 41030000000000, 8374382), {}),
+  'sendLimitedSellOrderBytes': (('BTCUSD', 25000000, 41030000000000, 8374383), {}),
+  'sendLimitedOrders': (('BTCUSD', ['1', '2'] * 50, [25000000] * 100, list(range(41030000000000, 41030000000100)),
+                         list(range(8374382, 8374482))), {}),
+  'sendLimitedOrders.wire': (('BTCUSD', ['1', '2'] * 50, [25000000] * 100,
+                              list(range(41030000000000, 41030000000100)), list(range(8374382, 8374482))),
+                             {'wire': True}),
+}
+
+def _call(method, args, kwargs):
+  def factory():
+    return lambda: method(*args, **kwargs)
+  return factory
+
+for _name, (_args, _kwargs) in sorted(BUILDER_CALLS.items()):
+  add_benchmark('message_builder.%s' % _name, _call(getattr(MessageBuilder, _name.split('.')[0]), _args, _kwargs))
+del _name, _args, _kwargs
@@ -0,0 +1,49 @@
+# JsonMessage parsing and validation of every MsgType, and JsonMessage.set
+from pyblinktrade import json_backend
+from pyblinktrade.bench.messages import sample_messages, HEARTBEAT, NEW_ORDER_SINGLE
+from pyblinktrade.bench.suite import add_benchmark, benchmark
+from pyblinktrade.message import JsonMessage, validate_message, set_message_metrics
+from pyblinktrade.message_metrics import MessageMetrics
+
+def _parse(raw_message):
+  def factory():
+    return lambda: JsonMessage(raw_message)
+  return factory
+
+def _validate(msg_type, message):
+  def factory():
+    return lambda: validate_message(msg_type, message)
+  return factory
+
+for _msg_type, _message in sorted(sample_messages().items()):
+  _fields = dict(_message)
+  del _fields['MsgType']
+  add_benchmark('message.parse.%s' % _msg_type, _parse(json_backend.dumps(_message)))
+  add_benchmark('message.validate.%s' % _msg_type, _validate(_msg_type, _fields))
+del _msg_type, _message, _fields
+
+
+@benchmark('message.set')
+def message_set():
+  msg = JsonMessage(json_backend.dumps(HEARTBEAT))
+  return lambda: msg.set('TestReqID', 1409175237412)
+
+@benchmark('message.set.raw_message')
+def message_set_raw_message():
+  msg = JsonMessage(json_backend.dumps(NEW_ORDER_SINGLE))
+  def run():
+    msg.set('Price', 41030000000001)
+    return msg.raw_message
+  return run
+
+@benchmark('message.parse.D.metrics')
+def message_parse_metrics():
+  raw_message = json_backend.dumps(NEW_ORDER_SINGLE)
+  metrics = MessageMetrics()
+  def run():
+    previous = set_message_metrics(metrics)
+    try:
+      return JsonMessage(raw_message)
+    finally:
+      set_message_metrics(previous)
+  return run
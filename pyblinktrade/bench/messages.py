@@ -0,0 +1,135 @@
+# Message shapes as seen on the wire by the Blinktrade gateway
+from pyblinktrade.message import MESSAGE_TYPES, MESSAGE_SCHEMAS, InvalidMessageException, schema_tags, \
+  validate_message
+
+NEW_ORDER_SINGLE = {
+  'MsgType': 'D',
+  'ClOrdID': '8374382',
+  'Symbol': 'BTCUSD',
+  'Side': '1',
+  'OrdType': '2',
+  'Price': 41030000000000,
+  'OrderQty': 25000000,
+  'BrokerID': 5
+}
+
+HEARTBEAT = {
+  'MsgType': '0',
+  'TestReqID': 1409175237411
+}
+
+EXECUTION_REPORT = {
+  'MsgType': '8',
+  'OrderID': 1459028830811,
+  'ExecID': 740972,
+  'ExecType': 'F',
+  'OrdStatus': '2',
+  'CumQty': 25000000,
+  'LeavesQty': 0,
+  'CxlQty': 0,
+  'LastShares': 25000000,
+  'LastPx': 41030000000000,
+  'AvgPx': 41030000000000,
+  'Price': 41030000000000,
+  'OrderQty': 25000000,
+  'ClOrdID': '8374382',
+  'Symbol': 'BTCUSD',
+  'Side': '1',
+  'OrdType': '2',
+  'TimeInForce': '1',
+  'Volume': 102575000000,
+  'OrderDate': '2016-03-26 21:47:10',
+  'ExecSide': '1',
+  'UserID': 90800003,
+  'BrokerID': 5,
+  'Text': None
+}
+
+MARKET_DATA_INCREMENTAL_REFRESH = {
+  'MsgType': 'X',
+  'MDBkTyp': '3',
+  'MDIncGrp': [
+    {
+      'OrderID': 1459028830811 + i,
+      'MDEntryPx': 41030000000000 - i * 1000000,
+      'MDUpdateAction': '0',
+      'MDEntryTime': '21:47:10',
+      'Symbol': 'BTCUSD',
+      'UserID': 90800003,
+      'Broker': 'exchange',
+      'MDEntryType': '0',
+      'MDEntryPositionNo': i + 1,
+      'MDEntrySize': 25000000,
+      'MDEntryID': 1459028830811 + i,
+      'MDEntryDate': '2016-03-26'
+    } for i in range(20)
+  ]
+}
+
+BALANCE_RESPONSE = {
+  'MsgType': 'U3',
+  'BalanceReqID': 4839201,
+  'ClientID': 90800003,
+  '5': {
+    'BTC_locked': 0,
+    'USD': 1040402000000,
+    'BTC': 1530000000,
+    'USD_locked': 10257500000
+  }
+}
+
+DEPOSIT_LIST_RESPONSE = {
+  'MsgType': 'U31',
+  'DepositListReqID': 4839202,
+  'Page': 0,
+  'PageSize': 100,
+  'Columns': ['DepositID', 'DepositMethodID', 'DepositMethodName', 'Type', 'Currency', 'Username',
+              'UserID', 'AccountID', 'BrokerID', 'Value', 'PaidValue', 'Data', 'Created', 'ControlNumber',
+              'State', 'Status', 'ReasonID', 'Reason', 'PercentFee', 'FixedFee', 'ClOrdID'],
+  'DepositListGrp': [
+    ['4fa8e1f2a1c44e62b4b9d79e9c0f29b%d' % i, 502, 'Bank Wire', 'BTC', 'BTC', 'trader', 90800003, 90800003, 5,
+     150000000, 150000000, {'InputAddress': '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa', 'Confirmations': 6},
+     '2016-03-26 21:47:10', 230, 'COMPLETE', '4', None, None, 0, 0, '8374382'] for i in range(100)
+  ]
+}
+
+MESSAGES = [
+  ('NewOrderSingle', NEW_ORDER_SINGLE),
+  ('Heartbeat', HEARTBEAT),
+  ('ExecutionReport', EXECUTION_REPORT),
+  ('MarketDataIncrementalRefresh', MARKET_DATA_INCREMENTAL_REFRESH),
+  ('UserBalanceResponse', BALANCE_RESPONSE),
+  ('DepositListResponse', DEPOSIT_LIST_RESPONSE),
+]
+
+# Messages whose schema can't be satisfied by the generated samples below
+SAMPLE_MESSAGES = [
+  {'MsgType': 'U0', 'Username': 'trader', 'Password': 'abc12345', 'Email': 'trader@example.com', 'BrokerID': 5},
+  {'MsgType': 'B0', 'ProcessDepositReqID': 4839203, 'Action': 'CONFIRM'},
+  {'MsgType': 'B6', 'ProcessWithdrawReqID': 4839204, 'WithdrawID': 730, 'Action': 'PROGRESS'},
+  {'MsgType': 'S34', 'GetSystemSavedDataReqID': 4839205, 'Key': 'fees'},
+  {'MsgType': 'S36', 'SystemSaveDataReqID': 4839206, 'Key': 'fees', 'Data': '{"BTC": 25}'},
+]
+
+def sample_messages():
+  """Returns a valid sample message for every registered MsgType"""
+  samples = {}
+  for _, msg in MESSAGES:
+    samples[msg['MsgType']] = msg
+  for msg in SAMPLE_MESSAGES:
+    samples[msg['MsgType']] = msg
+
+  for msg_type in MESSAGE_TYPES:
+    if msg_type in samples:
+      continue
+    tags = schema_tags(MESSAGE_SCHEMAS.get(msg_type, ()))
+    for value in (1, 'abcd'):
+      msg = dict((tag, value) for tag in tags)
+      try:
+        validate_message(msg_type, msg)
+      except (InvalidMessageException, TypeError):
+        continue
+      msg['MsgType'] = msg_type
+      samples[msg_type] = msg
+      break
+  return samples
@@ -0,0 +1,37 @@
+# ProjectOptions attribute reads
+try:
+  from ConfigParser import SafeConfigParser as ConfigParser
+except ImportError:
+  from configparser import ConfigParser
+
+from pyblinktrade.bench.suite import benchmark
+from pyblinktrade.project_options import ProjectOptions
+
+def _options():
+  config = ConfigParser()
+  config.add_section('gateway')
+  config.set('gateway', 'port', '8445')
+  config.set('gateway', 'session_timeout_limit', '1.5')
+  config.set('gateway', 'allow_signup', 'true')
+  config.set('gateway', 'url', 'wss://api.blinktrade.com/trade/')
+  return ProjectOptions(config, 'gateway')
+
+@benchmark('project_options.int')
+def project_options_int():
+  options = _options()
+  return lambda: options.port
+
+@benchmark('project_options.float')
+def project_options_float():
+  options = _options()
+  return lambda: options.session_timeout_limit
+
+@benchmark('project_options.boolean')
+def project_options_boolean():
+  options = _options()
+  return lambda: options.allow_signup
+
+@benchmark('project_options.string')
+def project_options_string():
+  options = _options()
+  return lambda: options.url
@@ -0,0 +1,77 @@
+# Signal dispatch to 1, 10 and 1000 subscribers
+from pyblinktrade.bench.messages import NEW_ORDER_SINGLE
+from pyblinktrade.bench.suite import add_benchmark, benchmark
+from pyblinktrade.message_router import MessageRouter
+from pyblinktrade.signals import Signal
+
+SUBSCRIBER_COUNTS = (1, 10, 1000)
+SENDER = 'gateway'
+
+class _Subscriber(object):
+  def on_signal(self, sender, data):
+    pass
+
+def _function_slots(count):
+  return [lambda sender, data: None for _ in range(count)]
+
+def _method_slots(count):
+  return [_Subscriber().on_signal for _ in range(count)]
+
+def _dispatch(make_slots, count, per_sender):
+  def factory():
+    signal = Signal()
+    slots = make_slots(count)
+    for slot in slots:
+      signal.connect(slot, SENDER if per_sender else None)
+
+    def run():
+      signal(SENDER, 1)
+    # signals only keep weak references to their slots
+    run.slots = slots
+    return run
+  return factory
+
+for _count in SUBSCRIBER_COUNTS:
+  add_benchmark('signal.functions.%d' % _count, _dispatch(_function_slots, _count, False))
+  add_benchmark('signal.methods.%d' % _count, _dispatch(_method_slots, _count, False))
+  add_benchmark('signal.per_sender_functions.%d' % _count, _dispatch(_function_slots, _count, True))
+  add_benchmark('signal.per_sender_methods.%d' % _count, _dispatch(_method_slots, _count, True))
+del _count
+
+
+def _emit(batch):
+  def factory():
+    signal = Signal()
+    slots = _method_slots(10)
+    for slot in slots:
+      signal.connect(slot)
+    items = list(range(100))
+
+    if batch:
+      def run():
+        signal.emit_many(SENDER, items)
+    else:
+      def run():
+        for item in items:
+          signal(SENDER, item)
+    run.slots = slots
+    return run
+  return factory
+
+add_benchmark('signal.emit.100_items.10', _emit(False))
+add_benchmark('signal.emit_many.100_items.10', _emit(True))
+
+
+@benchmark('message_router.40_routes')
+def message_router():
+  router = MessageRouter()
+  subscribers = [_Subscriber() for _ in range(40)]
+  msg_types = ['D', 'F', '8', '0', 'U2', 'U3', 'V', 'X']
+  for index, subscriber in enumerate(subscribers):
+    router.connect(subscriber.on_signal, msg_types[index % len(msg_types)])
+  message = dict(NEW_ORDER_SINGLE)
+
+  def run():
+    router(SENDER, message)
+  run.slots = subscribers
+  return run
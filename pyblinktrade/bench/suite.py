@@ -0,0 +1,84 @@
+import re
+import sys
+import timeit
+import platform
+from collections import OrderedDict
+
+from pyblinktrade import json_backend
+
+BENCH_MODULES = [
+  'pyblinktrade.bench.message_parsing',
+  'pyblinktrade.bench.message_builder',
+  'pyblinktrade.bench.signals',
+  'pyblinktrade.bench.json_encoder',
+  'pyblinktrade.bench.json_backends',
+  'pyblinktrade.bench.project_options',
+]
+
+# name -> factory returning the callable to time
+BENCHMARKS = OrderedDict()
+
+def add_benchmark(name, factory):
+  if name in BENCHMARKS:
+    raise ValueError('Duplicated benchmark: %s' % name)
+  BENCHMARKS[name] = factory
+
+def benchmark(name):
+  def _register(factory):
+    add_benchmark(name, factory)
+    return factory
+  return _register
+
+def load():
+  for module in BENCH_MODULES:
+    __import__(module)
+  return BENCHMARKS
+
+
+def measure(func, repeat=5, min_time=0.05):
+  """Returns the best time per call, calibrating the number of calls so each run lasts min_time"""
+  timer = timeit.Timer(func)
+  number = 1
+  while True:
+    elapsed = timer.timeit(number)
+    if elapsed >= min_time:
+      break
+    number *= 2 if elapsed > min_time / 4 else 10
+
+  times = [elapsed] + [timer.timeit(number) for _ in range(repeat - 1)]
+  return min(times) / number, number
+
+def run(pattern=None, repeat=5, min_time=0.05, progress=None):
+  load()
+  regex = re.compile(pattern) if pattern else None
+
+  benchmarks = OrderedDict()
+  for name, factory in BENCHMARKS.items():
+    if regex is not None and not regex.search(name):
+      continue
+    seconds, number = measure(factory(), repeat, min_time)
+    benchmarks[name] = {'seconds': seconds, 'number': number}
+    if progress is not None:
+      progress(name, seconds)
+
+  return {
+    'python': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'platform': sys.platform,
+    'json_backend': json_backend.get_backend().name,
+    'benchmarks': benchmarks,
+  }
+
+def compare(results, baseline, threshold=0.1):
+  """
+  Returns (name, baseline seconds, seconds, ratio, regressed) for every
+  benchmark found in both results.
+  """
+  rows = []
+  for name, result in results['benchmarks'].items():
+    if name not in baseline['benchmarks']:
+      continue
+    base = baseline['benchmarks'][name]['seconds']
+    ratio = result['seconds'] / base if base else 1.0
+    rows.append((name, base, result['seconds'], ratio, ratio > 1 + threshold))
+  return rows
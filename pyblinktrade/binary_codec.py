@@ -0,0 +1,320 @@
+"""
+Compact binary encoding of Blinktrade messages for traffic between our own
+services.
+
+MsgTypes and well known tags are sent as small integer ids taken from a
+versioned tag dictionary, integers are packed as zigzag varints. Tags and
+MsgTypes missing from the dictionary are sent as plain strings, so a message
+always decodes to the same dict json.loads would return for its JSON form.
+For the same reason Decimal, datetime, date and time values are sent as the
+strings JsonEncoder writes for them, and decode as strings.
+
+  magic(0xB7) version msg_type field_count (key value)*
+
+Dictionaries are append only: a new version must keep every id of the
+previous one, and peers keep decoding every version they know about.
+"""
+import struct
+
+from pyblinktrade import json_backend
+from pyblinktrade.json_encoder import json_default
+from pyblinktrade.message import JsonMessage, InvalidMessageException
+
+class InvalidBinaryMessageException(InvalidMessageException):
+  def __str__(self):
+    if self.value:
+      return 'Invalid binary message (%s)' % self.value
+    return 'Invalid binary message'
+
+MAGIC = 0xB7
+
+MSG_TYPES_V1 = (
+  '0', '1', 'B', 'C', 'V', 'W', 'X', 'Y', 'BE', 'BF', 'D', 'F', '8', '9', 'x', 'y', 'e', 'f',
+  'U0', 'U2', 'U3', 'U4', 'U5', 'U6', 'U7', 'U9', 'U10', 'U11', 'U12', 'U13', 'U16', 'U17', 'U18', 'U19',
+  'U23', 'U20', 'U21', 'U24', 'U25', 'U26', 'U27', 'U28', 'U29', 'U30', 'U31', 'U32', 'U33', 'U34', 'U35',
+  'U36', 'U37', 'U38', 'U39', 'U40', 'U42', 'U43', 'U44', 'U45', 'U46', 'U48', 'U49', 'U50', 'U51', 'U52',
+  'U53', 'U54', 'U55', 'U56', 'U57', 'U58', 'U59', 'U60', 'U61', 'U62', 'U63', 'U65', 'U70', 'U71', 'U72',
+  'U73', 'U74', 'U75', 'U76', 'U77', 'U78', 'U79',
+  'B0', 'B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B9', 'B11', 'B12', 'B13', 'B14', 'B15', 'B17',
+  'B20', 'B21', 'B23', 'B24', 'B25', 'B26', 'B27', 'B28', 'B29',
+  'S0', 'S2', 'S3', 'S4', 'S6', 'S7', 'S8', 'S9', 'S10', 'S12', 'S13', 'S14', 'S15', 'S16', 'S17', 'S20',
+  'S21', 'S22', 'S23', 'S24', 'S25', 'S26', 'S27', 'S30', 'S31', 'S32', 'S33', 'S34', 'S35', 'S36', 'S37',
+  'S38', 'S39', 'S40', 'S41',
+  'A0', 'A1', 'I0', 'I1', 'I2', 'ERROR',
+)
+
+TAGS_V1 = (
+  # orders, execution reports and market data get the one byte ids
+  'ClOrdID', 'Symbol', 'Side', 'OrdType', 'Price', 'OrderQty', 'StopPx', 'OrderID', 'ExecID', 'ExecType',
+  'OrdStatus', 'CumQty', 'LeavesQty', 'CxlQty', 'LastShares', 'LastPx', 'AvgPx', 'Volume', 'TimeInForce',
+  'OrderDate', 'ExecSide', 'OrdRejReason', 'OrigClOrdID', 'Text', 'UserID', 'BrokerID', 'ClientID',
+  'TestReqID', 'MDReqID', 'MDBkTyp', 'MDIncGrp', 'MDFullGrp', 'MDEntryType', 'MDEntryPx', 'MDEntrySize',
+  'MDEntryID', 'MDEntryPositionNo', 'MDUpdateAction', 'MDEntryDate', 'MDEntryTime', 'Broker',
+  'SubscriptionRequestType', 'MarketDepth', 'MDUpdateType', 'MDEntryTypes', 'Instruments', 'PegPriceType',
+
+  'APIKey', 'APIKeyCreateReqID', 'APIKeyListReqID', 'APIKeyRevokeReqID', 'APIPassword', 'APISecret',
+  'AccountBranch', 'AccountName', 'AccountNumber', 'Action', 'Amount', 'AwayMarketTickerReqID',
+  'BalanceReqID', 'BankAccountCode', 'BankAccountListReqID', 'BankName', 'BankNumber', 'BestAsk', 'BestBid',
+  'BrokerListReqID', 'CPFCNPJ', 'CardCreateReqID', 'CardDisableReqID', 'CardID', 'CardListReqID',
+  'ClearingHistoryReqID', 'ClearingProcessID', 'ClearingStatus', 'Columns', 'ConfirmTrustedAddressReqID',
+  'Confirmations', 'CounterPartyBrokerID', 'CounterPartyBrokerSettlementAccount', 'Country',
+  'CryptoNetworkFeeChargeReqID', 'Currency', 'CustomerListReqID', 'Data', 'DateTime', 'DepositID',
+  'DepositListGrp', 'DepositListReqID', 'DepositMethodID', 'DepositMethodReqID', 'DepositReqID', 'DigestMod',
+  'DocumentListReqID', 'DocumentName', 'Email', 'EmailThreadID', 'EmailType', 'Enable', 'Fields', 'Filter',
+  'FixedFee', 'GetSystemSavedDataReqID', 'Headline', 'HighPx', 'InputAddress', 'Instructions', 'IsApiKey',
+  'Key', 'Label', 'LedgerListReqID', 'LinesOfText', 'LogonRptReqID', 'LowPx', 'Market',
+  'MatchStmntRcrdsReqID', 'MaxPrice', 'Message', 'Method', 'MinPrice', 'NewPassword', 'Nonce', 'Operation',
+  'OrdersReqID', 'Page', 'PageSize', 'PartyBrokerID', 'PartyBrokerSettlementAccount', 'Password', 'Payload',
+  'PercentFee', 'PositionReqID', 'ProcessClearingReqID', 'ProcessDepositReqID', 'ProcessWithdrawReqID',
+  'Profile', 'Reason', 'ReasonID', 'RemoteIP', 'ReqID', 'RestAPIReqID', 'SR1ID', 'SR2ID', 'SecondFactor',
+  'Secret', 'SecurityListRequestType', 'SecurityReqID', 'SecurityRequestResult', 'SecurityResponseID',
+  'SessionID', 'Signature', 'Since', 'StatementRecordAddReqID', 'StatementRecordID',
+  'StatementRecordListReqID', 'Status', 'StatusList', 'Subject', 'SuggestTrustedAddressReqID',
+  'SystemSaveDataReqID', 'TradSesStatus', 'TradeHistoryReqID', 'Type', 'UpdateReqID', 'UserReqID',
+  'UserReqTyp', 'Username', 'VWAP', 'Value', 'VerificationData', 'Verify', 'VerifyCustomerReqID', 'Wallet',
+  'WithdrawCancelReqID', 'WithdrawID', 'WithdrawListReqID', 'WithdrawReqID',
+)
+
+TAG_DICTIONARIES = {
+  1: (MSG_TYPES_V1, TAGS_V1),
+}
+
+TAG_DICTIONARY_VERSION = 1
+
+try:
+  _INTEGER_TYPES = (int, long)
+  _TEXT_TYPE = unicode
+except NameError:
+  _INTEGER_TYPES = (int,)
+  _TEXT_TYPE = str
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STRING, _LIST, _DICT = range(8)
+_DOUBLE = struct.Struct('>d')
+
+
+class _TagDictionary(object):
+  def __init__(self, version, msg_types, tags):
+    self.version = version
+    self.msg_types = msg_types
+    self.msg_type_ids = dict((msg_type, index + 1) for index, msg_type in enumerate(msg_types))
+    self.tags = tags
+    self.tag_ids = dict((tag, index + 1) for index, tag in enumerate(tags))
+
+_dictionaries = dict((version, _TagDictionary(version, msg_types, tags))
+                     for version, (msg_types, tags) in TAG_DICTIONARIES.items())
+
+
+def _write_uint(out, value):
+  while value > 0x7f:
+    out.append((value & 0x7f) | 0x80)
+    value >>= 7
+  out.append(value)
+
+def _write_string(out, value):
+  if isinstance(value, _TEXT_TYPE):
+    value = value.encode('utf-8')
+  _write_uint(out, len(value))
+  out += value
+
+def _write_id_or_string(out, value, ids):
+  # id 0 means the value follows as a plain string
+  value_id = ids.get(value)
+  if value_id is not None:
+    _write_uint(out, value_id)
+  else:
+    out.append(0)
+    _write_string(out, value)
+
+def _write_key(out, key, tag_ids):
+  if isinstance(key, _INTEGER_TYPES) and not isinstance(key, bool):
+    key = str(key)
+  elif not isinstance(key, (str, _TEXT_TYPE)):
+    raise TypeError('%r is not a valid message tag' % (key,))
+  _write_id_or_string(out, key, tag_ids)
+
+def _write_value(out, value, tag_ids):
+  if value is None:
+    out.append(_NONE)
+  elif value is True:
+    out.append(_TRUE)
+  elif value is False:
+    out.append(_FALSE)
+  elif isinstance(value, _INTEGER_TYPES):
+    out.append(_INT)
+    _write_uint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+  elif isinstance(value, float):
+    out.append(_FLOAT)
+    out += _DOUBLE.pack(value)
+  elif isinstance(value, (str, _TEXT_TYPE)):
+    out.append(_STRING)
+    _write_string(out, value)
+  elif isinstance(value, (list, tuple)):
+    out.append(_LIST)
+    _write_uint(out, len(value))
+    for item in value:
+      _write_value(out, item, tag_ids)
+  elif isinstance(value, dict):
+    out.append(_DICT)
+    _write_uint(out, len(value))
+    for key, item in value.items():
+      _write_key(out, key, tag_ids)
+      _write_value(out, item, tag_ids)
+  else:
+    try:
+      value = json_default(value)
+    except TypeError:
+      raise TypeError('%r can not be binary encoded' % (value,))
+    out.append(_STRING)
+    _write_string(out, value)
+
+def encode(message, version=TAG_DICTIONARY_VERSION):
+  """
+  Encodes a message dict with a MsgType, or a JsonMessage/typed message.
+  """
+  if hasattr(message, 'toJSON'):
+    msg_type, fields = message.type, message.toJSON()
+  else:
+    msg_type, fields = message['MsgType'], message
+
+  dictionary = _dictionaries[version]
+  tag_ids = dictionary.tag_ids
+  out = bytearray((MAGIC, version))
+  _write_id_or_string(out, msg_type, dictionary.msg_type_ids)
+
+  count = len(fields) - 1 if 'MsgType' in fields else len(fields)
+  _write_uint(out, count)
+  for key, value in fields.items():
+    if key == 'MsgType':
+      continue
+    _write_key(out, key, tag_ids)
+    _write_value(out, value, tag_ids)
+  return bytes(out)
+
+
+def _read_uint(buf, pos):
+  value = buf[pos]
+  pos += 1
+  if value < 0x80:
+    return value, pos
+  value &= 0x7f
+  shift = 7
+  while True:
+    byte = buf[pos]
+    pos += 1
+    value |= (byte & 0x7f) << shift
+    if byte < 0x80:
+      return value, pos
+    shift += 7
+
+def _read_string(buf, pos):
+  length, pos = _read_uint(buf, pos)
+  end = pos + length
+  if end > len(buf):
+    raise IndexError()
+  return bytes(buf[pos:end]).decode('utf-8'), end
+
+def _read_id_or_string(buf, pos, values):
+  value_id, pos = _read_uint(buf, pos)
+  if value_id == 0:
+    return _read_string(buf, pos)
+  if value_id > len(values):
+    raise ValueError('unknown id %d' % value_id)
+  return values[value_id - 1], pos
+
+def _read_value(buf, pos, tags):
+  value_type = buf[pos]
+  pos += 1
+  if value_type == _INT:
+    value, pos = _read_uint(buf, pos)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+  if value_type == _STRING:
+    return _read_string(buf, pos)
+  if value_type == _NONE:
+    return None, pos
+  if value_type == _TRUE:
+    return True, pos
+  if value_type == _FALSE:
+    return False, pos
+  if value_type == _FLOAT:
+    if pos + 8 > len(buf):
+      raise IndexError()
+    return _DOUBLE.unpack_from(bytes(buf[pos:pos + 8]))[0], pos + 8
+  if value_type == _LIST:
+    count, pos = _read_uint(buf, pos)
+    items = []
+    for _ in range(count):
+      item, pos = _read_value(buf, pos, tags)
+      items.append(item)
+    return items, pos
+  if value_type == _DICT:
+    count, pos = _read_uint(buf, pos)
+    items = {}
+    for _ in range(count):
+      key, pos = _read_id_or_string(buf, pos, tags)
+      items[key], pos = _read_value(buf, pos, tags)
+    return items, pos
+  raise ValueError('unknown value type %d' % value_type)
+
+def decode(data):
+  """Decodes a binary message into the same dict json.loads returns for it"""
+  buf = bytearray(data)
+  if len(buf) < 2 or buf[0] != MAGIC:
+    raise InvalidBinaryMessageException(data, None, None, 'bad magic')
+
+  dictionary = _dictionaries.get(buf[1])
+  if dictionary is None:
+    raise InvalidBinaryMessageException(data, None, None, 'unknown dictionary version %d' % buf[1])
+
+  try:
+    msg_type, pos = _read_id_or_string(buf, 2, dictionary.msg_types)
+    message = {'MsgType': msg_type}
+    count, pos = _read_uint(buf, pos)
+    for _ in range(count):
+      key, pos = _read_id_or_string(buf, pos, dictionary.tags)
+      message[key], pos = _read_value(buf, pos, dictionary.tags)
+  except IndexError:
+    raise InvalidBinaryMessageException(data, None, None, 'truncated message')
+  except (ValueError, UnicodeDecodeError) as e:
+    raise InvalidBinaryMessageException(data, None, None, str(e))
+
+  if pos != len(buf):
+    raise InvalidBinaryMessageException(data, None, None, 'trailing data')
+  return message
+
+def decode_message(data, message_class=JsonMessage):
+  return message_class.from_dict(decode(data))
+
+def encode_values(values, version=TAG_DICTIONARY_VERSION):
+  """
+  Encodes a sequence of plain values, e.g. the (sender, data) of a signal.
+  Dict keys are packed with the tag dictionary, like message tags.
+  """
+  out = bytearray((version,))
+  _write_value(out, list(values), _dictionaries[version].tag_ids)
+  return bytes(out)
+
+def decode_values(data):
+  buf = bytearray(data)
+  dictionary = _dictionaries.get(buf[0]) if buf else None
+  if dictionary is None:
+    raise InvalidBinaryMessageException(data, None, None, 'unknown dictionary version')
+
+  try:
+    values, pos = _read_value(buf, 1, dictionary.tags)
+  except IndexError:
+    raise InvalidBinaryMessageException(data, None, None, 'truncated message')
+  except (ValueError, UnicodeDecodeError) as e:
+    raise InvalidBinaryMessageException(data, None, None, str(e))
+
+  if pos != len(buf) or not isinstance(values, list):
+    raise InvalidBinaryMessageException(data, None, None, 'trailing data')
+  return values
+
+def is_binary(data):
+  return isinstance(data, (bytes, bytearray)) and len(data) > 0 and bytearray(data[:1])[0] == MAGIC
+
+def loads(data):
+  """Decodes either a JSON or a binary message, so both kinds of peers can coexist"""
+  if is_binary(data):
+    return decode(data)
+  return json_backend.loads(data)
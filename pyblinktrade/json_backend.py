@@ -0,0 +1,127 @@
+"""
+JSON backend used by JsonMessage and JsonMessage.set. JsonEncoder stays on
+the stdlib json module, whose output it must keep.
+
+The fastest installed backend is picked on import. It can be overridden per
+process with the PYBLINKTRADE_JSON_BACKEND environment variable or with
+set_backend(). Always call json_backend.loads/json_backend.dumps through the
+module, as set_backend() rebinds them.
+"""
+import os
+import json
+
+from pyblinktrade.json_encoder import json_default
+
+class JsonBackend(object):
+  def __init__(self, name, loads, dumps):
+    self.name = name
+    self.loads = loads
+    self.dumps = dumps
+
+  def __repr__(self):
+    return 'JsonBackend(%s)' % self.name
+
+
+def _json_backend():
+  encoder = json.JSONEncoder(default=json_default)
+  return JsonBackend('json', json.loads, encoder.encode)
+
+# maps the digits to 0 and every other byte to a space, so that a run of 20
+# digits (an integer orjson might turn into a float) is a plain substring
+_DIGITS = bytes(bytearray(0x30 if 0x30 <= c <= 0x39 else 0x20 for c in range(256)))
+_BIG_INTEGER = b'0' * 20
+
+def _orjson_backend():
+  import orjson
+
+  options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+  orjson_loads = orjson.loads
+  orjson_dumps = orjson.dumps
+  json_loads = json.loads
+
+  def loads(raw):
+    data = raw.encode('utf-8') if isinstance(raw, str) else bytes(raw)
+    if _BIG_INTEGER not in data.translate(_DIGITS):
+      try:
+        return orjson_loads(data)
+      except orjson.JSONDecodeError:
+        # e.g. NaN, Infinity or 1e400, which the json module accepts
+        pass
+    return json_loads(raw)
+
+  # same compact, non escaped output as orjson
+  json_dumps = json.JSONEncoder(default=json_default, separators=(',', ':'), ensure_ascii=False).encode
+
+  def dumps(obj):
+    try:
+      return orjson_dumps(obj, default=json_default, option=options).decode('utf-8')
+    except TypeError:
+      # e.g. integers bigger than 64 bits
+      return json_dumps(obj)
+  return JsonBackend('orjson', loads, dumps)
+
+# in order of preference
+_BACKEND_FACTORIES = [
+  ('orjson', _orjson_backend),
+  ('json',   _json_backend),
+]
+
+_backends = {}
+
+def register_backend(name, loads, dumps, preferred=False):
+  """Adds a backend, or replaces the one registered under the same name"""
+  _BACKEND_FACTORIES[:] = [entry for entry in _BACKEND_FACTORIES if entry[0] != name]
+  _backends[name] = JsonBackend(name, loads, dumps)
+  if preferred:
+    _BACKEND_FACTORIES.insert(0, (name, None))
+  else:
+    _BACKEND_FACTORIES.append((name, None))
+
+def unregister_backend(name):
+  """Removes a backend, switching back to the preferred one if it was selected"""
+  _BACKEND_FACTORIES[:] = [entry for entry in _BACKEND_FACTORIES if entry[0] != name]
+  backend = _backends.pop(name, None)
+  if backend is not None and backend is _backend:
+    set_backend()
+
+def _load_backend(name):
+  if name not in _backends:
+    factories = dict(_BACKEND_FACTORIES)
+    if name not in factories:
+      raise ValueError('Unknown json backend: %s' % name)
+    _backends[name] = factories[name]()
+  return _backends[name]
+
+def available_backends():
+  names = []
+  for name, factory in _BACKEND_FACTORIES:
+    try:
+      _load_backend(name)
+    except ImportError:
+      continue
+    names.append(name)
+  return names
+
+_backend = None
+loads = json.loads
+dumps = json.dumps
+
+def get_backend():
+  return _backend
+
+def set_backend(name=None):
+  """
+  Selects the json backend for the whole process. With no name, picks the
+  first available backend in order of preference.
+  """
+  global _backend, loads, dumps
+  if name is None:
+    name = available_backends()[0]
+  backend = _load_backend(name)
+
+  _backend = backend
+  loads = backend.loads
+  dumps = backend.dumps
+  return backend
+
+set_backend(os.environ.get('PYBLINKTRADE_JSON_BACKEND') or None)
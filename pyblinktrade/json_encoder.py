@@ -2,14 +2,19 @@ import json
 import datetime
 import decimal
 
+def json_default(obj):
+  if isinstance(obj, datetime.datetime):
+    return obj.strftime('%Y-%m-%d %H:%M:%S')
+  elif isinstance(obj, datetime.date):
+    return obj.strftime('%Y-%m-%d')
+  if isinstance(obj, datetime.time):
+    return obj.strftime('%H:%M:%S')
+  if isinstance(obj, decimal.Decimal):
+    return str(obj)
+  raise TypeError('%r is not JSON serializable' % (obj,))
+
 class JsonEncoder(json.JSONEncoder):
+  # Always the stdlib encoder: its output (ensure_ascii, separators, NaN)
+  # differs from the faster backends, which json_backend.dumps exposes.
   def default(self, obj):
-    if isinstance(obj, datetime.datetime):
-      return obj.strftime('%Y-%m-%d %H:%M:%S')
-    elif isinstance(obj, datetime.date):
-      return obj.strftime('%Y-%m-%d')
-    if isinstance(obj, datetime.time):
-      return obj.strftime('%H:%M:%S')
-    if isinstance(obj, decimal.Decimal):
-      return str(obj)
-    return json.JSONEncoder.default(self, obj)
+    return json_default(obj)
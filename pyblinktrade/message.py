@@ -1,5 +1,9 @@
 __author__ = 'rodrigo'
+import re
 import json
+from timeit import default_timer as _timer
+
+from pyblinktrade import json_backend
 
 class InvalidMessageException(Exception):
   def __init__(self, raw_message, json_message=None, tag=None, value=None):
@@ -8,6 +12,8 @@ class InvalidMessageException(Exception):
     self.json_message = json_message
     self.tag = tag
     self.value = value
+  def __reduce__(self):
+    return self.__class__, (self.raw_message, self.json_message, self.tag, self.value)
   def __str__(self):
     return 'Invalid Message'
 
@@ -27,6 +33,384 @@ class InvalidMessageFieldException(InvalidMessageException):
   def __str__(self):
     return 'Invalid value tag(%s)=%s'%(self.tag, self.value)
 
+try:
+  _STRING_TYPES = (str, unicode)
+except NameError:
+  _STRING_TYPES = (str,)
+
+_NUMBER_TYPES = (int, float)
+# values the length rules apply to
+_SIZED_TYPES = _STRING_TYPES + (list,)
+
+
+# Rule factories used to compile MESSAGE_SCHEMAS. Each one returns a
+# check(raw_message, message) closure which raises the same exception the
+# matching JsonMessage.raise_exception_if_* method would.
+def _rule_required(*tags):
+  if len(tags) == 1:
+    tag = tags[0]
+    def _check(raw_message, message):
+      if tag not in message:
+        raise InvalidMessageMissingTagException(raw_message, message, tag)
+    return _check
+
+  def _check_all(raw_message, message):
+    for tag in tags:
+      if tag not in message:
+        raise InvalidMessageMissingTagException(raw_message, message, tag)
+  return _check_all
+
+def _rule_int(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if type(val) is not int:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_number(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if type(val) not in _NUMBER_TYPES:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_positive(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if type(val) not in _NUMBER_TYPES or not val > 0:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_non_negative(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if val:
+      if type(val) not in _NUMBER_TYPES or val < 0:
+        raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_string(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if type(val) not in _STRING_TYPES:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_not_empty(tag):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if not val:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_in(tag, values):
+  values = tuple(values)
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if val not in values:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_max_length(tag, length):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if val is not None and (type(val) not in _SIZED_TYPES or len(val) > length):
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_min_length(tag, length):
+  def _check(raw_message, message):
+    val = message.get(tag)
+    if type(val) not in _SIZED_TYPES or len(val) < length:
+      raise InvalidMessageFieldException(raw_message, message, tag, val)
+  return _check
+
+def _rule_any_of(*tags):
+  missing_tag = ','.join(tags)
+  def _check(raw_message, message):
+    for tag in tags:
+      if tag in message:
+        return
+    raise InvalidMessageMissingTagException(raw_message, message, missing_tag)
+  return _check
+
+def _rule_when(condition, rules):
+  if not callable(condition):
+    tag, value = condition
+    condition = lambda message: message.get(tag) == value
+  validate = compile_message_schema(rules)
+  def _check(raw_message, message):
+    if condition(message):
+      validate(raw_message, message)
+  return _check
+
+def _rule_present(tag, rules):
+  validate = compile_message_schema(rules)
+  def _check(raw_message, message):
+    if tag in message:
+      validate(raw_message, message)
+  return _check
+
+def _rule_check(func):
+  return func
+
+_RULE_FACTORIES = {
+  'required':     _rule_required,
+  'int':          _rule_int,
+  'number':       _rule_number,
+  'positive':     _rule_positive,
+  'non_negative': _rule_non_negative,
+  'string':       _rule_string,
+  'not_empty':    _rule_not_empty,
+  'in':           _rule_in,
+  'max_length':   _rule_max_length,
+  'min_length':   _rule_min_length,
+  'any_of':       _rule_any_of,
+  'when':         _rule_when,
+  'present':      _rule_present,
+  'check':        _rule_check,
+}
+
+def _noop_validator(raw_message, message):
+  pass
+
+def compile_message_schema(rules):
+  """
+  Compiles a list of rules like ``('required', 'ClOrdID')`` into a single
+  validator(raw_message, message) function.
+  """
+  checks = []
+  required_tags = []
+  for rule in rules:
+    op, args = rule[0], rule[1:]
+    if op not in _RULE_FACTORIES:
+      raise ValueError('Unknown message schema rule: %s' % op)
+
+    # consecutive required tags are checked in a single call
+    if op == 'required':
+      required_tags.extend(args)
+      continue
+    if required_tags:
+      checks.append(_rule_required(*required_tags))
+      required_tags = []
+    checks.append(_RULE_FACTORIES[op](*args))
+  if required_tags:
+    checks.append(_rule_required(*required_tags))
+
+  if not checks:
+    return _noop_validator
+  if len(checks) == 1:
+    return checks[0]
+
+  checks = tuple(checks)
+  def _validate(raw_message, message):
+    for check in checks:
+      check(raw_message, message)
+  return _validate
+
+_MESSAGE_TYPES = {
+  # User messages based on the Fix Protocol
+  '0':   'Heartbeat',
+  '1':   'TestRequest',
+  'B':   'News',
+  'C':   'Email',
+  'V':   'MarketDataRequest',
+  'W':   'MarketDataFullRefresh',
+  'X':   'MarketDataIncrementalRefresh',
+  'Y':   'MarketDataRequestReject',
+  'BE':  'UserRequest',
+  'BF':  'UserResponse',
+  'D':   'NewOrderSingle',
+  'F':   'OrderCancelRequest',
+  '8':   'ExecutionReport',
+  '9':   'OrderCancelReject',
+  'x':   'SecurityListRequest',
+  'y':   'SecurityList',
+  'e':   'SecurityStatusRequest',
+  'f':   'SecurityStatus',
+
+  # User  messages
+  'U0':  'Signup',
+  'U2':  'UserBalanceRequest',
+  'U3':  'UserBalanceResponse',
+  'U4':  'OrdersListRequest',
+  'U5':  'OrdersListResponse',
+  'U6':  'WithdrawRequest',
+  'U7':  'WithdrawResponse',
+  'U9':  'WithdrawRefresh',
+
+  'U10': 'CreatePasswordResetRequest',
+  'U11': 'CreatePasswordResetResponse',
+  'U12': 'ProcessPasswordResetRequest',
+  'U13': 'ProcessPasswordResetResponse',
+  'U16': 'EnableDisableTwoFactorAuthenticationRequest',
+  'U17': 'EnableDisableTwoFactorAuthenticationResponse',
+
+  'U18': 'DepositRequest',
+  'U19': 'DepositResponse',
+  'U23': 'DepositRefresh',
+
+  'U20': 'DepositMethodsRequest',
+  'U21': 'DepositMethodsResponse',
+
+
+  'U24': 'WithdrawConfirmationRequest',
+  'U25': 'WithdrawConfirmationResponse',
+  'U26': 'WithdrawListRequest',
+  'U27': 'WithdrawListResponse',
+  'U28': 'BrokerListRequest',
+  'U29': 'BrokerListResponse',
+
+  'U30': 'DepositListRequest',
+  'U31': 'DepositListResponse',
+
+  'U32': 'TradeHistoryRequest',
+  'U33': 'TradeHistoryResponse',
+
+  'U34': 'LedgerListRequest',
+  'U35': 'LedgerListResponse',
+
+  'U36': 'TradersRankRequest',
+  'U37': 'TradersRankResponse',
+
+  'U38': 'UpdateProfile',
+  'U39': 'UpdateProfileResponse',
+  'U40': 'ProfileRefresh',
+
+  'U42': 'PositionRequest' ,
+  'U43': 'PositionResponse' ,
+
+  'U44': 'ConfirmTrustedAddressRequest' ,
+  'U45': 'ConfirmTrustedAddressResponse' ,
+  'U46': 'SuggestTrustedAddressPublish' ,
+
+  'U48': 'DepositMethodRequest',
+  'U49': 'DepositMethodResponse',
+
+  'U50': 'APIKeyListRequest',
+  'U51': 'APIKeyListResponse',
+  'U52': 'APIKeyCreateRequest',
+  'U53': 'APIKeyCreateResponse',
+  'U54': 'APIKeyRevokeRequest',
+  'U55': 'APIKeyRevokeResponse',
+
+  'U56': 'GetCreditLineOfCreditRequest',
+  'U57': 'GetCreditLineOfCreditResponse',
+  'U58': 'PayCreditLineOfCreditRequest',
+  'U59': 'PayCreditLineOfCreditResponse',
+  'U60': 'LineOfCreditListRequest',
+  'U61': 'LineOfCreditListResponse',
+  'U62': 'EnableCreditLineOfCreditRequest',
+  'U63': 'EnableCreditLineOfCreditResponse',
+  'U65': 'LineOfCreditRefresh',
+
+  'U70': 'CancelWithdrawalRequest',
+  'U71': 'CancelWithdrawalResponse',
+
+  'U72': 'CardListRequest',
+  'U73': 'CardListResponse',
+  'U74': 'CardCreateRequest',
+  'U75': 'CardCreateResponse',
+  'U76': 'CardDisableRequest',
+  'U77': 'CardDisableResponse',
+  'U78': 'WithdrawCommentRequest',
+  'U79': 'WithdrawCommentResponse',
+
+  # Broker messages
+  'B0':  'ProcessDeposit',
+  'B1':  'ProcessDepositResponse',
+  'B2':  'CustomerListRequest',
+  'B3':  'CustomerListResponse',
+  'B4':  'CustomerDetailRequest',
+  'B5':  'CustomerDetailResponse',
+  'B6':  'ProcessWithdraw',
+  'B7':  'ProcessWithdrawResponse',
+  'B8':  'VerifyCustomerRequest',
+  'B9':  'VerifyCustomerResponse',
+  'B11': 'VerifyCustomerRefresh',
+  'B12': 'ClearingHistoryRequest',
+  'B13': 'ClearingHistoryResponse',
+  'B14': 'ProcessClearingRequest',
+  'B15': 'ProcessClearingResponse',
+  'B17': 'ProcessClearingRefresh',
+  'B20': 'StatementRecordAddRequest',
+  'B21': 'StatementRecordAddResponse',
+  'B23': 'StatementRecordAddRefresh',
+  'B24': 'BankAccountListRequest',
+  'B25': 'BankAccountListResponse',
+  'B26': 'StatementRecordsMatchRequest',
+  'B27': 'StatementRecordsMatchResponse',
+  'B28': 'StatementRecordsListRequest',
+  'B29': 'StatementRecordsListResponse',
+
+  # System messages
+  'S0':  'AccessLog',
+
+  'S2':  'AwayMarketTickerRequest',
+  'S3':  'AwayMarketTickerResponse',
+  'S4':  'AwayMarketTickerPublish',
+
+  'S6':  'RestAPIRequest',
+  'S7':  'RestAPIResponse',
+
+  'S8':  'SetInstrumentDefinitionRequest',
+  'S9':  'SetInstrumentDefinitionResponse',
+
+  'S10': 'DocumentPublish',
+
+  'S12': 'DocumentListRequest',
+  'S13': 'DocumentListResponse',
+
+  'S14' : 'CryptoWithdrawNetworkFeeTransferRequest',
+  'S15' : 'CryptoWithdrawNetworkFeeTransferResponse',
+
+  'S16' : 'UserLogonReport',
+  'S17' : 'UserLogonReportAck',
+
+  'S20': 'BrokerCreateRequest',
+  'S21': 'BrokerCreateResponse',
+  'S22': 'BrokersListRequest',
+  'S23': 'BrokersListResponse',
+  'S24': 'BrokerAccountsListRequest',
+  'S25': 'BrokerAccountsListResponse',
+  'S26': 'BrokerDeleteRequest',
+  'S27': 'BrokerDeleteResponse',
+
+  'S30': 'AccountCreateRequest',
+  'S31': 'AccountCreateResponse',
+  'S32': 'AccountDeleteRequest',
+  'S33': 'AccountDeleteResponse',
+
+  'S34': 'GetSystemSavedDataRequest',
+  'S35': 'GetSystemSavedDataResponse',
+
+  'S36': 'SystemSaveDataRequest',
+  'S37': 'SystemSaveDataResponse',
+
+  'S38': 'TradingSessionStatusChangeRequest',
+  'S39': 'TradingSessionStatusChangeResponse',
+
+  'S40': 'SystemCheck2FARequest',
+  'S41': 'SystemCheck2FAResponse',
+
+  # Administrative messages
+  'A0':  'DbQueryRequest',
+  'A1':  'DbQueryResponse',
+
+  'I0': 'UpdateBalanceRequest',
+  'I1': 'UpdateBalanceResponse',
+  'I2': 'FundTransferReport',
+
+  'ERROR': 'ErrorMessage',
+}
+
+try:
+  from types import MappingProxyType
+  MESSAGE_TYPES = MappingProxyType(_MESSAGE_TYPES)
+except ImportError:
+  MESSAGE_TYPES = _MESSAGE_TYPES
+
+
 class BaseMessage(object):
   MAX_MESSAGE_LENGTH = 10024*1000
   def __init__(self, raw_message):
@@ -45,8 +429,21 @@ class BaseMessage(object):
     raise  NotImplementedError()
 
 
+def _pop_message_type(raw_message, message):
+  # anything but an object with a string MsgType is rejected up front, so it
+  # can't surface as a TypeError from the dict lookups below
+  if not isinstance(message, dict) or 'MsgType' not in message:
+    raise InvalidMessageTypeException(raw_message, message)
+  msg_type = message.pop('MsgType')
+  if not isinstance(msg_type, _STRING_TYPES):
+    raise InvalidMessageTypeException(raw_message, message, msg_type)
+  return msg_type
+
+
 class JsonMessage(BaseMessage):
   MAX_MESSAGE_LENGTH = 10024*1000
+  valid_message_types = MESSAGE_TYPES
+
   def raise_exception_if_required_tag_is_missing(self, tag):
     if tag not in self.message:
       raise InvalidMessageMissingTagException(self.raw_message, self.message, tag)
@@ -68,7 +465,7 @@ class JsonMessage(BaseMessage):
 
   def raise_exception_if_not_string(self, tag):
     val = self.get(tag)
-    if not( type(val) == str or type(val) == unicode):
+    if type(val) not in _STRING_TYPES:
       raise InvalidMessageFieldException(self.raw_message, self.message, tag, val)
 
   def raise_exception_if_not_greater_than_zero(self, tag):
@@ -110,845 +507,75 @@ class JsonMessage(BaseMessage):
 
     # make sure a malicious users didn't send us more than 4096 bytes
     if len(raw_message) > self.MAX_MESSAGE_LENGTH:
-      raise InvalidMessageLengthException(raw_message)
-
-
-    # parse the message
-    self.message = json.loads(raw_message)
-
-    if 'MsgType' not in self.message:
-      raise InvalidMessageTypeException(raw_message, self.message)
-
-    self.type = self.message['MsgType']
-    del self.message['MsgType']
-
-    self.valid_message_types = {
-      # User messages based on the Fix Protocol
-      '0':   'Heartbeat',
-      '1':   'TestRequest',
-      'B':   'News',
-      'C':   'Email',
-      'V':   'MarketDataRequest',
-      'W':   'MarketDataFullRefresh',
-      'X':   'MarketDataIncrementalRefresh',
-      'Y':   'MarketDataRequestReject',
-      'BE':  'UserRequest',
-      'BF':  'UserResponse',
-      'D':   'NewOrderSingle',
-      'F':   'OrderCancelRequest',
-      '8':   'ExecutionReport',
-      '9':   'OrderCancelReject',
-      'x':   'SecurityListRequest',
-      'y':   'SecurityList',
-      'e':   'SecurityStatusRequest',
-      'f':   'SecurityStatus',
-
-      # User  messages
-      'U0':  'Signup',
-      'U2':  'UserBalanceRequest',
-      'U3':  'UserBalanceResponse',
-      'U4':  'OrdersListRequest',
-      'U5':  'OrdersListResponse',
-      'U6':  'WithdrawRequest',
-      'U7':  'WithdrawResponse',
-      'U9':  'WithdrawRefresh',
-
-      'U10': 'CreatePasswordResetRequest',
-      'U11': 'CreatePasswordResetResponse',
-      'U12': 'ProcessPasswordResetRequest',
-      'U13': 'ProcessPasswordResetResponse',
-      'U16': 'EnableDisableTwoFactorAuthenticationRequest',
-      'U17': 'EnableDisableTwoFactorAuthenticationResponse',
-
-      'U18': 'DepositRequest',
-      'U19': 'DepositResponse',
-      'U23': 'DepositRefresh',
-
-      'U20': 'DepositMethodsRequest',
-      'U21': 'DepositMethodsResponse',
-
-
-      'U24': 'WithdrawConfirmationRequest',
-      'U25': 'WithdrawConfirmationResponse',
-      'U26': 'WithdrawListRequest',
-      'U27': 'WithdrawListResponse',
-      'U28': 'BrokerListRequest',
-      'U29': 'BrokerListResponse',
-
-      'U30': 'DepositListRequest',
-      'U31': 'DepositListResponse',
-
-      'U32': 'TradeHistoryRequest',
-      'U33': 'TradeHistoryResponse',
-
-      'U34': 'LedgerListRequest',
-      'U35': 'LedgerListResponse',
-
-      'U36': 'TradersRankRequest',
-      'U37': 'TradersRankResponse',
-
-      'U38': 'UpdateProfile',
-      'U39': 'UpdateProfileResponse',
-      'U40': 'ProfileRefresh',
-
-      'U42': 'PositionRequest' ,
-      'U43': 'PositionResponse' ,
-
-      'U44': 'ConfirmTrustedAddressRequest' ,
-      'U45': 'ConfirmTrustedAddressResponse' ,
-      'U46': 'SuggestTrustedAddressPublish' ,
-
-      'U48': 'DepositMethodRequest',
-      'U49': 'DepositMethodResponse',
-
-      'U50': 'APIKeyListRequest',
-      'U51': 'APIKeyListResponse',
-      'U52': 'APIKeyCreateRequest',
-      'U53': 'APIKeyCreateResponse',
-      'U54': 'APIKeyRevokeRequest',
-      'U55': 'APIKeyRevokeResponse',
-
-      'U56': 'GetCreditLineOfCreditRequest',
-      'U57': 'GetCreditLineOfCreditResponse',
-      'U58': 'PayCreditLineOfCreditRequest',
-      'U59': 'PayCreditLineOfCreditResponse',
-      'U60': 'LineOfCreditListRequest',
-      'U61': 'LineOfCreditListResponse',
-      'U62': 'EnableCreditLineOfCreditRequest',
-      'U63': 'EnableCreditLineOfCreditResponse',
-      'U65': 'LineOfCreditRefresh',
-      
-      'U70': 'CancelWithdrawalRequest',
-      'U71': 'CancelWithdrawalResponse',
-
-      'U72': 'CardListRequest',
-      'U73': 'CardListResponse',
-      'U74': 'CardCreateRequest',
-      'U75': 'CardCreateResponse',
-      'U76': 'CardDisableRequest',
-      'U77': 'CardDisableResponse',
-      'U78': 'WithdrawCommentRequest',
-      'U79': 'WithdrawCommentResponse',
-
-      # Broker messages
-      'B0':  'ProcessDeposit',
-      'B1':  'ProcessDepositResponse',
-      'B2':  'CustomerListRequest',
-      'B3':  'CustomerListResponse',
-      'B4':  'CustomerDetailRequest',
-      'B5':  'CustomerDetailResponse',
-      'B6':  'ProcessWithdraw',
-      'B7':  'ProcessWithdrawResponse',
-      'B8':  'VerifyCustomerRequest',
-      'B9':  'VerifyCustomerResponse',
-      'B11': 'VerifyCustomerRefresh',
-      'B12': 'ClearingHistoryRequest',
-      'B13': 'ClearingHistoryResponse',
-      'B14': 'ProcessClearingRequest',
-      'B15': 'ProcessClearingResponse',
-      'B17': 'ProcessClearingRefresh',
-      'B20': 'StatementRecordAddRequest',
-      'B21': 'StatementRecordAddResponse',
-      'B23': 'StatementRecordAddRefresh',
-      'B24': 'BankAccountListRequest',
-      'B25': 'BankAccountListResponse',
-      'B26': 'StatementRecordsMatchRequest',
-      'B27': 'StatementRecordsMatchResponse',
-      'B28': 'StatementRecordsListRequest',
-      'B29': 'StatementRecordsListResponse',
-
-      # System messages
-      'S0':  'AccessLog',
-
-      'S2':  'AwayMarketTickerRequest',
-      'S3':  'AwayMarketTickerResponse',
-      'S4':  'AwayMarketTickerPublish',
-
-      'S6':  'RestAPIRequest',
-      'S7':  'RestAPIResponse',
-      
-      'S8':  'SetInstrumentDefinitionRequest',
-      'S9':  'SetInstrumentDefinitionResponse',
-
-      'S10': 'DocumentPublish',
-
-      'S12': 'DocumentListRequest',
-      'S13': 'DocumentListResponse',
-        
-      'S14' : 'CryptoWithdrawNetworkFeeTransferRequest',
-      'S15' : 'CryptoWithdrawNetworkFeeTransferResponse',
-      
-      'S16' : 'UserLogonReport',
-      'S17' : 'UserLogonReportAck',
-
-      'S20': 'BrokerCreateRequest',
-      'S21': 'BrokerCreateResponse',
-      'S22': 'BrokersListRequest',
-      'S23': 'BrokersListResponse',
-      'S24': 'BrokerAccountsListRequest',
-      'S25': 'BrokerAccountsListResponse',
-      'S26': 'BrokerDeleteRequest',
-      'S27': 'BrokerDeleteResponse',
-
-      'S30': 'AccountCreateRequest',
-      'S31': 'AccountCreateResponse',
-      'S32': 'AccountDeleteRequest',
-      'S33': 'AccountDeleteResponse',
-
-      'S34': 'GetSystemSavedDataRequest',
-      'S35': 'GetSystemSavedDataResponse',
-
-      'S36': 'SystemSaveDataRequest',
-      'S37': 'SystemSaveDataResponse',
-
-      'S38': 'TradingSessionStatusChangeRequest',
-      'S39': 'TradingSessionStatusChangeResponse',
-
-      'S40': 'SystemCheck2FARequest',
-      'S41': 'SystemCheck2FAResponse',
+      error = InvalidMessageLengthException(raw_message)
+      if _message_metrics is not None:
+        _message_metrics.record_rejection(None, len(raw_message), error)
+      raise error
 
-      # Administrative messages
-      'A0':  'DbQueryRequest',
-      'A1':  'DbQueryResponse',
+    self.type, self.message = self._decode(raw_message)
+    self.valid = True
 
-      'I0': 'UpdateBalanceRequest',
-      'I1': 'UpdateBalanceResponse',
-      'I2': 'FundTransferReport',
-
-      'ERROR': 'ErrorMessage',
-    }
-
-
-    def make_helper_is_message_type( tag):
-      def _method(self):
-        return self.type == tag
-      return _method
-
-    for k,v in self.valid_message_types.iteritems():
-      _method = make_helper_is_message_type(k)
-      setattr(JsonMessage, 'is' + v, _method)
+  def _decode(self, raw_message):
+    if _message_metrics is not None:
+      return self._decode_measured(raw_message, _message_metrics)
 
+    # parse the message
+    message = json_backend.loads(raw_message)
+    msg_type = _pop_message_type(raw_message, message)
 
     #validate Type
-    if self.type not in self.valid_message_types:
-      raise InvalidMessageTypeException(raw_message, self.message, self.type)
+    if msg_type not in self.valid_message_types:
+      raise InvalidMessageTypeException(raw_message, message, msg_type)
 
     # validate all fields
-    if self.type == '0':  #Heartbeat
-      self.raise_exception_if_required_tag_is_missing('TestReqID')
-
-    elif self.type == '1':  # TestRequest
-      self.raise_exception_if_required_tag_is_missing('TestReqID')
-
-    elif self.type == 'V':  #MarketData Request
-      self.raise_exception_if_required_tag_is_missing('MDReqID')
-      self.raise_exception_if_required_tag_is_missing('SubscriptionRequestType')
-      self.raise_exception_if_required_tag_is_missing('MarketDepth')
-
-      subscriptionRequestType = self.message.get('SubscriptionRequestType')
-      if subscriptionRequestType == '1':
-        self.raise_exception_if_required_tag_is_missing('MDUpdateType')
-
-
-      #TODO: Validate all fields of MarketData Request Message
-
-    elif self.type == 'Y':
-      self.raise_exception_if_required_tag_is_missing('MDReqID')
-      #TODO: Validate all fields of MarketData Request Cancel Message
-
-    elif self.type == 'BE':  #logon
-      self.raise_exception_if_required_tag_is_missing('BrokerID')
-      self.raise_exception_if_required_tag_is_missing('UserReqID')
-      self.raise_exception_if_required_tag_is_missing('Username')
-      self.raise_exception_if_not_string('Username')
-      self.raise_exception_if_required_tag_is_missing('UserReqTyp')
-      if self.message.get('BrokerID') == 4:	
-        raise InvalidMessageFieldException(self.raw_message, self.message, "Broker", "FOXBIT")
-
-      reqId = self.message.get('UserReqTyp')
-      if reqId in ('1', '3'):
-        self.raise_exception_if_required_tag_is_missing('Password')
-
-      if reqId == '3':
-        self.raise_exception_if_required_tag_is_missing('NewPassword')
-
-      token = self.message.get('Token')
-      if 'Token' in self.message:
-        if token is None or len(token.strip()) == 0:
-          raise InvalidMessageFieldException(self.raw_message, self.message, "Token", "")
-
-      #TODO: Validate all fields of Logon Message
-
-    elif self.type == 'U0':  #Signup
-      # Username must be between 3 bytes and 10 bytes
-      self.raise_exception_if_required_tag_is_missing('Username')
-      self.raise_exception_if_not_string('Username')
-      self.raise_exception_if_length_is_less_than('Username', 3)
-      self.raise_exception_if_length_is_greater_than('Username', 15)
-      
-      # password is greater than 8 bytes
-      self.raise_exception_if_required_tag_is_missing('Password')
-      self.raise_exception_if_not_string('Password')
-      
-      # check the Email
-      self.raise_exception_if_required_tag_is_missing('Email')
-      self.raise_exception_if_empty('Email')
-      #TODO: create a function to verify the email is valid
-      
-      # check the BrokerID
-      self.raise_exception_if_required_tag_is_missing('BrokerID')
-      self.raise_exception_if_not_a_integer('BrokerID')
-
-      # Disabling Invalid Brokers
-      if self.message.get('BrokerID') not in (-1,8999999,1,3,5,8,9,11):
-        raise InvalidMessageFieldException(self.raw_message, self.message, "Broker", "FOXBIT")
-
-    elif self.type == 'U10':  # Create Password Reset Request
-      self.raise_exception_if_required_tag_is_missing('BrokerID')
-      self.raise_exception_if_required_tag_is_missing('Email')
-
-    elif self.type == 'U12':  # Process Password Reset Request
-      self.raise_exception_if_required_tag_is_missing('Token')
-      self.raise_exception_if_required_tag_is_missing('NewPassword')
-
-    elif self.type == 'U16':  #Enable Disable Two Factor Authentication
-      self.raise_exception_if_required_tag_is_missing('Enable')
-
-    elif self.type == 'U18': # Deposit Request
-      self.raise_exception_if_required_tag_is_missing('DepositReqID')
-      self.raise_exception_if_optional_field_is_a_negative_number('Value')
-
-      if "DepositMethodID" not in self.message and "DepositID" not in self.message  and 'Currency' not in self.message:
-        raise InvalidMessageMissingTagException(self.raw_message, self.message, "DepositID,DepositMethodID,Currency")
-
-    elif self.type == 'U19': # Deposit Response
-      self.raise_exception_if_required_tag_is_missing('DepositReqID')
-      self.raise_exception_if_required_tag_is_missing('DepositID')
-
-
-    elif self.type == 'U20': # Request Deposit Methods
-      self.raise_exception_if_required_tag_is_missing('DepositMethodReqID')
-
-    elif self.type == 'U48': # Deposit Method Request
-      self.raise_exception_if_required_tag_is_missing('DepositMethodReqID')
-      self.raise_exception_if_required_tag_is_missing('DepositMethodID')
-
-
-    elif self.type == 'D':  #New Order Single
-      self.raise_exception_if_required_tag_is_missing('ClOrdID')
-      self.raise_exception_if_not_string('ClOrdID')
-
-      self.raise_exception_if_required_tag_is_missing('Symbol')
-      self.raise_exception_if_empty('Symbol')
-
-      self.raise_exception_if_required_tag_is_missing('Side')
-      self.raise_exception_if_not_in('Side', ( '1', '2' )) # Only BUY and SELL sides
-
-      self.raise_exception_if_required_tag_is_missing('OrdType')
-
-      self.raise_exception_if_not_in('OrdType', ( '1', '2', '3', '4', 'P' )) # market, limited, stop market, stop limited and pegged order
-
-      if self.get('OrdType') == '2':
-        self.raise_exception_if_required_tag_is_missing('Price')  # price is required for limited orders
-        self.raise_exception_if_not_a_integer('Price')
-        self.raise_exception_if_not_greater_than_zero('Price')
-      elif self.get('OrdType') == '3':
-        self.raise_exception_if_required_tag_is_missing('StopPx')  # stop price is required for stop orders
-        self.raise_exception_if_not_a_integer('StopPx')
-        self.raise_exception_if_not_greater_than_zero('StopPx')
-      elif self.get('OrdType') == '4':
-        self.raise_exception_if_required_tag_is_missing('StopPx')  # stop price is required for stop orders
-        self.raise_exception_if_not_a_integer('StopPx')
-        self.raise_exception_if_not_greater_than_zero('StopPx')
-        self.raise_exception_if_required_tag_is_missing('Price')   # price is required for stop limit orders
-        self.raise_exception_if_not_a_integer('Price')
-        self.raise_exception_if_not_greater_than_zero('Price')
-      elif self.get('OrdType') == 'P':
-        self.raise_exception_if_required_tag_is_missing('PegPriceType')
-        self.raise_exception_if_not_a_integer('PegPriceType')
-
-      self.raise_exception_if_required_tag_is_missing('OrderQty')
-      self.raise_exception_if_not_a_integer('OrderQty')
-      self.raise_exception_if_not_greater_than_zero('OrderQty')
-
-      #TODO: Validate all fields of New Order Single Message
-
-    elif self.type == 'B': # News
-      self.raise_exception_if_required_tag_is_missing('Headline')
-      self.raise_exception_if_required_tag_is_missing('LinesOfText')
-      self.raise_exception_if_required_tag_is_missing('Text')
-
-      self.raise_exception_if_empty('Headline')
-      self.raise_exception_if_not_a_integer('LinesOfText')
-      self.raise_exception_if_not_greater_than_zero('LinesOfText')
-      self.raise_exception_if_empty('Text')
-
-    elif self.type == 'C': # Email
-      self.raise_exception_if_required_tag_is_missing('EmailThreadID')
-      self.raise_exception_if_required_tag_is_missing('Subject')
-      self.raise_exception_if_required_tag_is_missing('EmailType')
-
-    elif self.type == 'x': # Security List Request
-      self.raise_exception_if_required_tag_is_missing('SecurityReqID')
-      self.raise_exception_if_required_tag_is_missing('SecurityListRequestType')
-      self.raise_exception_if_not_a_integer('SecurityListRequestType')
-      self.raise_exception_if_not_in('SecurityListRequestType', (0,1,2,3,4))
-
-    elif self.type == 'y': # Security List
-      self.raise_exception_if_required_tag_is_missing('SecurityReqID')
-      self.raise_exception_if_required_tag_is_missing('SecurityResponseID')
-      self.raise_exception_if_required_tag_is_missing('SecurityRequestResult')
-
-    elif self.type == 'F':  #Order Cancel Request
-      has_cl_ord_id = "ClOrdID" in self.message or 'OrigClOrdID' in self.message
-      has_order_id = "OrderID" in self.message
-
-      if not has_cl_ord_id and not has_order_id:
-        self.raise_exception_if_required_tag_is_missing('Side')
-        self.raise_exception_if_not_in('Side', ('1', '2'))
-
-      if has_cl_ord_id:
-        if "ClOrdID" in self.message:
-          self.raise_exception_if_not_string('ClOrdID')
-        if "OrigClOrdID" in self.message:
-          self.raise_exception_if_not_string('OrigClOrdID')
-
-    elif self.type == 'U2' :  # User Balance
-      self.raise_exception_if_required_tag_is_missing('BalanceReqID')
-
-      self.raise_exception_if_not_a_integer('BalanceReqID')
-      self.raise_exception_if_not_greater_than_zero('BalanceReqID')
-
-      #TODO: Validate all fields of Request For Balance Message
-    elif self.type == 'U4': #  Orders List
-      self.raise_exception_if_required_tag_is_missing('OrdersReqID')
-      self.raise_exception_if_empty('OrdersReqID')
-
-    elif self.type == 'U6': # Withdraw Request
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-      self.raise_exception_if_required_tag_is_missing('Amount')
-      self.raise_exception_if_required_tag_is_missing('Currency')
-      self.raise_exception_if_required_tag_is_missing('Method')
-
-      self.raise_exception_if_not_a_integer('WithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('WithdrawReqID')
-
-      self.raise_exception_if_not_a_number('Amount')
-      self.raise_exception_if_not_greater_than_zero('Amount')
-
-      self.raise_exception_if_empty('Method')
-
-      if self.get('Type') == 'CRY':
-        self.raise_exception_if_required_tag_is_missing('Wallet')
-        self.raise_exception_if_empty('Wallet')
-      elif self.get('Type') == 'BBT':
-        self.raise_exception_if_required_tag_is_missing('Amount')
-        self.raise_exception_if_required_tag_is_missing('BankNumber')
-        self.raise_exception_if_required_tag_is_missing('BankName')
-        self.raise_exception_if_required_tag_is_missing('AccountName')
-        self.raise_exception_if_required_tag_is_missing('AccountNumber')
-        self.raise_exception_if_required_tag_is_missing('AccountBranch')
-        self.raise_exception_if_required_tag_is_missing('CPFCNPJ')
-
-        self.raise_exception_if_empty('BankNumber')
-        self.raise_exception_if_empty('BankName')
-        self.raise_exception_if_empty('AccountName')
-        self.raise_exception_if_empty('AccountNumber')
-        self.raise_exception_if_empty('AccountBranch')
-        self.raise_exception_if_empty('CPFCNPJ')
-    elif self.type == 'U7': # WithdrawResponse
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-      self.raise_exception_if_not_a_integer('WithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('WithdrawReqID')
-
-      self.raise_exception_if_required_tag_is_missing('WithdrawID')
-      self.raise_exception_if_not_a_integer('WithdrawID')
-    elif self.type == 'U8': #WithdrawRefresh
-      self.raise_exception_if_required_tag_is_missing('WithdrawID')
-      self.raise_exception_if_not_a_integer('WithdrawID')
-
-
-    elif self.type == 'U24': # WithdrawConfirmationRequest
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-      self.raise_exception_if_not_a_integer('WithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('WithdrawReqID')
-
-    elif self.type == 'U25': # WithdrawConfirmationResponse
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-
-    elif self.type == 'U26': # Withdraw List Request
-      self.raise_exception_if_required_tag_is_missing('WithdrawListReqID')
-      self.raise_exception_if_empty('WithdrawListReqID')
-      self.raise_exception_if_length_is_greater_than('StatusList', len([0, 1, 2, 4, 8])) # 0-Pending, 1-Unconfirmed, 2-In-progress, 4-Complete, 8-Cancelled
-
-    elif self.type == 'U27': # Withdraw List Response
-      self.raise_exception_if_required_tag_is_missing('WithdrawListReqID')
-      self.raise_exception_if_empty('WithdrawListReqID')
-
-    elif self.type == 'U28': # Broker List Request
-      self.raise_exception_if_required_tag_is_missing('BrokerListReqID')
-      self.raise_exception_if_empty('BrokerListReqID')
-    elif self.type == 'U29': # Broker List Response
-      self.raise_exception_if_required_tag_is_missing('BrokerListReqID')
-      self.raise_exception_if_empty('BrokerListReqID')
-
-    elif self.type == 'U30': # DepositList Request
-      self.raise_exception_if_required_tag_is_missing('DepositListReqID')
-      self.raise_exception_if_empty('DepositListReqID')
-      self.raise_exception_if_length_is_greater_than('StatusList', len([0, 1, 2, 4, 8])) # 0-Pending, 1-Unconfirmed, 2-In-progress, 4-Complete, 8-Cancelled
-
-    elif self.type == 'U31': # DepositList Response
-      self.raise_exception_if_required_tag_is_missing('DepositListReqID')
-      self.raise_exception_if_empty('DepositListReqID')
-
-    elif self.type == 'U32': # Trade History Request
-      self.raise_exception_if_required_tag_is_missing('TradeHistoryReqID')
-      self.raise_exception_if_empty('TradeHistoryReqID')
-    elif self.type == 'U33': # Trade History Response
-      self.raise_exception_if_required_tag_is_missing('TradeHistoryReqID')
-      self.raise_exception_if_empty('TradeHistoryReqID')
-
-    elif self.type == 'U34': # LedgerList Request
-      self.raise_exception_if_required_tag_is_missing('LedgerListReqID')
-      self.raise_exception_if_empty('LedgerListReqID')
-    elif self.type == 'U35': # LedgerList Response
-      self.raise_exception_if_required_tag_is_missing('LedgerListReqID')
-      self.raise_exception_if_empty('LedgerListReqID')
-
-
-    elif self.type == 'U38': # Update User Profile Request
-      self.raise_exception_if_required_tag_is_missing('UpdateReqID')
-      self.raise_exception_if_empty('UpdateReqID')
-    elif self.type == 'U39': # Update User Profile Response
-      self.raise_exception_if_required_tag_is_missing('UpdateReqID')
-      self.raise_exception_if_empty('UpdateReqID')
-
-      self.raise_exception_if_required_tag_is_missing('Profile')
-      self.raise_exception_if_empty('Profile')
-
-    elif self.type == 'U40': # Profile Refresh
-      self.raise_exception_if_required_tag_is_missing('Profile')
-      self.raise_exception_if_empty('Profile')
-
-
-    elif self.type == 'U42': # Position Request
-      self.raise_exception_if_required_tag_is_missing('PositionReqID')
-      self.raise_exception_if_empty('PositionReqID')
-
-
-    elif self.type == 'U44': # Confirm Trusted Address Request
-      self.raise_exception_if_required_tag_is_missing('ConfirmTrustedAddressReqID')
-      self.raise_exception_if_empty('ConfirmTrustedAddressReqID')
-    elif self.type == 'U45': # Confirm Trusted Address Response
-      self.raise_exception_if_required_tag_is_missing('ConfirmTrustedAddressReqID')
-      self.raise_exception_if_empty('ConfirmTrustedAddressReqID')
-    elif self.type == 'U46': # Suggest Trusted Address Publish
-      self.raise_exception_if_required_tag_is_missing('SuggestTrustedAddressReqID')
-      self.raise_exception_if_empty('SuggestTrustedAddressReqID')
-
-
-    elif self.type == 'U50': # APIKey List Request
-      self.raise_exception_if_required_tag_is_missing('APIKeyListReqID')
-      self.raise_exception_if_empty('APIKeyListReqID')
-    elif self.type == 'U51': # APIKey List Response
-      self.raise_exception_if_required_tag_is_missing('APIKeyListReqID')
-      self.raise_exception_if_empty('APIKeyListReqID')
-
-    elif self.type == 'U52': # APIKey Create Request
-      self.raise_exception_if_required_tag_is_missing('APIKeyCreateReqID')
-      self.raise_exception_if_required_tag_is_missing('Label')
-      self.raise_exception_if_empty('APIKeyCreateReqID')
-      self.raise_exception_if_empty('Label')
-      
-    elif self.type == 'U53': # APIKey Create Response
-      self.raise_exception_if_required_tag_is_missing('APIKeyCreateReqID')
-      self.raise_exception_if_required_tag_is_missing('APIKey')
-      self.raise_exception_if_required_tag_is_missing('APISecret')
-      self.raise_exception_if_required_tag_is_missing('APIPassword')
-      self.raise_exception_if_empty('APIKey')
-      self.raise_exception_if_empty('APISecret')
-      self.raise_exception_if_empty('APIPassword')
+    validator = _MESSAGE_VALIDATORS.get(msg_type)
+    if validator is not None:
+      validator(raw_message, message)
 
+    return msg_type, message
 
-    elif self.type == 'U54': # APIKey Revoke Request
-      self.raise_exception_if_required_tag_is_missing('APIKeyRevokeReqID')
-      self.raise_exception_if_required_tag_is_missing('APIKey')
-      self.raise_exception_if_empty('APIKeyRevokeReqID')
-      self.raise_exception_if_empty('APIKey')
-    elif self.type == 'U55': # APIKey Revoke Response
-      self.raise_exception_if_required_tag_is_missing('APIKeyRevokeReqID')
-      self.raise_exception_if_empty('APIKeyRevokeReqID')
+  def _decode_measured(self, raw_message, metrics):
+    msg_type = None
+    try:
+      start = _timer()
+      message = json_backend.loads(raw_message)
+      parsed = _timer()
 
+      msg_type = _pop_message_type(raw_message, message)
+      if msg_type not in self.valid_message_types:
+        raise InvalidMessageTypeException(raw_message, message, msg_type)
 
-    elif self.type == 'U70': # Cancel Withdrawal Request
-      self.raise_exception_if_required_tag_is_missing('WithdrawCancelReqID')
-      self.raise_exception_if_required_tag_is_missing('WithdrawID')
+      validator = _MESSAGE_VALIDATORS.get(msg_type)
+      if validator is not None:
+        validator(raw_message, message)
+    except (InvalidMessageException, ValueError) as e:
+      metrics.record_rejection(msg_type, len(raw_message), e)
+      raise
 
-      self.raise_exception_if_empty('WithdrawCancelReqID')
-      self.raise_exception_if_not_a_integer('WithdrawID')
+    metrics.record_message(msg_type, len(raw_message), parsed - start, _timer() - parsed)
+    return msg_type, message
 
-    elif self.type == 'U72': # Card List Request
-      self.raise_exception_if_required_tag_is_missing('CardListReqID')
-      self.raise_exception_if_empty('CardListReqID')
-
-    elif self.type == 'U74': # Card Create Request
-      self.raise_exception_if_required_tag_is_missing('CardCreateReqID')
-      self.raise_exception_if_required_tag_is_missing('Instructions')
-      self.raise_exception_if_empty('CardCreateReqID')
-
-      self.raise_exception_if_empty('Instructions')
-
-    elif self.type == 'U76': # Card Disable Response
-      self.raise_exception_if_required_tag_is_missing('CardDisableReqID')
-      self.raise_exception_if_required_tag_is_missing('CardID')
-      self.raise_exception_if_empty('CardDisableReqID')
-      self.raise_exception_if_empty('CardID')
-
-    elif self.type == 'U78': # WithdrawCommentRequest WithdrawReqID
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-      self.raise_exception_if_not_a_integer('WithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('WithdrawReqID')
-      self.raise_exception_if_required_tag_is_missing('WithdrawID')
-      self.raise_exception_if_required_tag_is_missing('Message')
-
-    elif self.type == 'U79': # WithdrawCommentResponse
-      self.raise_exception_if_required_tag_is_missing('WithdrawReqID')
-      self.raise_exception_if_required_tag_is_missing('WithdrawID')
-
-
-
-    elif self.type == 'B0': # Deposit Payment Confirmation
-      self.raise_exception_if_required_tag_is_missing('ProcessDepositReqID')
-      self.raise_exception_if_empty('ProcessDepositReqID')
-
-      self.raise_exception_if_required_tag_is_missing('Action')
-      self.raise_exception_if_not_in('Action', ['CONFIRM', 'CANCEL', 'PROGRESS', 'COMPLETE', 'MATCH'])
-
-
-    elif self.type == 'B2': # Customer List Request
-      self.raise_exception_if_required_tag_is_missing('CustomerListReqID')
-      self.raise_exception_if_empty('CustomerListReqID')
-
-      pass
-    elif self.type == 'B3': # Customer List Response
-      pass
-
-    elif self.type == 'B4': # Customer Detail Request
-      pass
-    elif self.type == 'B5': # Customer Detail Response
-      pass
-
-    elif self.type == 'B6': # Process Withdraw
-      self.raise_exception_if_required_tag_is_missing('ProcessWithdrawReqID')
-      self.raise_exception_if_not_a_integer('ProcessWithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('ProcessWithdrawReqID')
-
-      if 'StatementRecordID' not in self.message or self.get('Action') != 'MATCH':
-        self.raise_exception_if_required_tag_is_missing('WithdrawID')
-        self.raise_exception_if_not_a_integer('WithdrawID')
-        self.raise_exception_if_not_greater_than_zero('WithdrawID')
-
-      self.raise_exception_if_required_tag_is_missing('Action')
-      self.raise_exception_if_not_in('Action', ['CANCEL', 'PROGRESS', 'COMPLETE', 'MATCH'])
-
-
-    elif self.type == 'B7': # Process Withdraw
-      self.raise_exception_if_required_tag_is_missing('ProcessWithdrawReqID')
-      self.raise_exception_if_not_a_integer('ProcessWithdrawReqID')
-      self.raise_exception_if_not_greater_than_zero('ProcessWithdrawReqID')
-      self.raise_exception_if_required_tag_is_missing('Status')
-
-    elif self.type == 'B8': # Verify Customer Request
-      self.raise_exception_if_required_tag_is_missing('VerifyCustomerReqID')
-      self.raise_exception_if_required_tag_is_missing('ClientID')
-      self.raise_exception_if_required_tag_is_missing('Verify')
-
-      self.raise_exception_if_not_a_integer('VerifyCustomerReqID')
-      self.raise_exception_if_not_greater_than_zero('VerifyCustomerReqID')
-
-      self.raise_exception_if_not_a_integer('Verify')
-      self.raise_exception_if_not_in('Verify', [0,1,2,3,4,5])
-
-      self.raise_exception_if_not_a_integer('ClientID')
-      self.raise_exception_if_not_greater_than_zero('ClientID')
-
-      if 'VerificationData' in self.message:
-        self.raise_exception_if_empty('VerificationData')
-
-    elif self.type == 'B9': # Verify Customer Response
-      self.raise_exception_if_required_tag_is_missing('VerifyCustomerReqID')
-      
-    elif self.type == 'B12': # Clearing History Request
-      self.raise_exception_if_required_tag_is_missing('ClearingHistoryReqID')
-      self.raise_exception_if_required_tag_is_missing('Page')
-      self.raise_exception_if_required_tag_is_missing('PageSize')
-      self.raise_exception_if_not_a_integer('ClearingHistoryReqID')
-      self.raise_exception_if_not_a_integer('Page')
-      self.raise_exception_if_not_a_integer('PageSize')
-    
-    elif self.type == 'B13': # Clearing History Response
-      self.raise_exception_if_required_tag_is_missing('ClearingHistoryReqID')
-    
-    elif self.type == 'B14': # Process Clearing Request
-      self.raise_exception_if_required_tag_is_missing('ProcessClearingReqID')
-      self.raise_exception_if_required_tag_is_missing('Action')
-    
-    elif self.type == 'B15': # Process Clearing Response
-      self.raise_exception_if_required_tag_is_missing('ProcessClearingReqID')
-      self.raise_exception_if_required_tag_is_missing('ClearingProcessID')
-      self.raise_exception_if_required_tag_is_missing('ClearingStatus')
-      self.raise_exception_if_required_tag_is_missing('PartyBrokerID')
-      self.raise_exception_if_required_tag_is_missing('CounterPartyBrokerID')
-      self.raise_exception_if_required_tag_is_missing('PartyBrokerSettlementAccount')
-      self.raise_exception_if_required_tag_is_missing('CounterPartyBrokerSettlementAccount')
-      
-    
-    elif self.type == 'B17': # Process Clearing Refresh
-      self.raise_exception_if_required_tag_is_missing('ClearingProcessID')
-      self.raise_exception_if_required_tag_is_missing('ClearingStatus')
-      self.raise_exception_if_required_tag_is_missing('PartyBrokerID')
-      self.raise_exception_if_required_tag_is_missing('CounterPartyBrokerID')
-      self.raise_exception_if_required_tag_is_missing('PartyBrokerSettlementAccount')
-      self.raise_exception_if_required_tag_is_missing('CounterPartyBrokerSettlementAccount')
-
-    elif self.type == 'B20': # Add Bank Statement Record 
-      self.raise_exception_if_required_tag_is_missing('StatementRecordAddReqID')
-      self.raise_exception_if_required_tag_is_missing('StatementRecordID')
-      self.raise_exception_if_required_tag_is_missing('BankAccountCode')
-      self.raise_exception_if_required_tag_is_missing('DateTime')
-      self.raise_exception_if_required_tag_is_missing('Amount')
-      self.raise_exception_if_required_tag_is_missing('Operation')
-      self.raise_exception_if_not_a_integer('StatementRecordID')
-      self.raise_exception_if_not_a_integer('Amount')
-      self.raise_exception_if_not_greater_than_zero('Amount')
-
-    elif self.type == 'B24': # Bank Account List Request
-      self.raise_exception_if_required_tag_is_missing('BankAccountListReqID')
-
-    elif self.type == 'B26': # Match Statement Records Request 
-      self.raise_exception_if_required_tag_is_missing('MatchStmntRcrdsReqID')
-      self.raise_exception_if_required_tag_is_missing('SR1ID')
-      self.raise_exception_if_required_tag_is_missing('SR2ID')
-
-    elif self.type == 'B28': # Statement Record List Request
-      self.raise_exception_if_required_tag_is_missing('StatementRecordListReqID')
-
-    elif self.type == 'S2': # Away Market Ticker Request
-      self.raise_exception_if_required_tag_is_missing('AwayMarketTickerReqID')
-      self.raise_exception_if_required_tag_is_missing('Market')
-      self.raise_exception_if_required_tag_is_missing('Symbol')
-      self.raise_exception_if_required_tag_is_missing('BestBid')
-      self.raise_exception_if_required_tag_is_missing('BestAsk')
-      self.raise_exception_if_required_tag_is_missing('LastPx')
-      self.raise_exception_if_required_tag_is_missing('HighPx')
-      self.raise_exception_if_required_tag_is_missing('LowPx')
-      self.raise_exception_if_required_tag_is_missing('Volume')
-      self.raise_exception_if_required_tag_is_missing('VWAP')
-
-      self.raise_exception_if_not_a_integer('AwayMarketTickerReqID')
-      self.raise_exception_if_empty('Market')
-      self.raise_exception_if_empty('Symbol')
-      self.raise_exception_if_not_a_integer('BestBid')
-      self.raise_exception_if_not_a_integer('BestBid')
-      self.raise_exception_if_not_a_integer('BestAsk')
-      self.raise_exception_if_not_a_integer('LastPx')
-      self.raise_exception_if_not_a_integer('HighPx')
-      self.raise_exception_if_not_a_integer('LowPx')
-      self.raise_exception_if_not_a_integer('Volume')
-      self.raise_exception_if_not_a_integer('VWAP')
-
-
-    elif self.type == 'S6': #Rest Api Request
-      self.raise_exception_if_required_tag_is_missing('RestAPIReqID')
-      self.raise_exception_if_required_tag_is_missing('APIKey')
-      self.raise_exception_if_required_tag_is_missing('Signature')
-      self.raise_exception_if_required_tag_is_missing('Payload')
-      self.raise_exception_if_required_tag_is_missing('DigestMod')
-      self.raise_exception_if_required_tag_is_missing('Nonce')
-      self.raise_exception_if_required_tag_is_missing('Message')
-      self.raise_exception_if_required_tag_is_missing('RemoteIP')
-
-      self.raise_exception_if_not_a_integer('RestAPIReqID')
-      self.raise_exception_if_empty('APIKey')
-      self.raise_exception_if_empty('Signature')
-      self.raise_exception_if_empty('Payload')
-      self.raise_exception_if_empty('DigestMod')
-      self.raise_exception_if_not_a_integer('Nonce')
-      self.raise_exception_if_not_greater_than_zero('Nonce')
-      self.raise_exception_if_empty('Message')
-      self.raise_exception_if_empty('RemoteIP')
-      
-    elif self.type == 'S8': #Set/Update Instrument definition
-      self.raise_exception_if_required_tag_is_missing('UpdateReqID')
-      self.raise_exception_if_required_tag_is_missing('Symbol')
-      self.raise_exception_if_required_tag_is_missing('MinPrice')
-      self.raise_exception_if_required_tag_is_missing('MaxPrice')
-      
-      self.raise_exception_if_not_a_integer('UpdateReqID')
-      self.raise_exception_if_not_a_integer('MinPrice')
-      self.raise_exception_if_not_a_integer('MaxPrice')
-   
-    elif self.type == 'S9': #Instrument definition
-      self.raise_exception_if_required_tag_is_missing('UpdateReqID')
-      self.raise_exception_if_required_tag_is_missing('Symbol')
-
-    elif self.type == 'S12': #Document List Request
-      self.raise_exception_if_required_tag_is_missing('DocumentListReqID')
-      self.raise_exception_if_required_tag_is_missing('Page')
-      self.raise_exception_if_required_tag_is_missing('PageSize')
-      self.raise_exception_if_required_tag_is_missing('DocumentName')
-      self.raise_exception_if_required_tag_is_missing('Since')
-      self.raise_exception_if_not_a_integer('DocumentListReqID')
-      self.raise_exception_if_not_a_integer('Page')
-      self.raise_exception_if_not_a_integer('PageSize')
-      self.raise_exception_if_empty('DocumentName')
-      self.raise_exception_if_not_a_integer('Since')
-      
-    elif self.type == 'S14': # Crypto Network Fee Charge Request
-      self.raise_exception_if_required_tag_is_missing('CryptoNetworkFeeChargeReqID')
-      self.raise_exception_if_required_tag_is_missing('ClientID')
-      self.raise_exception_if_required_tag_is_missing('Currency')
-      self.raise_exception_if_required_tag_is_missing('Amount')
-      
-      self.raise_exception_if_not_a_integer('Amount')
-      self.raise_exception_if_not_greater_than_zero('Amount')
-    
-    elif self.type == 'S16':  # User Logon Report
-      self.raise_exception_if_required_tag_is_missing('LogonRptReqID')
-      self.raise_exception_if_required_tag_is_missing('UserReqID')
-      self.raise_exception_if_required_tag_is_missing('BrokerID')
-      self.raise_exception_if_required_tag_is_missing('ClientID')
-      self.raise_exception_if_required_tag_is_missing('IsApiKey')
-      #self.raise_exception_if_required_tag_is_missing('UserReqType')
-      #self.raise_exception_if_required_tag_is_missing('CancelOnDisconnect')
-      #self.raise_exception_if_required_tag_is_missing('PermissionList')
-
-    elif self.type == 'S34': #GetSystemSavedData
-      self.raise_exception_if_required_tag_is_missing("GetSystemSavedDataReqID")
-      self.raise_exception_if_not_a_integer('GetSystemSavedDataReqID')
-      self.raise_exception_if_required_tag_is_missing("Key")
-      self.raise_exception_if_not_string("Key")
-
-
-    elif self.type == 'S36':  # SystemSaveData
-      self.raise_exception_if_required_tag_is_missing("SystemSaveDataReqID")
-      self.raise_exception_if_not_a_integer('SystemSaveDataReqID')
-      self.raise_exception_if_required_tag_is_missing("Key")
-      self.raise_exception_if_not_string("Key")
-      self.raise_exception_if_required_tag_is_missing("Data")
-      self.raise_exception_if_not_string("Data")
-
-    elif self.type == 'S38':  # TradingSessionStatusChangeRequest
-      self.raise_exception_if_required_tag_is_missing("ReqID")
-      self.raise_exception_if_required_tag_is_missing("TradSesStatus")
-      self.raise_exception_if_not_a_integer("TradSesStatus")
-
-    elif self.type == 'S40':  # SystemCheck2FARequest
-      self.raise_exception_if_required_tag_is_missing("SessionID")
-      self.raise_exception_if_required_tag_is_missing("SecondFactor")
-      self.raise_exception_if_not_string("SecondFactor")
-
-    
+  def is_valid(self):
+    return self.valid
+
+  @classmethod
+  def from_dict(cls, message):
+    """
+    Builds a validated JsonMessage out of an already decoded message. The raw
+    message is only serialized if it is read.
+    """
+    message = dict(message)
+    msg_type = message.pop('MsgType', None)
+    if msg_type is None:
+      raise InvalidMessageTypeException(None, message)
+    validate_message(msg_type, message)
+
+    json_message = cls.__new__(cls)
+    json_message.valid = True
+    json_message.type = msg_type
+    json_message.message = message
+    json_message._raw_message_dirty = True
+    return json_message
 
   def __contains__(self, value):
     return value in self.message
@@ -969,5 +596,883 @@ class JsonMessage(BaseMessage):
 
   def set(self, attr, value):
     self.message[attr] = value
-    self.raw_message = json.dumps(  dict(self.message.items()  +  {'MsgType' : self.type}.items() ) )
+    self._raw_message_dirty = True
+    return self
+
+  def update(self, fields):
+    self.message.update(fields)
+    self._raw_message_dirty = True
     return self
+
+  # raw_message is only serialized again when it is read after a change
+  _raw_message_dirty = False
+
+  @property
+  def raw_message(self):
+    if self._raw_message_dirty:
+      self._raw_message = json_backend.dumps(dict(self.message, MsgType=self.type))
+      self._raw_message_dirty = False
+    return self._raw_message
+
+  @raw_message.setter
+  def raw_message(self, raw_message):
+    self._raw_message = raw_message
+    self._raw_message_dirty = False
+
+
+_PEEK_WHITESPACE = ' \t\r\n'
+_PEEK_STRING = re.compile(r'"[^"]*"')
+_PEEK_DECODER = json.JSONDecoder()
+_PEEK_AMBIGUOUS = object()
+_PEEK_NOT_A_KEY = object()
+
+def _is_top_level_key(prefix):
+  if '\\' in prefix:
+    return _PEEK_AMBIGUOUS
+  if prefix.count('"') % 2:
+    return False
+  prefix = _PEEK_STRING.sub('', prefix)
+  return prefix.count('{') - prefix.count('}') == 1 and prefix.count('[') == prefix.count(']')
+
+def _peek_value(raw_message, pos):
+  length = len(raw_message)
+  while pos < length and raw_message[pos] in _PEEK_WHITESPACE:
+    pos += 1
+  if pos == length or raw_message[pos] != ':':
+    return _PEEK_NOT_A_KEY, pos
+  pos += 1
+  while pos < length and raw_message[pos] in _PEEK_WHITESPACE:
+    pos += 1
+
+  # plain strings are sliced straight out of the raw message
+  if raw_message[pos:pos + 1] == '"':
+    end = raw_message.find('"', pos + 1)
+    if end != -1 and raw_message.find('\\', pos + 1, end) == -1:
+      return raw_message[pos + 1:end], end + 1
+  return _PEEK_DECODER.raw_decode(raw_message, pos)
+
+def _peek_field(raw_message, tag):
+  key = '"%s"' % tag
+  pos = raw_message.find(key)
+  while pos != -1:
+    # only a key of the top level object counts
+    prefix = raw_message[:pos]
+    top_level = prefix.strip() == '{' or _is_top_level_key(prefix)
+    if top_level is _PEEK_AMBIGUOUS:
+      return _PEEK_AMBIGUOUS
+
+    if top_level:
+      value, end = _peek_value(raw_message, pos + len(key))
+      if value is not _PEEK_NOT_A_KEY:
+        if raw_message.find(key, end) != -1:
+          return _PEEK_AMBIGUOUS
+        return value
+    pos = raw_message.find(key, pos + 1)
+  return None
+
+def peek_field(raw_message, tag, default=None):
+  """
+  Returns the value of a top level tag of the raw message without decoding
+  the whole message. Falls back to a full decode when the raw message is
+  ambiguous (escaped strings or repeated tags).
+  """
+  if not isinstance(raw_message, _STRING_TYPES):
+    raw_message = raw_message.decode('utf-8')
+
+  value = _peek_field(raw_message, tag)
+  if value is _PEEK_AMBIGUOUS:
+    message = json_backend.loads(raw_message)
+    return message.get(tag, default) if isinstance(message, dict) else default
+  if value is None:
+    return default
+  return value
+
+def peek_message_type(raw_message):
+  return peek_field(raw_message, 'MsgType')
+
+
+class LazyJsonMessage(JsonMessage):
+  """
+  JsonMessage which only extracts the MsgType on construction. The message is
+  decoded and validated on the first field access or call to is_valid().
+  """
+  def __init__(self, raw_message):
+    BaseMessage.__init__(self, raw_message)
+    self.valid = False
+    self._message = None
+    self._error = None
+
+    # make sure a malicious users didn't send us more than 4096 bytes
+    if len(raw_message) > self.MAX_MESSAGE_LENGTH:
+      raise InvalidMessageLengthException(raw_message)
+
+    self.type = peek_message_type(raw_message)
+    if self.type is None:
+      raise InvalidMessageTypeException(raw_message)
+    if not isinstance(self.type, _STRING_TYPES) or self.type not in self.valid_message_types:
+      raise InvalidMessageTypeException(raw_message, None, self.type)
+
+  @property
+  def message(self):
+    if self._message is None:
+      if self._error is not None:
+        raise self._error
+      try:
+        self.type, self._message = self._decode(self.raw_message)
+      except (InvalidMessageException, ValueError) as e:
+        self._error = e
+        raise
+      self.valid = True
+    return self._message
+
+  @message.setter
+  def message(self, message):
+    # set by from_dict, with an already validated message
+    self._message = message
+    self._error = None
+
+  @property
+  def decoded(self):
+    return self._message is not None
+
+  def is_valid(self):
+    try:
+      self.message
+    except (InvalidMessageException, ValueError):
+      return False
+    return True
+
+  def peek(self, tag, default=None):
+    if self._message is not None:
+      return self._message.get(tag, default)
+    return peek_field(self.raw_message, tag, default)
+
+
+def _reject_disabled_logon_broker(raw_message, message):
+  if message.get('BrokerID') == 4:
+    raise InvalidMessageFieldException(raw_message, message, "Broker", "FOXBIT")
+
+def _reject_empty_token(raw_message, message):
+  if 'Token' in message:
+    token = message.get('Token')
+    if type(token) not in _STRING_TYPES or len(token.strip()) == 0:
+      raise InvalidMessageFieldException(raw_message, message, "Token", "")
+
+def _reject_disabled_signup_broker(raw_message, message):
+  # Disabling Invalid Brokers
+  if message.get('BrokerID') not in (-1,8999999,1,3,5,8,9,11):
+    raise InvalidMessageFieldException(raw_message, message, "Broker", "FOXBIT")
+
+
+MESSAGE_SCHEMAS = {
+  '0': [ # Heartbeat
+    ('required', 'TestReqID'),
+  ],
+
+  '1': [ # TestRequest
+    ('required', 'TestReqID'),
+  ],
+
+  'V': [ # MarketData Request
+    ('required', 'MDReqID'),
+    ('required', 'SubscriptionRequestType'),
+    ('required', 'MarketDepth'),
+    ('when', ('SubscriptionRequestType', '1'), [
+      ('required', 'MDUpdateType'),
+    ]),
+    #TODO: Validate all fields of MarketData Request Message
+  ],
+
+  'Y': [ # MarketData Request Reject
+    ('required', 'MDReqID'),
+  ],
+
+  'BE': [ # logon
+    ('required', 'BrokerID'),
+    ('required', 'UserReqID'),
+    ('required', 'Username'),
+    ('string', 'Username'),
+    ('required', 'UserReqTyp'),
+    ('check', _reject_disabled_logon_broker),
+    ('when', lambda message: message.get('UserReqTyp') in ('1', '3'), [
+      ('required', 'Password'),
+    ]),
+    ('when', ('UserReqTyp', '3'), [
+      ('required', 'NewPassword'),
+    ]),
+    ('check', _reject_empty_token),
+  ],
+
+  'U0': [ # Signup
+    # Username must be between 3 bytes and 15 bytes
+    ('required', 'Username'),
+    ('string', 'Username'),
+    ('min_length', 'Username', 3),
+    ('max_length', 'Username', 15),
+    ('required', 'Password'),
+    ('string', 'Password'),
+    ('required', 'Email'),
+    ('not_empty', 'Email'),
+    ('required', 'BrokerID'),
+    ('int', 'BrokerID'),
+    ('check', _reject_disabled_signup_broker),
+  ],
+
+  'U10': [ # Create Password Reset Request
+    ('required', 'BrokerID'),
+    ('required', 'Email'),
+  ],
+
+  'U12': [ # Process Password Reset Request
+    ('required', 'Token'),
+    ('required', 'NewPassword'),
+  ],
+
+  'U16': [ # Enable Disable Two Factor Authentication
+    ('required', 'Enable'),
+  ],
+
+  'U18': [ # Deposit Request
+    ('required', 'DepositReqID'),
+    ('non_negative', 'Value'),
+    ('any_of', 'DepositID', 'DepositMethodID', 'Currency'),
+  ],
+
+  'U19': [ # Deposit Response
+    ('required', 'DepositReqID'),
+    ('required', 'DepositID'),
+  ],
+
+  'U20': [ # Request Deposit Methods
+    ('required', 'DepositMethodReqID'),
+  ],
+
+  'U48': [ # Deposit Method Request
+    ('required', 'DepositMethodReqID'),
+    ('required', 'DepositMethodID'),
+  ],
+
+  'D': [ # New Order Single
+    ('required', 'ClOrdID'),
+    ('string', 'ClOrdID'),
+    ('required', 'Symbol'),
+    ('not_empty', 'Symbol'),
+    ('required', 'Side'),
+    ('in', 'Side', ('1', '2')), # Only BUY and SELL sides
+    ('required', 'OrdType'),
+    ('in', 'OrdType', ('1', '2', '3', '4', 'P')), # market, limited, stop market, stop limited and pegged order
+    ('when', ('OrdType', '2'), [ # price is required for limited orders
+      ('required', 'Price'),
+      ('int', 'Price'),
+      ('positive', 'Price'),
+    ]),
+    ('when', ('OrdType', '3'), [ # stop price is required for stop orders
+      ('required', 'StopPx'),
+      ('int', 'StopPx'),
+      ('positive', 'StopPx'),
+    ]),
+    ('when', ('OrdType', '4'), [ # stop price and price are required for stop limit orders
+      ('required', 'StopPx'),
+      ('int', 'StopPx'),
+      ('positive', 'StopPx'),
+      ('required', 'Price'),
+      ('int', 'Price'),
+      ('positive', 'Price'),
+    ]),
+    ('when', ('OrdType', 'P'), [
+      ('required', 'PegPriceType'),
+      ('int', 'PegPriceType'),
+    ]),
+    ('required', 'OrderQty'),
+    ('int', 'OrderQty'),
+    ('positive', 'OrderQty'),
+    #TODO: Validate all fields of New Order Single Message
+  ],
+
+  'B': [ # News
+    ('required', 'Headline'),
+    ('required', 'LinesOfText'),
+    ('required', 'Text'),
+    ('not_empty', 'Headline'),
+    ('int', 'LinesOfText'),
+    ('positive', 'LinesOfText'),
+    ('not_empty', 'Text'),
+  ],
+
+  'C': [ # Email
+    ('required', 'EmailThreadID'),
+    ('required', 'Subject'),
+    ('required', 'EmailType'),
+  ],
+
+  'x': [ # Security List Request
+    ('required', 'SecurityReqID'),
+    ('required', 'SecurityListRequestType'),
+    ('int', 'SecurityListRequestType'),
+    ('in', 'SecurityListRequestType', (0,1,2,3,4)),
+  ],
+
+  'y': [ # Security List
+    ('required', 'SecurityReqID'),
+    ('required', 'SecurityResponseID'),
+    ('required', 'SecurityRequestResult'),
+  ],
+
+  'F': [ # Order Cancel Request
+    ('when', lambda message: 'ClOrdID' not in message and 'OrigClOrdID' not in message and 'OrderID' not in message, [
+      ('required', 'Side'),
+      ('in', 'Side', ('1', '2')),
+    ]),
+    ('present', 'ClOrdID', [
+      ('string', 'ClOrdID'),
+    ]),
+    ('present', 'OrigClOrdID', [
+      ('string', 'OrigClOrdID'),
+    ]),
+  ],
+
+  'U2': [ # User Balance
+    ('required', 'BalanceReqID'),
+    ('int', 'BalanceReqID'),
+    ('positive', 'BalanceReqID'),
+    #TODO: Validate all fields of Request For Balance Message
+  ],
+
+  'U4': [ # Orders List
+    ('required', 'OrdersReqID'),
+    ('not_empty', 'OrdersReqID'),
+  ],
+
+  'U6': [ # Withdraw Request
+    ('required', 'WithdrawReqID'),
+    ('required', 'Amount'),
+    ('required', 'Currency'),
+    ('required', 'Method'),
+    ('int', 'WithdrawReqID'),
+    ('positive', 'WithdrawReqID'),
+    ('number', 'Amount'),
+    ('positive', 'Amount'),
+    ('not_empty', 'Method'),
+    ('when', ('Type', 'CRY'), [
+      ('required', 'Wallet'),
+      ('not_empty', 'Wallet'),
+    ]),
+    ('when', ('Type', 'BBT'), [
+      ('required', 'Amount'),
+      ('required', 'BankNumber'),
+      ('required', 'BankName'),
+      ('required', 'AccountName'),
+      ('required', 'AccountNumber'),
+      ('required', 'AccountBranch'),
+      ('required', 'CPFCNPJ'),
+      ('not_empty', 'BankNumber'),
+      ('not_empty', 'BankName'),
+      ('not_empty', 'AccountName'),
+      ('not_empty', 'AccountNumber'),
+      ('not_empty', 'AccountBranch'),
+      ('not_empty', 'CPFCNPJ'),
+    ]),
+  ],
+
+  'U7': [ # WithdrawResponse
+    ('required', 'WithdrawReqID'),
+    ('int', 'WithdrawReqID'),
+    ('positive', 'WithdrawReqID'),
+    ('required', 'WithdrawID'),
+    ('int', 'WithdrawID'),
+  ],
+
+  'U24': [ # WithdrawConfirmationRequest
+    ('required', 'WithdrawReqID'),
+    ('int', 'WithdrawReqID'),
+    ('positive', 'WithdrawReqID'),
+  ],
+
+  'U25': [ # WithdrawConfirmationResponse
+    ('required', 'WithdrawReqID'),
+  ],
+
+  'U26': [ # Withdraw List Request
+    ('required', 'WithdrawListReqID'),
+    ('not_empty', 'WithdrawListReqID'),
+    ('max_length', 'StatusList', len([0, 1, 2, 4, 8])), # 0-Pending, 1-Unconfirmed, 2-In-progress, 4-Complete, 8-Cancelled
+  ],
+
+  'U27': [ # Withdraw List Response
+    ('required', 'WithdrawListReqID'),
+    ('not_empty', 'WithdrawListReqID'),
+  ],
+
+  'U28': [ # Broker List Request
+    ('required', 'BrokerListReqID'),
+    ('not_empty', 'BrokerListReqID'),
+  ],
+
+  'U29': [ # Broker List Response
+    ('required', 'BrokerListReqID'),
+    ('not_empty', 'BrokerListReqID'),
+  ],
+
+  'U30': [ # DepositList Request
+    ('required', 'DepositListReqID'),
+    ('not_empty', 'DepositListReqID'),
+    ('max_length', 'StatusList', len([0, 1, 2, 4, 8])), # 0-Pending, 1-Unconfirmed, 2-In-progress, 4-Complete, 8-Cancelled
+  ],
+
+  'U31': [ # DepositList Response
+    ('required', 'DepositListReqID'),
+    ('not_empty', 'DepositListReqID'),
+  ],
+
+  'U32': [ # Trade History Request
+    ('required', 'TradeHistoryReqID'),
+    ('not_empty', 'TradeHistoryReqID'),
+  ],
+
+  'U33': [ # Trade History Response
+    ('required', 'TradeHistoryReqID'),
+    ('not_empty', 'TradeHistoryReqID'),
+  ],
+
+  'U34': [ # LedgerList Request
+    ('required', 'LedgerListReqID'),
+    ('not_empty', 'LedgerListReqID'),
+  ],
+
+  'U35': [ # LedgerList Response
+    ('required', 'LedgerListReqID'),
+    ('not_empty', 'LedgerListReqID'),
+  ],
+
+  'U38': [ # Update User Profile Request
+    ('required', 'UpdateReqID'),
+    ('not_empty', 'UpdateReqID'),
+  ],
+
+  'U39': [ # Update User Profile Response
+    ('required', 'UpdateReqID'),
+    ('not_empty', 'UpdateReqID'),
+    ('required', 'Profile'),
+    ('not_empty', 'Profile'),
+  ],
+
+  'U40': [ # Profile Refresh
+    ('required', 'Profile'),
+    ('not_empty', 'Profile'),
+  ],
+
+  'U42': [ # Position Request
+    ('required', 'PositionReqID'),
+    ('not_empty', 'PositionReqID'),
+  ],
+
+  'U44': [ # Confirm Trusted Address Request
+    ('required', 'ConfirmTrustedAddressReqID'),
+    ('not_empty', 'ConfirmTrustedAddressReqID'),
+  ],
+
+  'U45': [ # Confirm Trusted Address Response
+    ('required', 'ConfirmTrustedAddressReqID'),
+    ('not_empty', 'ConfirmTrustedAddressReqID'),
+  ],
+
+  'U46': [ # Suggest Trusted Address Publish
+    ('required', 'SuggestTrustedAddressReqID'),
+    ('not_empty', 'SuggestTrustedAddressReqID'),
+  ],
+
+  'U50': [ # APIKey List Request
+    ('required', 'APIKeyListReqID'),
+    ('not_empty', 'APIKeyListReqID'),
+  ],
+
+  'U51': [ # APIKey List Response
+    ('required', 'APIKeyListReqID'),
+    ('not_empty', 'APIKeyListReqID'),
+  ],
+
+  'U52': [ # APIKey Create Request
+    ('required', 'APIKeyCreateReqID'),
+    ('required', 'Label'),
+    ('not_empty', 'APIKeyCreateReqID'),
+    ('not_empty', 'Label'),
+  ],
+
+  'U53': [ # APIKey Create Response
+    ('required', 'APIKeyCreateReqID'),
+    ('required', 'APIKey'),
+    ('required', 'APISecret'),
+    ('required', 'APIPassword'),
+    ('not_empty', 'APIKey'),
+    ('not_empty', 'APISecret'),
+    ('not_empty', 'APIPassword'),
+  ],
+
+  'U54': [ # APIKey Revoke Request
+    ('required', 'APIKeyRevokeReqID'),
+    ('required', 'APIKey'),
+    ('not_empty', 'APIKeyRevokeReqID'),
+    ('not_empty', 'APIKey'),
+  ],
+
+  'U55': [ # APIKey Revoke Response
+    ('required', 'APIKeyRevokeReqID'),
+    ('not_empty', 'APIKeyRevokeReqID'),
+  ],
+
+  'U70': [ # Cancel Withdrawal Request
+    ('required', 'WithdrawCancelReqID'),
+    ('required', 'WithdrawID'),
+    ('not_empty', 'WithdrawCancelReqID'),
+    ('int', 'WithdrawID'),
+  ],
+
+  'U72': [ # Card List Request
+    ('required', 'CardListReqID'),
+    ('not_empty', 'CardListReqID'),
+  ],
+
+  'U74': [ # Card Create Request
+    ('required', 'CardCreateReqID'),
+    ('required', 'Instructions'),
+    ('not_empty', 'CardCreateReqID'),
+    ('not_empty', 'Instructions'),
+  ],
+
+  'U76': [ # Card Disable Request
+    ('required', 'CardDisableReqID'),
+    ('required', 'CardID'),
+    ('not_empty', 'CardDisableReqID'),
+    ('not_empty', 'CardID'),
+  ],
+
+  'U78': [ # WithdrawCommentRequest
+    ('required', 'WithdrawReqID'),
+    ('int', 'WithdrawReqID'),
+    ('positive', 'WithdrawReqID'),
+    ('required', 'WithdrawID'),
+    ('required', 'Message'),
+  ],
+
+  'U79': [ # WithdrawCommentResponse
+    ('required', 'WithdrawReqID'),
+    ('required', 'WithdrawID'),
+  ],
+
+  'B0': [ # Deposit Payment Confirmation
+    ('required', 'ProcessDepositReqID'),
+    ('not_empty', 'ProcessDepositReqID'),
+    ('required', 'Action'),
+    ('in', 'Action', ['CONFIRM', 'CANCEL', 'PROGRESS', 'COMPLETE', 'MATCH']),
+  ],
+
+  'B2': [ # Customer List Request
+    ('required', 'CustomerListReqID'),
+    ('not_empty', 'CustomerListReqID'),
+  ],
+
+  'B6': [ # Process Withdraw
+    ('required', 'ProcessWithdrawReqID'),
+    ('int', 'ProcessWithdrawReqID'),
+    ('positive', 'ProcessWithdrawReqID'),
+    ('when', lambda message: 'StatementRecordID' not in message or message.get('Action') != 'MATCH', [
+      ('required', 'WithdrawID'),
+      ('int', 'WithdrawID'),
+      ('positive', 'WithdrawID'),
+    ]),
+    ('required', 'Action'),
+    ('in', 'Action', ['CANCEL', 'PROGRESS', 'COMPLETE', 'MATCH']),
+  ],
+
+  'B7': [ # Process Withdraw Response
+    ('required', 'ProcessWithdrawReqID'),
+    ('int', 'ProcessWithdrawReqID'),
+    ('positive', 'ProcessWithdrawReqID'),
+    ('required', 'Status'),
+  ],
+
+  'B8': [ # Verify Customer Request
+    ('required', 'VerifyCustomerReqID'),
+    ('required', 'ClientID'),
+    ('required', 'Verify'),
+    ('int', 'VerifyCustomerReqID'),
+    ('positive', 'VerifyCustomerReqID'),
+    ('int', 'Verify'),
+    ('in', 'Verify', [0,1,2,3,4,5]),
+    ('int', 'ClientID'),
+    ('positive', 'ClientID'),
+    ('present', 'VerificationData', [
+      ('not_empty', 'VerificationData'),
+    ]),
+  ],
+
+  'B9': [ # Verify Customer Response
+    ('required', 'VerifyCustomerReqID'),
+  ],
+
+  'B12': [ # Clearing History Request
+    ('required', 'ClearingHistoryReqID'),
+    ('required', 'Page'),
+    ('required', 'PageSize'),
+    ('int', 'ClearingHistoryReqID'),
+    ('int', 'Page'),
+    ('int', 'PageSize'),
+  ],
+
+  'B13': [ # Clearing History Response
+    ('required', 'ClearingHistoryReqID'),
+  ],
+
+  'B14': [ # Process Clearing Request
+    ('required', 'ProcessClearingReqID'),
+    ('required', 'Action'),
+  ],
+
+  'B15': [ # Process Clearing Response
+    ('required', 'ProcessClearingReqID'),
+    ('required', 'ClearingProcessID'),
+    ('required', 'ClearingStatus'),
+    ('required', 'PartyBrokerID'),
+    ('required', 'CounterPartyBrokerID'),
+    ('required', 'PartyBrokerSettlementAccount'),
+    ('required', 'CounterPartyBrokerSettlementAccount'),
+  ],
+
+  'B17': [ # Process Clearing Refresh
+    ('required', 'ClearingProcessID'),
+    ('required', 'ClearingStatus'),
+    ('required', 'PartyBrokerID'),
+    ('required', 'CounterPartyBrokerID'),
+    ('required', 'PartyBrokerSettlementAccount'),
+    ('required', 'CounterPartyBrokerSettlementAccount'),
+  ],
+
+  'B20': [ # Add Bank Statement Record
+    ('required', 'StatementRecordAddReqID'),
+    ('required', 'StatementRecordID'),
+    ('required', 'BankAccountCode'),
+    ('required', 'DateTime'),
+    ('required', 'Amount'),
+    ('required', 'Operation'),
+    ('int', 'StatementRecordID'),
+    ('int', 'Amount'),
+    ('positive', 'Amount'),
+  ],
+
+  'B24': [ # Bank Account List Request
+    ('required', 'BankAccountListReqID'),
+  ],
+
+  'B26': [ # Match Statement Records Request
+    ('required', 'MatchStmntRcrdsReqID'),
+    ('required', 'SR1ID'),
+    ('required', 'SR2ID'),
+  ],
+
+  'B28': [ # Statement Record List Request
+    ('required', 'StatementRecordListReqID'),
+  ],
+
+  'S2': [ # Away Market Ticker Request
+    ('required', 'AwayMarketTickerReqID'),
+    ('required', 'Market'),
+    ('required', 'Symbol'),
+    ('required', 'BestBid'),
+    ('required', 'BestAsk'),
+    ('required', 'LastPx'),
+    ('required', 'HighPx'),
+    ('required', 'LowPx'),
+    ('required', 'Volume'),
+    ('required', 'VWAP'),
+    ('int', 'AwayMarketTickerReqID'),
+    ('not_empty', 'Market'),
+    ('not_empty', 'Symbol'),
+    ('int', 'BestBid'),
+    ('int', 'BestAsk'),
+    ('int', 'LastPx'),
+    ('int', 'HighPx'),
+    ('int', 'LowPx'),
+    ('int', 'Volume'),
+    ('int', 'VWAP'),
+  ],
+
+  'S6': [ # Rest Api Request
+    ('required', 'RestAPIReqID'),
+    ('required', 'APIKey'),
+    ('required', 'Signature'),
+    ('required', 'Payload'),
+    ('required', 'DigestMod'),
+    ('required', 'Nonce'),
+    ('required', 'Message'),
+    ('required', 'RemoteIP'),
+    ('int', 'RestAPIReqID'),
+    ('not_empty', 'APIKey'),
+    ('not_empty', 'Signature'),
+    ('not_empty', 'Payload'),
+    ('not_empty', 'DigestMod'),
+    ('int', 'Nonce'),
+    ('positive', 'Nonce'),
+    ('not_empty', 'Message'),
+    ('not_empty', 'RemoteIP'),
+  ],
+
+  'S8': [ # Set/Update Instrument definition
+    ('required', 'UpdateReqID'),
+    ('required', 'Symbol'),
+    ('required', 'MinPrice'),
+    ('required', 'MaxPrice'),
+    ('int', 'UpdateReqID'),
+    ('int', 'MinPrice'),
+    ('int', 'MaxPrice'),
+  ],
+
+  'S9': [ # Instrument definition
+    ('required', 'UpdateReqID'),
+    ('required', 'Symbol'),
+  ],
+
+  'S12': [ # Document List Request
+    ('required', 'DocumentListReqID'),
+    ('required', 'Page'),
+    ('required', 'PageSize'),
+    ('required', 'DocumentName'),
+    ('required', 'Since'),
+    ('int', 'DocumentListReqID'),
+    ('int', 'Page'),
+    ('int', 'PageSize'),
+    ('not_empty', 'DocumentName'),
+    ('int', 'Since'),
+  ],
+
+  'S14': [ # Crypto Network Fee Charge Request
+    ('required', 'CryptoNetworkFeeChargeReqID'),
+    ('required', 'ClientID'),
+    ('required', 'Currency'),
+    ('required', 'Amount'),
+    ('int', 'Amount'),
+    ('positive', 'Amount'),
+  ],
+
+  'S16': [ # User Logon Report
+    ('required', 'LogonRptReqID'),
+    ('required', 'UserReqID'),
+    ('required', 'BrokerID'),
+    ('required', 'ClientID'),
+    ('required', 'IsApiKey'),
+  ],
+
+  'S34': [ # GetSystemSavedData
+    ('required', 'GetSystemSavedDataReqID'),
+    ('int', 'GetSystemSavedDataReqID'),
+    ('required', 'Key'),
+    ('string', 'Key'),
+  ],
+
+  'S36': [ # SystemSaveData
+    ('required', 'SystemSaveDataReqID'),
+    ('int', 'SystemSaveDataReqID'),
+    ('required', 'Key'),
+    ('string', 'Key'),
+    ('required', 'Data'),
+    ('string', 'Data'),
+  ],
+
+  'S38': [ # TradingSessionStatusChangeRequest
+    ('required', 'ReqID'),
+    ('required', 'TradSesStatus'),
+    ('int', 'TradSesStatus'),
+  ],
+
+  'S40': [ # SystemCheck2FARequest
+    ('required', 'SessionID'),
+    ('required', 'SecondFactor'),
+    ('string', 'SecondFactor'),
+  ],
+}
+
+_MESSAGE_VALIDATORS = dict(
+  (msg_type, compile_message_schema(rules)) for msg_type, rules in MESSAGE_SCHEMAS.items() )
+
+
+_message_metrics = None
+
+def set_message_metrics(metrics):
+  """Installs the collector used by every JsonMessage, see pyblinktrade.message_metrics"""
+  global _message_metrics
+  previous = _message_metrics
+  _message_metrics = metrics
+  return previous
+
+def get_message_metrics():
+  return _message_metrics
+
+def validate_message(msg_type, message, raw_message=None):
+  """Validates an already decoded message, without its MsgType tag"""
+  if not isinstance(msg_type, _STRING_TYPES) or msg_type not in _MESSAGE_TYPES:
+    raise InvalidMessageTypeException(raw_message, message, msg_type)
+  validator = _MESSAGE_VALIDATORS.get(msg_type)
+  if validator is not None:
+    validator(raw_message, message)
+
+def schema_tags(rules):
+  """Returns the tags referenced by a list of schema rules, in order"""
+  tags = []
+  def add(tag):
+    if tag not in tags:
+      tags.append(tag)
+
+  for rule in rules:
+    op, args = rule[0], rule[1:]
+    if op in ('required', 'any_of'):
+      for tag in args:
+        add(tag)
+    elif op == 'when':
+      if not callable(args[0]):
+        add(args[0][0])
+      for tag in schema_tags(args[1]):
+        add(tag)
+    elif op == 'present':
+      add(args[0])
+      for tag in schema_tags(args[1]):
+        add(tag)
+    elif op != 'check':
+      add(args[0])
+  return tags
+
+def _make_message_type_predicate(tag):
+  def _method(self):
+    return self.type == tag
+  return _method
+
+def register_message_type(tag, name, validator=None):
+  """
+  Registers a new MsgType. ``validator`` is either a list of schema rules,
+  a validator(raw_message, message) function or None.
+  """
+  if tag in _MESSAGE_TYPES:
+    raise ValueError('MsgType %s is already registered as %s' % (tag, _MESSAGE_TYPES[tag]))
+  if hasattr(JsonMessage, 'is' + name):
+    raise ValueError('Message type name %s is already in use' % name)
+
+  if validator is not None and not callable(validator):
+    MESSAGE_SCHEMAS[tag] = validator
+    validator = compile_message_schema(validator)
+
+  _MESSAGE_TYPES[tag] = name
+  if validator is not None:
+    _MESSAGE_VALIDATORS[tag] = validator
+  setattr(JsonMessage, 'is' + name, _make_message_type_predicate(tag))
+
+def unregister_message_type(tag):
+  """Removes a MsgType added with register_message_type"""
+  name = _MESSAGE_TYPES.pop(tag, None)
+  if name is None:
+    raise ValueError('MsgType %s is not registered' % tag)
+  MESSAGE_SCHEMAS.pop(tag, None)
+  _MESSAGE_VALIDATORS.pop(tag, None)
+  if 'is' + name in JsonMessage.__dict__:
+    delattr(JsonMessage, 'is' + name)
+
+for _tag, _name in _MESSAGE_TYPES.items():
+  setattr(JsonMessage, 'is' + _name, _make_message_type_predicate(_tag))
+del _tag, _name
@@ -1,5 +1,9 @@
+import re
 import time
-import random
+import operator
+
+from pyblinktrade import json_backend
+from pyblinktrade.request_ids import next_request_id
 
 class MessageBuilder(object):
   @staticmethod
@@ -30,7 +34,7 @@ class MessageBuilder(object):
   @staticmethod
   def getDepositList(status_list, opt_filter=None, client_id=None, page=0, page_size=100,opt_request_id=None):
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     msg = {
       "MsgType":"U30",
@@ -49,7 +53,7 @@ class MessageBuilder(object):
   @staticmethod
   def updateProfile(update_dict, opt_user_id=None,opt_request_id=None):
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     msg = {
       "MsgType":"U38",
@@ -63,7 +67,7 @@ class MessageBuilder(object):
   @staticmethod
   def getWithdrawList(status_list, opt_filter=None, client_id=None, page=0, page_size=100,opt_request_id=None):
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     msg = {
       "MsgType":"U26",
@@ -82,7 +86,7 @@ class MessageBuilder(object):
   @staticmethod
   def getBrokerList(status_list, country=None, page=None, page_size=100, opt_request_id=None):
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     msg = {
       'MsgType' : 'U28',
@@ -105,7 +109,7 @@ class MessageBuilder(object):
   @staticmethod
   def verifyCustomer(broker_id, client_id, verify, verification_data, opt_request_id=None):
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     return {
       'MsgType': 'B8',
@@ -121,7 +125,7 @@ class MessageBuilder(object):
                      opt_reason=None,opt_amount=None,opt_percent_fee=None,opt_fixed_fee=None):
 
     if not opt_request_id:
-      opt_request_id = random.randint(1,10000000)
+      opt_request_id = next_request_id()
 
     msg = {
       'MsgType': 'B0',
@@ -155,7 +159,7 @@ class MessageBuilder(object):
   @staticmethod
   def requestBalances(request_id = None, client_id = None):
     if not request_id:
-      request_id = random.randint(1,10000000)
+      request_id = next_request_id()
     msg = {
       'MsgType': 'U2',
       'BalanceReqID': request_id
@@ -167,7 +171,7 @@ class MessageBuilder(object):
   @staticmethod
   def requestPositions(request_id = None, client_id = None):
     if not request_id:
-      request_id = random.randint(1,10000000)
+      request_id = next_request_id()
     msg = {
       'MsgType': 'U42',
       'PositionReqID': request_id
@@ -195,7 +199,7 @@ class MessageBuilder(object):
   @staticmethod
   def processWithdraw(action, withdrawId, request_id=None, reasonId=None, reason=None, data=None,percent_fee=None,fixed_fee=None):
     if not request_id:
-      request_id = random.randint(1,10000000)
+      request_id = next_request_id()
 
     msg = {
       'MsgType': 'B6',
@@ -222,38 +226,201 @@ class MessageBuilder(object):
     return msg
 
   @staticmethod
-  def sendLimitedBuyOrder(symbol, qty, price, clientOrderId ):
+  def _checkOrder(symbol, qty, price, clientOrderId):
     if not symbol or not qty or  not qty or not price or not clientOrderId:
       raise ValueError('Invalid parameters')
 
     if qty <= 0 or price <= 0:
       raise ValueError('Invalid qty or price')
 
+  @staticmethod
+  def _orderMessage(side, ord_type, symbol, qty, price, clientOrderId):
     return {
       'MsgType': 'D',
       'ClOrdID': str(clientOrderId),
       'Symbol': symbol,
-      'Side': '1',
-      'OrdType': '2',
+      'Side': side,
+      'OrdType': ord_type,
       'Price': price,
       'OrderQty': qty
     }
 
+  @staticmethod
+  def sendLimitedBuyOrder(symbol, qty, price, clientOrderId ):
+    MessageBuilder._checkOrder(symbol, qty, price, clientOrderId)
+    return MessageBuilder._orderMessage('1', '2', symbol, qty, price, clientOrderId)
+
   @staticmethod
   def sendLimitedSellOrder(symbol, qty, price, clientOrderId ):
-    if not symbol or not qty or  not qty or not price or not clientOrderId:
-      raise ValueError('Invalid parameters')
+    MessageBuilder._checkOrder(symbol, qty, price, clientOrderId)
+    return MessageBuilder._orderMessage('2', '2', symbol, qty, price, clientOrderId)
 
-    if qty <= 0 or price <= 0:
-      raise ValueError('Invalid qty or price')
+  @staticmethod
+  def sendLimitedBuyOrderBytes(symbol, qty, price, clientOrderId ):
+    """
+    Same order as sendLimitedBuyOrder, already serialized: byte for byte what
+    json_backend.dumps(order).encode('utf-8') returns, without building it.
+    """
+    MessageBuilder._checkOrder(symbol, qty, price, clientOrderId)
+    return _orderTemplate('1', '2').render(clientOrderId, symbol, qty, price)
 
-    return {
+  @staticmethod
+  def sendLimitedSellOrderBytes(symbol, qty, price, clientOrderId ):
+    MessageBuilder._checkOrder(symbol, qty, price, clientOrderId)
+    return _orderTemplate('2', '2').render(clientOrderId, symbol, qty, price)
+
+  @staticmethod
+  def sendLimitedOrders(symbols, sides, qtys, prices, clientOrderIds, wire=False, separator=b'\n'):
+    """
+    Builds a batch of limit orders out of columns: lists, tuples or numpy
+    arrays with one entry per order. symbols and sides can also be a single
+    value for all of them. Quantities and prices must be positive integers,
+    and the whole batch is rejected if any order is invalid.
+
+    Returns the NewOrderSingle dicts, or with wire=True the orders serialized
+    as by sendLimited*OrderBytes and joined by separator in one buffer.
+    """
+    qtys = _integerColumn(qtys)
+    prices = _integerColumn(prices)
+    clientOrderIds = _column(clientOrderIds)
+    count = len(clientOrderIds)
+    symbols = [symbols] * count if isinstance(symbols, _STRING_TYPES) else _column(symbols)
+    sides = [sides] * count if isinstance(sides, _STRING_TYPES) else _column(sides)
+
+    if not len(symbols) == len(sides) == len(qtys) == len(prices) == count:
+      raise ValueError('Columns must have the same length')
+    if not all(symbols) or not all(clientOrderIds) or not set(sides).issubset(('1', '2')):
+      raise ValueError('Invalid parameters')
+
+    rows = zip(symbols, sides, qtys, prices, clientOrderIds)
+    if wire:
+      buy, sell = _orderTemplate('1', '2'), _orderTemplate('2', '2')
+      if _INTEGER_TYPES.issuperset(map(type, clientOrderIds)) and \
+          (not count or max(qtys) <= _INT_MAX and max(prices) <= _INT_MAX):
+        # the same fast path as render, with every check already done
+        formats = {'1': buy._int_format, '2': sell._int_format}
+        symbol_jsons = list(map(buy.symbol, symbols))
+        # the columns in the order the template wants its fields
+        columns = buy._fields((clientOrderIds, symbol_jsons, qtys, prices))
+        return separator.join([formats[side] % fields for side, fields in zip(sides, zip(*columns))])
+
+      render = {'1': buy.render, '2': sell.render}
+      return separator.join([render[side](clientOrderId, symbol, qty, price)
+                             for symbol, side, qty, price, clientOrderId in rows])
+
+    # same dict as _orderMessage, inlined
+    return [{
       'MsgType': 'D',
       'ClOrdID': str(clientOrderId),
       'Symbol': symbol,
-      'Side': '2',
+      'Side': side,
       'OrdType': '2',
       'Price': price,
       'OrderQty': qty
-    }
+    } for symbol, side, qty, price, clientOrderId in rows]
+
+
+try:
+  _INTEGER_TYPES = frozenset((int, long))
+  _STRING_TYPES = (str, unicode)
+except NameError:
+  _INTEGER_TYPES = frozenset((int,))
+  _STRING_TYPES = (str,)
 
+def _column(values):
+  if hasattr(values, 'tolist'):
+    return values.tolist()
+  return values if isinstance(values, list) else list(values)
+
+def _integerColumn(values):
+  # checks run over the whole column at once, in numpy or in C loops
+  if hasattr(values, 'dtype'):
+    if values.dtype.kind not in 'iu':
+      raise ValueError('Invalid qty or price')
+    if values.size and not (values > 0).all():
+      raise ValueError('Invalid qty or price')
+    return values.tolist()
+
+  values = _column(values)
+  if not _INTEGER_TYPES.issuperset(map(type, values)) or (values and min(values) <= 0):
+    raise ValueError('Invalid qty or price')
+  return values
+
+# printable ascii strings serialize the same on every json backend
+_PLAIN_STRING = re.compile(r'[ !#-\[\]-~]*\Z')
+
+# orjson can't encode integers out of this range and falls back to json for
+# the whole message
+_INT_MIN = -2**63
+_INT_MAX = 2**64 - 1
+
+class _OrderTemplate(object):
+  """
+  An order serialized with the current json backend, cut at the fields that
+  change from one order to the next.
+  """
+  # (ClOrdID, Symbol, OrderQty, Price) formats when they are all integers
+  INT_FORMATS = (b'"%d"', b'%s', b'%d', b'%d')
+
+  def __init__(self, side, ord_type, backend):
+    self.side = side
+    self.ord_type = ord_type
+    self.backend = backend
+    self._symbols = {}
+
+    placeholders = ['\x00%d\x00' % index for index in range(4)]
+    text = backend.dumps(MessageBuilder._orderMessage(side, ord_type, placeholders[1], placeholders[2],
+                                                      placeholders[3], placeholders[0]))
+
+    # the fields in the order they show up in the serialized order
+    fields = sorted((text.index(backend.dumps(placeholder)), index, backend.dumps(placeholder))
+                    for index, placeholder in enumerate(placeholders))
+    self._fields = operator.itemgetter(*[index for _, index, _ in fields])
+    parts = []
+    pos = 0
+    for start, _, placeholder in fields:
+      parts.append(text[pos:start].encode('utf-8').replace(b'%', b'%%'))
+      pos = start + len(placeholder)
+    self._format = b'%s'.join(parts + [text[pos:].encode('utf-8').replace(b'%', b'%%')])
+    self._int_format = b''.join(part + self.INT_FORMATS[index] for part, (_, index, _) in zip(parts, fields)) + \
+                       text[pos:].encode('utf-8').replace(b'%', b'%%')
+
+  def _string(self, value):
+    if isinstance(value, str) and _PLAIN_STRING.match(value):
+      return b'"' + value.encode('utf-8') + b'"'
+    return self.backend.dumps(value).encode('utf-8')
+
+  def _number(self, value):
+    if type(value) is int:
+      return str(value).encode('utf-8')
+    return self.backend.dumps(value).encode('utf-8')
+
+  def symbol(self, symbol):
+    symbol_json = self._symbols.get(symbol)
+    if symbol_json is None:
+      symbol_json = self._string(symbol)
+      if len(self._symbols) < 1000:
+        self._symbols[symbol] = symbol_json
+    return symbol_json
+
+  def render(self, clientOrderId, symbol, qty, price):
+    symbol_json = self.symbol(symbol)
+
+    if type(qty) is int and type(price) is int and _INT_MIN <= qty <= _INT_MAX and _INT_MIN <= price <= _INT_MAX:
+      if type(clientOrderId) is int:
+        return self._int_format % self._fields((clientOrderId, symbol_json, qty, price))
+    elif not (_INT_MIN <= qty <= _INT_MAX and _INT_MIN <= price <= _INT_MAX):
+      return self.backend.dumps(MessageBuilder._orderMessage(self.side, self.ord_type, symbol, qty, price,
+                                                             clientOrderId)).encode('utf-8')
+
+    values = (self._string(str(clientOrderId)), symbol_json, self._number(qty), self._number(price))
+    return self._format % self._fields(values)
+
+_order_templates = {}
+
+def _orderTemplate(side, ord_type):
+  backend = json_backend.get_backend()
+  template = _order_templates.get((side, ord_type))
+  if template is None or template.backend is not backend:
+    template = _order_templates[(side, ord_type)] = _OrderTemplate(side, ord_type, backend)
+  return template
@@ -0,0 +1,164 @@
+"""
+Per MsgType parse and validation metrics of JsonMessage.
+
+Metrics are disabled by default and cost a single None check per message.
+Call enable() to start collecting them:
+
+  metrics = message_metrics.enable()
+  ...
+  metrics.snapshot()['message_types']['D']['parse_latency']
+"""
+import time
+import bisect
+import threading
+
+from pyblinktrade import message as _message
+from pyblinktrade.message import InvalidMessageException, InvalidMessageTypeException
+
+# upper bounds, in seconds
+DEFAULT_LATENCY_BUCKETS = (1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 5e-3, 10e-3, 50e-3)
+# upper bounds, in bytes
+DEFAULT_SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram(object):
+  __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+  def __init__(self, bounds):
+    self.bounds = bounds
+    self.counts = [0] * (len(bounds) + 1)
+    self.count = 0
+    self.sum = 0
+    self.max = 0
+
+  def add(self, value):
+    self.counts[bisect.bisect_left(self.bounds, value)] += 1
+    self.count += 1
+    self.sum += value
+    if value > self.max:
+      self.max = value
+
+  def snapshot(self):
+    return {
+      'buckets': [[bound, count] for bound, count in zip(self.bounds + (None,), self.counts)],
+      'count': self.count,
+      'sum': self.sum,
+      'max': self.max,
+    }
+
+
+class MessageTypeMetrics(object):
+  __slots__ = ('accepted', 'rejected', 'parse_latency', 'validation_latency', 'size', 'rejections')
+
+  def __init__(self, latency_buckets, size_buckets):
+    self.accepted = 0
+    self.rejected = 0
+    self.parse_latency = Histogram(latency_buckets)
+    self.validation_latency = Histogram(latency_buckets)
+    self.size = Histogram(size_buckets)
+    # exception class name -> tag -> count
+    self.rejections = {}
+
+  def snapshot(self):
+    return {
+      'accepted': self.accepted,
+      'rejected': self.rejected,
+      'parse_latency': self.parse_latency.snapshot(),
+      'validation_latency': self.validation_latency.snapshot(),
+      'size': self.size.snapshot(),
+      'rejections': dict((name, dict(tags)) for name, tags in self.rejections.items()),
+    }
+
+
+class MessageMetrics(object):
+  """
+  Collects counters, latency and size histograms and rejections per MsgType.
+  Rejections are broken down by exception class and offending tag. Messages
+  rejected before their MsgType is known are accounted under None.
+
+  When a signal is given, a snapshot is sent through it every
+  publish_interval seconds, as signal(metrics, snapshot).
+  """
+  def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS, size_buckets=DEFAULT_SIZE_BUCKETS,
+               signal=None, publish_interval=60):
+    self.latency_buckets = tuple(latency_buckets)
+    self.size_buckets = tuple(size_buckets)
+    self.signal = signal
+    self.publish_interval = publish_interval
+    self._lock = threading.Lock()
+    self._message_types = {}
+    self._since = time.time()
+    self._next_publish = self._since + publish_interval if signal is not None else None
+
+  def _get(self, msg_type):
+    metrics = self._message_types.get(msg_type)
+    if metrics is None:
+      metrics = self._message_types[msg_type] = MessageTypeMetrics(self.latency_buckets, self.size_buckets)
+    return metrics
+
+  def record_message(self, msg_type, size, parse_seconds, validation_seconds):
+    with self._lock:
+      metrics = self._get(msg_type)
+      metrics.accepted += 1
+      metrics.size.add(size)
+      metrics.parse_latency.add(parse_seconds)
+      metrics.validation_latency.add(validation_seconds)
+    if self._next_publish is not None:
+      self._maybe_publish()
+
+  def record_rejection(self, msg_type, size, error):
+    if isinstance(error, InvalidMessageTypeException):
+      # the tag is whatever MsgType the client sent us
+      msg_type, tag = None, None
+    else:
+      tag = getattr(error, 'tag', None)
+    name = error.__class__.__name__ if isinstance(error, InvalidMessageException) else 'ValueError'
+
+    with self._lock:
+      metrics = self._get(msg_type)
+      metrics.rejected += 1
+      metrics.size.add(size)
+      tags = metrics.rejections.setdefault(name, {})
+      tags[tag] = tags.get(tag, 0) + 1
+    if self._next_publish is not None:
+      self._maybe_publish()
+
+  def _maybe_publish(self):
+    now = time.time()
+    if now >= self._next_publish:
+      self._next_publish = now + self.publish_interval
+      self.publish()
+
+  def publish(self):
+    snapshot = self.snapshot()
+    if self.signal is not None:
+      self.signal(self, snapshot)
+    return snapshot
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        'since': self._since,
+        'time': time.time(),
+        'message_types': dict((msg_type, metrics.snapshot())
+                              for msg_type, metrics in self._message_types.items()),
+      }
+
+  def reset(self):
+    with self._lock:
+      self._message_types = {}
+      self._since = time.time()
+
+
+def enable(metrics=None, **kwargs):
+  """Starts collecting metrics of every JsonMessage, returning the MessageMetrics in use"""
+  if metrics is None:
+    metrics = MessageMetrics(**kwargs)
+  _message.set_message_metrics(metrics)
+  return metrics
+
+def disable():
+  return _message.set_message_metrics(None)
+
+def get_metrics():
+  return _message.get_message_metrics()
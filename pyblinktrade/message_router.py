@@ -0,0 +1,85 @@
+import threading
+
+from pyblinktrade.signals import Signal
+
+class MessageRouter(object):
+  """
+  Routes messages to the slots connected for their MsgType, instead of every
+  handler connecting to one signal and filtering on msg.type itself.
+
+    router.connect(on_order, 'D')
+    router.connect(on_btcusd_order, 'D', ('Symbol', 'BTCUSD'))
+    router.connect(on_any_message, None)
+    router(sender, msg)
+
+  Each route is a Signal, so slots are weakly referenced and can be connected
+  for a single sender. Messages can be JsonMessages, typed messages or dicts
+  with a MsgType. Dispatch costs one dict lookup per route that could match.
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    # (msg_type, (tag, value) or None) -> Signal
+    self._routes = {}
+    # msg_type -> tags used by the routes of that MsgType
+    self._route_tags = {}
+
+  def connect(self, slot, msg_type, key=None, sender=None):
+    """
+    Connects slot to the messages of msg_type, or to every message when
+    msg_type is None. key restricts it to messages with a tag value, as a
+    (tag, value) tuple.
+    """
+    with self._lock:
+      route = (msg_type, key)
+      signal = self._routes.get(route)
+      if signal is None:
+        signal = Signal()
+        routes = dict(self._routes)
+        routes[route] = signal
+        if key is not None:
+          route_tags = dict(self._route_tags)
+          tags = route_tags.get(msg_type, ())
+          if key[0] not in tags:
+            route_tags[msg_type] = tags + (key[0],)
+          self._route_tags = route_tags
+        self._routes = routes
+    signal.connect(slot, sender)
+
+  def disconnect(self, slot, msg_type, key=None, sender=None):
+    signal = self._routes.get((msg_type, key))
+    if signal is not None:
+      signal.disconnect(slot, sender)
+
+  @staticmethod
+  def _message_type(message):
+    msg_type = getattr(message, 'type', None)
+    if msg_type is None and isinstance(message, dict):
+      msg_type = message.get('MsgType')
+    return msg_type
+
+  def __call__(self, sender, message, error_signal_on_error=True):
+    routes = self._routes
+    route_tags = self._route_tags
+    msg_type = self._message_type(message)
+    get = None
+    sent = False
+
+    for route_type in ((msg_type, None) if msg_type is not None else (None,)):
+      signal = routes.get((route_type, None))
+      if signal is not None:
+        sent = signal(sender, message, error_signal_on_error) or sent
+
+      tags = route_tags.get(route_type)
+      if tags:
+        if get is None:
+          # LazyJsonMessages are routed without being decoded
+          get = getattr(message, 'peek', None) or message.get
+        for tag in tags:
+          try:
+            signal = routes.get((route_type, (tag, get(tag))))
+          except TypeError:
+            # unhashable value, which no route can match
+            continue
+          if signal is not None:
+            sent = signal(sender, message, error_signal_on_error) or sent
+    return sent
@@ -0,0 +1,205 @@
+import re
+import codecs
+
+from pyblinktrade.message import JsonMessage, InvalidMessageException, InvalidMessageLengthException
+
+class InvalidFrameException(InvalidMessageException):
+  def __str__(self):
+    if self.value:
+      return 'Invalid frame (%s)' % self.value
+    return 'Invalid frame'
+
+_STRING_TOKENS = re.compile(r'["\\]')
+_OBJECT_TOKENS = re.compile(r'["{}]')
+_FRAME_START = re.compile(r'\S')
+
+
+class JsonMessageStream(object):
+  """
+  Decodes JsonMessages out of a stream of concatenated or newline delimited
+  json frames, e.g. socket reads or replay files.
+
+  Frames can be split across reads. At most one partial frame is kept in
+  memory, and frames bigger than max_frame_length are dropped while they are
+  still being read. Invalid frames are yielded as InvalidMessageException
+  instances, or raised when raise_errors is set.
+  """
+  CHUNK_SIZE = 64*1024
+
+  def __init__(self, source=None, message_class=JsonMessage, max_frame_length=None, raise_errors=False):
+    self.source = source
+    self.message_class = message_class
+    self.max_frame_length = max_frame_length or message_class.MAX_MESSAGE_LENGTH
+    self.raise_errors = raise_errors
+
+    self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+    self._buffer = ''
+    self._pos = 0
+    self._start = -1
+    self._depth = 0
+    self._in_string = False
+    self._discarding = False
+
+  def __iter__(self):
+    if self.source is None:
+      return
+    if hasattr(self.source, 'read'):
+      chunks = iter(lambda: self.source.read(self.CHUNK_SIZE), self.source.read(0))
+    else:
+      chunks = self.source
+
+    for chunk in chunks:
+      for item in self.feed(chunk):
+        yield item
+    for item in self.close():
+      yield item
+
+  def feed(self, data):
+    if isinstance(data, bytes) and bytes is not str:
+      data = self._utf8_decoder.decode(data)
+    if data:
+      self._buffer += data
+    return self._frames()
+
+  def close(self):
+    """
+    Flushes the stream and returns the remaining messages, reporting a
+    truncated frame left in the buffer.
+    """
+    if bytes is not str:
+      self._buffer += self._utf8_decoder.decode(b'', True)
+    items = list(self._frames())
+
+    truncated = self._start != -1 and not self._discarding
+    frame = self._buffer[self._start:]
+    self._reset_frame()
+    self._buffer = ''
+    self._pos = 0
+    if truncated:
+      items.append(self._error(InvalidFrameException(frame, None, None, 'truncated frame')))
+    return items
+
+  def _frames(self):
+    while True:
+      if self._start == -1:
+        match = _FRAME_START.search(self._buffer, self._pos)
+        if match is None:
+          self._pos = len(self._buffer)
+          break
+
+        pos = match.start()
+        if self._buffer[pos] != '{':
+          # skip everything up to the next frame
+          next_frame = self._buffer.find('{', pos)
+          if next_frame == -1:
+            next_frame = len(self._buffer)
+          self._pos = next_frame
+          garbage = self._buffer[pos:next_frame]
+          yield self._error(InvalidFrameException(garbage, None, None, 'unexpected data between frames'))
+          continue
+        self._start = self._pos = pos
+
+      end = self._scan()
+      if end == -1:
+        if not self._discarding and self._pos - self._start > self.max_frame_length:
+          self._discarding = True
+          frame = self._buffer[self._start:self._start + 1024]
+          yield self._error(InvalidMessageLengthException(frame))
+        break
+
+      start = self._start
+      discarding = self._discarding
+      self._reset_frame()
+      self._pos = end
+      if discarding:
+        continue
+
+      frame = self._buffer[start:end]
+      if end - start > self.max_frame_length:
+        yield self._error(InvalidMessageLengthException(frame))
+        continue
+
+      try:
+        message = self.message_class(frame)
+      except InvalidMessageException as e:
+        yield self._error(e)
+        continue
+      except ValueError as e:
+        yield self._error(InvalidFrameException(frame, None, None, str(e)))
+        continue
+      # pylint: disable=W0703
+      except Exception as e:
+        # a validator tripping over an unexpected value must not end the stream
+        yield self._error(InvalidFrameException(frame, None, None, '%s: %s' % (type(e).__name__, e)))
+        continue
+      yield message
+
+    self._trim()
+
+  def _scan(self):
+    """Returns the end of the frame being read or -1 if it is incomplete"""
+    buf = self._buffer
+    pos = self._pos
+    depth = self._depth
+    in_string = self._in_string
+    end = -1
+
+    while True:
+      if in_string:
+        match = _STRING_TOKENS.search(buf, pos)
+        if match is None:
+          pos = len(buf)
+          break
+        pos = match.end()
+        if match.group() == '\\':
+          if pos == len(buf):
+            # wait for the escaped character
+            pos -= 1
+            break
+          pos += 1
+        else:
+          in_string = False
+      else:
+        match = _OBJECT_TOKENS.search(buf, pos)
+        if match is None:
+          pos = len(buf)
+          break
+        pos = match.end()
+        token = match.group()
+        if token == '"':
+          in_string = True
+        elif token == '{':
+          depth += 1
+        else:
+          depth -= 1
+          if depth == 0:
+            end = pos
+            break
+
+    self._pos = pos
+    self._depth = depth
+    self._in_string = in_string
+    return end
+
+  def _reset_frame(self):
+    self._start = -1
+    self._depth = 0
+    self._in_string = False
+    self._discarding = False
+
+  def _trim(self):
+    # drop everything that was already consumed, with a single copy per read
+    if self._start == -1 or self._discarding:
+      consumed = self._pos
+    else:
+      consumed = self._start
+    if consumed:
+      self._buffer = self._buffer[consumed:]
+      self._pos -= consumed
+      if self._start != -1:
+        self._start = max(self._start - consumed, 0)
+
+  def _error(self, error):
+    if self.raise_errors:
+      raise error
+    return error
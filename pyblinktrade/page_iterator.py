@@ -0,0 +1,160 @@
+"""
+Walks every page of a list request, keeping the next pages in flight while
+the current one is consumed.
+
+  transport = RequestTransport(connection.send, pending_requests)
+  for deposit in PageIterator(transport, MessageBuilder.getDepositList(['4']), page_size=100):
+    ...
+
+A transport is any callable which sends a request dict and returns an object
+with result(timeout), like the PendingRequest returned by
+PendingRequests.add or a concurrent.futures.Future. The requests still in
+flight when the iteration ends are cancelled with transport.cancel(waiter),
+or waiter.cancel() when the transport has no cancel. InMemoryTransport serves
+rows from a list, for tests.
+"""
+import threading
+from collections import deque
+
+from pyblinktrade.pending_requests import PendingRequests
+from pyblinktrade.request_ids import next_request_id
+
+# paginated request MsgType -> (response MsgType, tag of the rows in the response)
+PAGED_REQUESTS = {
+  'U26': ('U27', 'WithdrawListGrp'),
+  'U28': ('U29', 'BrokerListGrp'),
+  'U30': ('U31', 'DepositListGrp'),
+  'U34': ('U35', 'LedgerListGrp'),
+}
+
+
+class PageIterator(object):
+  """
+  Iterates the rows of all pages of request, a list request dict as built by
+  MessageBuilder.getDepositList, getWithdrawList or getBrokerList. Each page
+  is requested with a copy of it with Page, PageSize and a new ReqID.
+
+  Up to prefetch pages past the one being consumed are requested ahead. The
+  first page with less than page_size rows is the last one; the requests
+  already sent past it, or past the page being consumed when the iteration
+  is stopped early, are cancelled.
+  """
+  def __init__(self, transport, request, page_size=100, prefetch=1, timeout=30, start_page=0,
+               as_dicts=False):
+    if request['MsgType'] not in PAGED_REQUESTS:
+      raise ValueError('%s is not a paginated request' % request['MsgType'])
+    self.transport = transport
+    self.request = request
+    self.page_size = page_size
+    self.prefetch = prefetch
+    self.timeout = timeout
+    self.start_page = start_page
+    self.as_dicts = as_dicts
+    self.group_tag = PAGED_REQUESTS[request['MsgType']][1]
+    self.request_id_tag = PendingRequests.request_id_tag(request)
+
+  def page_request(self, page):
+    request = dict(self.request)
+    request[self.request_id_tag] = next_request_id()
+    request['Page'] = page
+    request['PageSize'] = self.page_size
+    return request
+
+  def pages(self):
+    """Yields the response of each page"""
+    in_flight = deque()
+    next_page = self.start_page
+    try:
+      while True:
+        while len(in_flight) <= self.prefetch:
+          in_flight.append(self.transport(self.page_request(next_page)))
+          next_page += 1
+
+        response = in_flight.popleft().result(self.timeout)
+        yield response
+        if len(response.get(self.group_tag) or ()) < self.page_size:
+          return
+    finally:
+      self._cancel(in_flight)
+
+  def _cancel(self, in_flight):
+    cancel = getattr(self.transport, 'cancel', None)
+    for waiter in in_flight:
+      if cancel is not None:
+        cancel(waiter)
+      elif hasattr(waiter, 'cancel'):
+        waiter.cancel()
+
+  def __iter__(self):
+    pages = self.pages()
+    try:
+      for response in pages:
+        rows = response.get(self.group_tag) or ()
+        if self.as_dicts and rows:
+          columns = response.get('Columns')
+          if not columns:
+            raise ValueError('%s response has no Columns to turn its rows into dicts' % response.get('MsgType'))
+          for row in rows:
+            yield dict(zip(columns, row))
+        else:
+          for row in rows:
+            yield row
+    finally:
+      pages.close()
+
+
+class RequestTransport(object):
+  """Sends requests with send and waits for their responses in pending"""
+  def __init__(self, send, pending):
+    self.send = send
+    self.pending = pending
+
+  def __call__(self, request):
+    waiter = self.pending.add(request)
+    self.send(request)
+    return waiter
+
+  def cancel(self, waiter):
+    self.pending.cancel(waiter)
+
+
+class InMemoryTransport(object):
+  """
+  Answers list requests with pages of rows, after latency seconds, as a
+  server would. The requests it got are kept in requests.
+  """
+  def __init__(self, rows, columns=None, latency=0):
+    self.rows = rows
+    self.columns = columns
+    self.latency = latency
+    self.requests = []
+    self.pending = PendingRequests(timeout=None)
+
+  def response(self, request):
+    msg_type, group_tag = PAGED_REQUESTS[request['MsgType']]
+    tag = PendingRequests.request_id_tag(request)
+    page = request.get('Page', 0)
+    page_size = request.get('PageSize', 100)
+    return {
+      'MsgType': msg_type,
+      tag: request[tag],
+      'Page': page,
+      'PageSize': page_size,
+      'Columns': self.columns,
+      group_tag: self.rows[page * page_size:(page + 1) * page_size],
+    }
+
+  def __call__(self, request):
+    self.requests.append(request)
+    waiter = self.pending.add(request)
+    response = self.response(request)
+    if self.latency:
+      timer = threading.Timer(self.latency, self.pending.complete, (response,))
+      timer.daemon = True
+      timer.start()
+    else:
+      self.pending.complete(response)
+    return waiter
+
+  def cancel(self, waiter):
+    self.pending.cancel(waiter)
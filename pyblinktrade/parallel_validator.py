@@ -0,0 +1,92 @@
+import multiprocessing
+from collections import deque
+from itertools import islice
+
+from pyblinktrade.message import JsonMessage, InvalidMessageException
+
+def _validate(message_class, raw_message, validate_only):
+  try:
+    message = message_class(raw_message)
+  except InvalidMessageException as e:
+    return e
+  except ValueError as e:
+    return InvalidMessageException(raw_message, None, None, str(e))
+  # pylint: disable=W0703
+  except Exception as e:
+    # a validator tripping over an unexpected value must not lose the batch
+    return InvalidMessageException(raw_message, None, None, '%s: %s' % (type(e).__name__, e))
+  return True if validate_only else message
+
+def _validate_chunk(args):
+  message_class, chunk, validate_only = args
+  return [_validate(message_class, raw_message, validate_only) for raw_message in chunk]
+
+
+class ParallelMessageValidator(object):
+  """
+  Validates raw messages across a pool of worker processes, e.g. to replay or
+  backfill captured traffic.
+
+  Results come back in input order: the decoded message (or True when
+  validate_only is set), or the InvalidMessageException instance for messages
+  which failed to validate. Only a few chunks per worker are in flight at any
+  time, so the input can be a generator over a large archive.
+  """
+  DEFAULT_CHUNK_SIZE = 1000
+
+  def __init__(self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, message_class=JsonMessage,
+               validate_only=False, chunks_per_worker=2):
+    self.workers = workers or multiprocessing.cpu_count()
+    self.chunk_size = chunk_size
+    self.message_class = message_class
+    self.validate_only = validate_only
+    self.max_pending = max(self.workers * chunks_per_worker, 1)
+    self._pool = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def _get_pool(self):
+    if self._pool is None:
+      self._pool = multiprocessing.Pool(self.workers)
+    return self._pool
+
+  def _chunks(self, raw_messages):
+    raw_messages = iter(raw_messages)
+    while True:
+      chunk = list(islice(raw_messages, self.chunk_size))
+      if not chunk:
+        return
+      yield (self.message_class, chunk, self.validate_only)
+
+  def imap(self, raw_messages):
+    """Yields one result per raw message, in input order"""
+    if self.workers == 1:
+      for chunk in self._chunks(raw_messages):
+        for result in _validate_chunk(chunk):
+          yield result
+      return
+
+    pool = self._get_pool()
+    pending = deque()
+    for chunk in self._chunks(raw_messages):
+      if len(pending) >= self.max_pending:
+        for result in pending.popleft().get():
+          yield result
+      pending.append(pool.apply_async(_validate_chunk, (chunk,)))
+
+    while pending:
+      for result in pending.popleft().get():
+        yield result
+
+  def validate(self, raw_messages):
+    return list(self.imap(raw_messages))
+
+  def close(self):
+    if self._pool is not None:
+      self._pool.close()
+      self._pool.join()
+      self._pool = None
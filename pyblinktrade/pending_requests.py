@@ -0,0 +1,205 @@
+"""
+Correlates responses with the requests waiting for them, by ReqID.
+
+  pending = PendingRequests(timeout=10)
+  request = MessageBuilder.requestBalances()
+  waiter = pending.add(request)
+  connection.send(request)
+  ...
+  router.connect(pending, None)        # or call pending.complete(msg)
+  balances = waiter.result(10)
+
+Outstanding requests are kept in a dict keyed by (ReqID tag, ReqID), so a
+response completes its request in O(1). Deadlines are kept in a heap;
+expire() fails the requests that timed out and should be called from a
+timer, or start_timer() runs one on a thread.
+"""
+import time
+import heapq
+import threading
+
+class RequestTimeoutException(Exception):
+  def __init__(self, tag, req_id):
+    super(RequestTimeoutException, self).__init__(tag, req_id)
+    self.tag = tag
+    self.req_id = req_id
+
+  def __str__(self):
+    return 'Request %s=%s timed out' % (self.tag, self.req_id)
+
+class RequestCancelledException(Exception):
+  pass
+
+
+class PendingRequest(object):
+  """Waits for the response of one request"""
+  def __init__(self, tag, req_id, request, deadline):
+    self.tag = tag
+    self.req_id = req_id
+    self.request = request
+    self.deadline = deadline
+    self.response = None
+    self.exception = None
+    self._done = threading.Event()
+    # so a callback added while the request finishes is called exactly once
+    self._lock = threading.Lock()
+    self._callbacks = []
+
+  def done(self):
+    return self._done.is_set()
+
+  def result(self, timeout=None):
+    """Returns the response, or raises the error the request failed with"""
+    if not self._done.wait(timeout):
+      raise RequestTimeoutException(self.tag, self.req_id)
+    if self.exception is not None:
+      raise self.exception
+    return self.response
+
+  def add_done_callback(self, callback):
+    with self._lock:
+      if not self._done.is_set():
+        self._callbacks.append(callback)
+        return
+    callback(self)
+
+  def _finish(self, response, exception):
+    with self._lock:
+      self.response = response
+      self.exception = exception
+      self._done.set()
+      callbacks, self._callbacks = self._callbacks, []
+    for callback in callbacks:
+      callback(self)
+
+
+class PendingRequests(object):
+  def __init__(self, timeout=30):
+    self.timeout = timeout
+    self._lock = threading.Lock()
+    # (tag, req_id) -> PendingRequest
+    self._pending = {}
+    # tag -> number of requests pending with it; responses are only looked up
+    # under the tags which can match
+    self._tags = {}
+    # (deadline, sequence, PendingRequest), stale entries are skipped on expiry
+    self._deadlines = []
+    self._sequence = 0
+    self._timer = None
+
+  def __len__(self):
+    return len(self._pending)
+
+  @staticmethod
+  def request_id_tag(request):
+    for tag in request:
+      if tag.endswith('ReqID'):
+        return tag
+    raise ValueError('Request has no ReqID tag')
+
+  def add(self, request, timeout=None, tag=None):
+    """
+    Registers a request dict before it is sent and returns its
+    PendingRequest. The ReqID tag is found in the request unless given.
+    """
+    if tag is None:
+      tag = self.request_id_tag(request)
+    if timeout is None:
+      timeout = self.timeout
+    req_id = request[tag]
+    deadline = time.time() + timeout if timeout is not None else None
+    pending = PendingRequest(tag, req_id, request, deadline)
+
+    with self._lock:
+      key = (tag, req_id)
+      if key in self._pending:
+        raise ValueError('%s=%s is already pending' % key)
+      self._pending[key] = pending
+      self._tags[tag] = self._tags.get(tag, 0) + 1
+      if deadline is not None:
+        self._sequence += 1
+        heapq.heappush(self._deadlines, (deadline, self._sequence, pending))
+    return pending
+
+  def _pop(self, key):
+    # must hold the lock
+    pending = self._pending.pop(key, None)
+    if pending is not None:
+      count = self._tags[key[0]] - 1
+      if count:
+        self._tags[key[0]] = count
+      else:
+        del self._tags[key[0]]
+    return pending
+
+  def complete(self, message):
+    """
+    Completes the request the response message answers, returning its
+    PendingRequest, or None when no request is waiting for it.
+    """
+    get = getattr(message, 'peek', None) or message.get
+    with self._lock:
+      for tag in self._tags:
+        req_id = get(tag)
+        if req_id is None:
+          continue
+        try:
+          pending = self._pop((tag, req_id))
+        except TypeError:
+          continue
+        if pending is not None:
+          break
+      else:
+        return None
+    pending._finish(message, None)
+    return pending
+
+  def __call__(self, sender, message):
+    """So it can be connected to a Signal or a MessageRouter"""
+    self.complete(message)
+
+  def cancel(self, pending, exception=None):
+    with self._lock:
+      pending = self._pop((pending.tag, pending.req_id))
+    if pending is None:
+      return False
+    pending._finish(None, exception or RequestCancelledException(pending.tag, pending.req_id))
+    return True
+
+  def next_deadline(self):
+    with self._lock:
+      while self._deadlines and self._deadlines[0][2].done():
+        heapq.heappop(self._deadlines)
+      return self._deadlines[0][0] if self._deadlines else None
+
+  def expire(self, now=None):
+    """Fails the requests whose deadline passed, returning them"""
+    if now is None:
+      now = time.time()
+    expired = []
+    with self._lock:
+      deadlines = self._deadlines
+      while deadlines and deadlines[0][0] <= now:
+        _, _, pending = heapq.heappop(deadlines)
+        if self._pop((pending.tag, pending.req_id)) is pending:
+          expired.append(pending)
+    for pending in expired:
+      pending._finish(None, RequestTimeoutException(pending.tag, pending.req_id))
+    return expired
+
+  def start_timer(self, interval=0.1):
+    """Expires requests every interval seconds on a daemon thread"""
+    if self._timer is not None:
+      return
+    stopped = self._timer = threading.Event()
+    def run():
+      while not stopped.wait(interval):
+        self.expire()
+    thread = threading.Thread(target=run, name='PendingRequests.expire')
+    thread.daemon = True
+    thread.start()
+
+  def stop_timer(self):
+    if self._timer is not None:
+      self._timer.set()
+      self._timer = None
@@ -0,0 +1,339 @@
+import sys
+import time
+import inspect
+import weakref
+import threading
+from collections import deque
+from timeit import default_timer as _timer
+
+from pyblinktrade.signals import Signal, _slot_name
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+COALESCE = 'coalesce'
+
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+class SlotQueue(object):
+  """
+  Bounded queue of the pending emits of one slot, drained by its own worker
+  thread. The worker only keeps weak references to the slot and the signal
+  and stops once either is garbage collected or the queue is closed.
+  """
+  def __init__(self, signal, ref, func, maxsize, policy):
+    self.signal = weakref.ref(signal, lambda _: self.close())
+    self.ref = ref
+    self.func = func
+    self.maxsize = maxsize
+    self.policy = policy
+    target = ref()
+    self.name = _slot_name(target if func is None else func.__get__(target, type(target)))
+
+    self.enqueued = 0
+    self.processed = 0
+    self.dropped = 0
+    self.coalesced = 0
+    self.max_depth = 0
+
+    self._lock = threading.Lock()
+    self._not_empty = threading.Condition(self._lock)
+    self._not_full = threading.Condition(self._lock)
+    self._idle = threading.Condition(self._lock)
+    # (sender, data, error_signal_on_error), or only the senders when
+    # coalescing, with their latest data in _latest
+    self._items = deque()
+    self._latest = {}
+    self._busy = False
+    self._closed = False
+    self._stopped = False
+
+    self._thread = threading.Thread(target=self._run, name='SlotQueue(%s)' % self.name)
+    self._thread.daemon = True
+    self._thread.start()
+
+  @property
+  def depth(self):
+    return len(self._items)
+
+  def put(self, sender, data, error_signal_on_error=True):
+    """Returns False when the item was dropped"""
+    with self._lock:
+      if self._closed:
+        return False
+
+      if self.policy == COALESCE and sender in self._latest:
+        # latest value wins, the sender keeps its place in the queue
+        self._latest[sender] = (data, error_signal_on_error)
+        self.coalesced += 1
+        return True
+
+      while len(self._items) >= self.maxsize:
+        if self.policy == DROP_NEWEST:
+          self.dropped += 1
+          return False
+        elif self.policy == DROP_OLDEST:
+          self._items.popleft()
+          self.dropped += 1
+        elif threading.current_thread() is self._thread:
+          # the slot emitting on its own signal; waiting for itself to make
+          # room would never return
+          self.dropped += 1
+          return False
+        else:
+          self._not_full.wait()
+          if self._closed:
+            return False
+
+      if self.policy == COALESCE:
+        self._items.append(sender)
+        self._latest[sender] = (data, error_signal_on_error)
+      else:
+        self._items.append((sender, data, error_signal_on_error))
+      self.enqueued += 1
+      if len(self._items) > self.max_depth:
+        self.max_depth = len(self._items)
+      self._not_empty.notify()
+      return True
+
+  def _get(self):
+    with self._lock:
+      self._busy = False
+      if not self._items:
+        self._idle.notify_all()
+      while not self._items:
+        if self._closed:
+          return None
+        self._not_empty.wait()
+
+      item = self._items.popleft()
+      if self.policy == COALESCE:
+        data, error_signal_on_error = self._latest.pop(item)
+        item = (item, data, error_signal_on_error)
+      self._busy = True
+      self._not_full.notify()
+      return item
+
+  def _run(self):
+    try:
+      self._process()
+    finally:
+      with self._lock:
+        self._stopped = True
+        self._idle.notify_all()
+
+  def _process(self):
+    while True:
+      item = self._get()
+      if item is None:
+        return
+
+      target = self.ref()
+      signal = self.signal()
+      if target is None or signal is None:
+        self.close()
+        return
+
+      sender, data, error_signal_on_error = item
+      # the time spent in the slot, not waiting in the queue
+      start = _timer()
+      try:
+        if self.func is None:
+          target(sender, data)
+        else:
+          self.func(target, sender, data)
+        if signal._failing_slots:
+          signal._slot_succeeded(target, self.func)
+
+      # pylint: disable=W0702
+      except:
+        signal._slots_failed(sender, [(target, self.func, sys.exc_info())], error_signal_on_error)
+      profiler = signal._profiler
+      if profiler is not None:
+        profiler.record(signal, target, self.func, sender, _timer() - start)
+      del target, signal
+      self.processed += 1
+
+  def idle(self):
+    with self._lock:
+      return not self._items and not self._busy
+
+  def wait_idle(self, timeout=None):
+    """Waits until the worker processed every queued item or stopped, returning False on timeout"""
+    deadline = None if timeout is None else time.time() + timeout
+    with self._lock:
+      while (self._items or self._busy) and not self._stopped:
+        if deadline is None:
+          self._idle.wait()
+        else:
+          remaining = deadline - time.time()
+          if remaining <= 0:
+            return False
+          self._idle.wait(remaining)
+      return True
+
+  def close(self, discard=False):
+    """
+    Stops the worker once the items already queued are processed, or right
+    after the current one when discard is set.
+    """
+    with self._lock:
+      self._closed = True
+      if discard:
+        self.dropped += len(self._items)
+        self._items.clear()
+        self._latest.clear()
+      self._not_empty.notify_all()
+      self._not_full.notify_all()
+
+  def join(self, timeout=None):
+    self._thread.join(timeout)
+
+  def stats(self):
+    with self._lock:
+      return {
+        'slot': self.name,
+        'depth': len(self._items),
+        'max_depth': self.max_depth,
+        'enqueued': self.enqueued,
+        'processed': self.processed,
+        'dropped': self.dropped,
+        'coalesced': self.coalesced,
+      }
+
+
+class QueuedSignal(Signal):
+  """
+  Signal which hands every emit to a bounded queue per slot, so a slow slot
+  never holds the emitting thread back (unless the policy is block).
+
+  When a slot queue is full, policy decides what happens:
+    block       - the emit waits for room in the queue
+    drop_oldest - the oldest queued item is dropped
+    drop_newest - the item being emitted is dropped
+    coalesce    - only the latest data of each sender is kept, e.g. for
+                  ticker updates; the emit waits if maxsize senders are
+                  already pending
+
+  Each slot has its own worker thread, started on the first emit it gets and
+  stopped when the slot is disconnected, garbage collected or the signal is
+  closed. A slot which emits on its own signal while its queue is full has
+  the item dropped, whatever the policy, instead of waiting on itself.
+
+  Slots decorated with batch_slot get each emit_many() list as a single
+  queued item.
+
+  Use close(), or the signal as a context manager, to stop the workers. Emits
+  on a closed signal are dropped.
+  """
+  def __init__(self, maxsize=1000, policy=BLOCK):
+    if policy not in POLICIES:
+      raise ValueError('Unknown queue policy: %s' % policy)
+    Signal.__init__(self)
+    self.maxsize = maxsize
+    self.policy = policy
+    self._queues = {}
+    self._queues_lock = threading.Lock()
+    self._closed = False
+
+  def _queue(self, ref, func):
+    key = (ref, func)
+    queue = self._queues.get(key)
+    if queue is None:
+      with self._queues_lock:
+        if self._closed:
+          return None
+        # forget the queues of garbage collected slots
+        for dead in [dead for dead in self._queues if dead[0]() is None]:
+          self._queues.pop(dead).close()
+        queue = self._queues.get(key)
+        if queue is None:
+          queue = self._queues[key] = SlotQueue(self, weakref.ref(ref()), func, self.maxsize, self.policy)
+    return queue
+
+  def __call__(self, sender, data=None, error_signal_on_error=True):
+    if self._closed:
+      return False
+    sent = False
+    for ref, func in self._slots(sender):
+      if ref() is None:
+        continue
+      queue = self._queue(ref, func)
+      if queue is not None:
+        sent = queue.put(sender, data, error_signal_on_error) or sent
+    return sent
+
+  def emit_many(self, sender, items, error_signal_on_error=True):
+    if self._closed or not items:
+      return False
+    sent = False
+    batch = None
+    for ref, func in self._slots(sender):
+      target = ref()
+      if target is None:
+        continue
+      queue = self._queue(ref, func)
+      if queue is None:
+        continue
+      if getattr(target if func is None else func, 'signal_batch', False):
+        if batch is None:
+          # the caller may reuse its list before the worker gets to it
+          batch = list(items)
+        sent = queue.put(sender, batch, error_signal_on_error) or sent
+        continue
+      for data in items:
+        sent = queue.put(sender, data, error_signal_on_error) or sent
+    return sent
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def disconnect(self, slot, sender=None):
+    Signal.disconnect(self, slot, sender)
+    if inspect.ismethod(slot):
+      key = (weakref.ref(slot.__self__), slot.__func__)
+    else:
+      key = (weakref.ref(slot), None)
+
+    with self._queues_lock:
+      if key not in self._queues:
+        return
+      # the queue is shared by every sender the slot is connected for
+      slots, sender_slots = self._slots_cache or self._build_slots_cache()
+      if key in slots or any(key in per_sender for per_sender in sender_slots.values()):
+        return
+      queue = self._queues.pop(key)
+    # a disconnected slot isn't called with what was still queued for it
+    queue.close(discard=True)
+
+  def queue_stats(self):
+    """Returns the depth and counters of every slot queue"""
+    with self._queues_lock:
+      queues = list(self._queues.values())
+    return [queue.stats() for queue in queues]
+
+  def join(self, timeout=None):
+    """Waits until every queued item was processed, returning False on timeout"""
+    deadline = None if timeout is None else time.time() + timeout
+    with self._queues_lock:
+      queues = list(self._queues.values())
+    for queue in queues:
+      if not queue.wait_idle(None if deadline is None else max(deadline - time.time(), 0)):
+        return False
+    return True
+
+  def close(self, wait=True):
+    """Stops the slot workers, by default after they processed their queues"""
+    with self._queues_lock:
+      self._closed = True
+      queues = list(self._queues.values())
+      self._queues = {}
+    for queue in queues:
+      queue.close()
+    if wait:
+      for queue in queues:
+        queue.join()
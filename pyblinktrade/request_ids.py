@@ -0,0 +1,131 @@
+import os
+import itertools
+import threading
+import multiprocessing
+import weakref
+
+# ReqIDs are signed 32 bit integers on the wire
+MAX_REQUEST_ID = 2 ** 31 - 1
+
+def _is_main_process():
+  return multiprocessing.current_process().name == 'MainProcess'
+
+def _is_forked_process():
+  """True if this process shares the memory its parent had when it started"""
+  if _is_main_process():
+    # a plain os.fork() keeps the parent's process object
+    return True
+  process = multiprocessing.current_process()
+  method = getattr(process, '_start_method', None)
+  if method is None and hasattr(multiprocessing, 'get_start_method'):
+    method = multiprocessing.get_start_method(allow_none=True)
+  return method in (None, 'fork')
+
+class RequestIdAllocator(object):
+  """
+  Allocates the ReqIDs of outgoing requests. Ids grow monotonically within a
+  process and carry the process shard in their low bits,
+
+    req_id = counter << shard_bits | shard
+
+  so processes with different shards never hand out the same id. The counter
+  wraps around before the ids pass max_request_id.
+
+  Without a shard, the main process takes shard 0 and every process forked
+  from it takes the next free shard of a counter they share, on its first id.
+  Processes started any other way (spawn, forkserver) know nothing of the
+  shards taken so far and refuse to allocate, they must be given their own
+  shard, e.g. from a pool initializer.
+  """
+  def __init__(self, shard=None, shard_bits=10, max_request_id=MAX_REQUEST_ID):
+    self.shard_bits = shard_bits
+    self.shard_count = 1 << shard_bits
+    if shard is not None and not 0 <= shard < self.shard_count:
+      raise ValueError('Shard %d does not fit in %d bits' % (shard, shard_bits))
+    self._sequences = max_request_id >> shard_bits
+    if self._sequences < 1:
+      raise ValueError('max_request_id %d leaves no room for a counter' % max_request_id)
+
+    self._lock = threading.Lock()
+    self._shared_shards = None
+    if shard is not None:
+      self._reset(shard)
+      return
+
+    # the shard is claimed on the first id, or right before the first fork
+    self.pid = None
+    self.shard = None
+    if _register_at_fork:
+      _before_fork_allocators.add(self)
+    else:
+      self._share_shards()
+
+  def _reset(self, shard):
+    self.pid = os.getpid()
+    self.shard = shard
+    self._counter = itertools.count()
+
+  def _share_shards(self):
+    """Claims shard 0 for the main process and creates the counter of the shards its children take"""
+    with self._lock:
+      if self.pid is None and _is_main_process():
+        self._reset(0)
+      if self.pid == os.getpid() and self.shard == 0 and self._shared_shards is None:
+        self._shared_shards = multiprocessing.Value('i', 1)
+
+  def _take_shard(self):
+    if self._shared_shards is None:
+      raise RuntimeError('Request id shard %d belongs to process %d, give the forked process its own '
+                         'RequestIdAllocator' % (self.shard, self.pid))
+    with self._shared_shards.get_lock():
+      shard = self._shared_shards.value
+      if shard >= self.shard_count:
+        raise RuntimeError('All %d request id shards are taken' % self.shard_count)
+      self._shared_shards.value = shard + 1
+    return shard
+
+  def _claim_shard(self):
+    with self._lock:
+      if self.pid == os.getpid():
+        return
+      if self.pid is None:
+        if not _is_main_process():
+          raise RuntimeError('%s was not forked from the main process, give it a RequestIdAllocator '
+                             'with its own shard' % multiprocessing.current_process().name)
+        self._reset(0)
+      else:
+        if not _is_forked_process():
+          raise RuntimeError('%s was not forked from process %d, give it a RequestIdAllocator '
+                             'with its own shard' % (multiprocessing.current_process().name, self.pid))
+        # forked, the shard of the parent is taken
+        self._reset(self._take_shard())
+
+  def __call__(self):
+    if self.pid != os.getpid():
+      self._claim_shard()
+    # next() on itertools.count is atomic, no lock needed between threads
+    return (next(self._counter) % self._sequences + 1) << self.shard_bits | self.shard
+
+
+_register_at_fork = getattr(os, 'register_at_fork', None)
+_before_fork_allocators = weakref.WeakSet()
+
+def _before_fork():
+  for allocator in list(_before_fork_allocators):
+    allocator._share_shards()
+
+if _register_at_fork:
+  _register_at_fork(before=_before_fork)
+
+
+_allocator = RequestIdAllocator()
+
+def next_request_id():
+  return _allocator()
+
+def set_request_id_allocator(allocator):
+  """Replaces the allocator used by MessageBuilder, returning the previous one"""
+  global _allocator
+  previous = _allocator
+  _allocator = allocator
+  return previous
@@ -0,0 +1,384 @@
+"""
+Republishes Signals to subscribers in other processes of the same host, over
+a Unix domain socket.
+
+  # publishing process
+  server = SignalBridgeServer('/var/run/blinktrade/md.sock', {'order_book': order_book_signal})
+
+  # any number of consumer processes
+  client = SignalBridgeClient('/var/run/blinktrade/md.sock')
+  client.signal('order_book').connect(on_order_book)
+
+Emits are framed as a 4 byte length followed by binary_codec values, so
+sender and data must be plain values (numbers, strings, lists, dicts) or
+messages, which arrive as JsonMessages. Each client connection has its own
+bounded outgoing queue, so a slow consumer never blocks the publisher. Clients
+reconnect on their own and subscribe again to their signals.
+"""
+import os
+import stat
+import time
+import errno
+import struct
+import socket
+import logging
+import threading
+
+from pyblinktrade import binary_codec
+from pyblinktrade.message import JsonMessage, InvalidMessageException
+from pyblinktrade.signals import Signal
+from pyblinktrade.queued_signals import QueuedSignal, DROP_OLDEST
+
+_LENGTH = struct.Struct('>I')
+
+_EMIT, _SUBSCRIBE = range(2)
+
+MAX_FRAME_LENGTH = 16*1024*1024
+
+# accept() errors worth retrying right away, and the ones that mean we ran
+# out of descriptors or memory and should wait for some to be released
+_ACCEPT_RETRY = frozenset((errno.EINTR, errno.EAGAIN, errno.ECONNABORTED, errno.EPROTO))
+_ACCEPT_BACKOFF = frozenset((errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM))
+_MAX_ACCEPT_BACKOFF = 1.0
+
+
+def _encode_frame(values):
+  payload = binary_codec.encode_values(values)
+  return _LENGTH.pack(len(payload)) + payload
+
+def _recv_exactly(sock, size):
+  chunks = []
+  while size:
+    chunk = sock.recv(size)
+    if not chunk:
+      return None
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b''.join(chunks)
+
+def _read_frame(sock):
+  """Returns the values of the next frame, or None once the peer is gone"""
+  header = _recv_exactly(sock, _LENGTH.size)
+  if header is None:
+    return None
+  length = _LENGTH.unpack(header)[0]
+  if length > MAX_FRAME_LENGTH:
+    raise binary_codec.InvalidBinaryMessageException(None, None, None, 'frame too long')
+  payload = _recv_exactly(sock, length)
+  if payload is None:
+    return None
+  return binary_codec.decode_values(payload)
+
+def _unlink_stale_socket(path):
+  """Removes a socket left behind by a process which is gone, but never a live one"""
+  try:
+    mode = os.stat(path).st_mode
+  except OSError:
+    return
+  if not stat.S_ISSOCK(mode):
+    raise socket.error(errno.EADDRINUSE, '%s exists and is not a socket' % path)
+
+  probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    probe.connect(path)
+  except socket.error as e:
+    if e.errno == errno.ENOENT:
+      return
+    if e.errno != errno.ECONNREFUSED:
+      raise
+    os.unlink(path)
+    return
+  finally:
+    probe.close()
+  raise socket.error(errno.EADDRINUSE, '%s is in use by a running server' % path)
+
+def _close_socket(sock):
+  try:
+    sock.shutdown(socket.SHUT_RDWR)
+  except socket.error:
+    pass
+  sock.close()
+
+
+class _Forwarder(object):
+  def __init__(self, server, name):
+    self.server = server
+    self.name = name
+
+  def forward(self, sender, data):
+    outbox = self.server._outbox
+    if not outbox._slots(self.name):
+      # nobody subscribed, don't bother encoding
+      return
+    if hasattr(data, 'toJSON'):
+      frame = _encode_frame((_EMIT, self.name, sender, data.toJSON(), data.type))
+    else:
+      frame = _encode_frame((_EMIT, self.name, sender, data, None))
+    outbox(self.name, frame)
+
+
+class _Connection(object):
+  def __init__(self, server, sock):
+    self.server = server
+    self.sock = sock
+    self.names = set()
+    self._send_lock = threading.Lock()
+    self._closed = False
+
+  def send(self, name, frame):
+    try:
+      with self._send_lock:
+        self.sock.sendall(frame)
+    except socket.error:
+      self.close()
+
+  def run(self):
+    try:
+      while True:
+        values = _read_frame(self.sock)
+        if values is None:
+          break
+        if values[0] == _SUBSCRIBE:
+          self.subscribe(values[1])
+    except (socket.error, binary_codec.InvalidBinaryMessageException):
+      pass
+    self.close()
+
+  def subscribe(self, names):
+    names = [name for name in names if name in self.server.signals]
+    for name in names:
+      if name not in self.names:
+        self.names.add(name)
+        self.server._outbox.connect(self.send, name)
+    # acknowledges the subscription, so clients know emits will reach them
+    self.send(None, _encode_frame((_SUBSCRIBE, names)))
+
+  def close(self):
+    with self._send_lock:
+      if self._closed:
+        return
+      self._closed = True
+    for name in self.names:
+      self.server._outbox.disconnect(self.send, name)
+    _close_socket(self.sock)
+    self.server._connection_closed(self)
+
+
+class SignalBridgeServer(object):
+  """
+  Listens on path and forwards the emits of signals, a dict of name ->
+  Signal, to the clients subscribed to them. maxsize and policy configure
+  the outgoing queue of each client, see QueuedSignal.
+  """
+  def __init__(self, path, signals, maxsize=10000, policy=DROP_OLDEST):
+    self.path = path
+    self.signals = dict(signals)
+    self._outbox = QueuedSignal(maxsize, policy)
+    self._lock = threading.Lock()
+    self._connections = set()
+    self._closed = False
+
+    self._forwarders = []
+    for name, signal in self.signals.items():
+      forwarder = _Forwarder(self, name)
+      signal.connect(forwarder.forward)
+      self._forwarders.append((signal, forwarder))
+
+    _unlink_stale_socket(path)
+    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._sock.bind(path)
+    self._sock.listen(128)
+    # close() only unlinks path while it is still our socket
+    self._inode = os.stat(path).st_ino
+
+    self._thread = threading.Thread(target=self._accept, name='SignalBridgeServer(%s)' % path)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _accept(self):
+    backoff = 0
+    while not self._closed:
+      try:
+        sock, _ = self._sock.accept()
+      except socket.error as e:
+        if self._closed:
+          return
+        if e.errno in _ACCEPT_RETRY:
+          continue
+        if e.errno in _ACCEPT_BACKOFF:
+          backoff = min(backoff * 2 or 0.01, _MAX_ACCEPT_BACKOFF)
+          time.sleep(backoff)
+          continue
+        logging.exception('SignalBridgeServer(%s) stopped accepting clients', self.path)
+        return
+      backoff = 0
+      if self._closed:
+        sock.close()
+        return
+
+      connection = _Connection(self, sock)
+      with self._lock:
+        self._connections.add(connection)
+      thread = threading.Thread(target=connection.run, name='SignalBridgeConnection(%s)' % self.path)
+      thread.daemon = True
+      thread.start()
+
+  def _connection_closed(self, connection):
+    with self._lock:
+      self._connections.discard(connection)
+
+  @property
+  def client_count(self):
+    return len(self._connections)
+
+  def subscriber_count(self, name):
+    return len(self._outbox._slots(name))
+
+  def queue_stats(self):
+    """Outgoing queue depth and drop counters of each client"""
+    return self._outbox.queue_stats()
+
+  def close(self):
+    self._closed = True
+    for signal, forwarder in self._forwarders:
+      signal.disconnect(forwarder.forward)
+    _close_socket(self._sock)
+    with self._lock:
+      connections = list(self._connections)
+    for connection in connections:
+      connection.close()
+    self._outbox.close(wait=False)
+    try:
+      if os.stat(self.path).st_ino == self._inode:
+        os.unlink(self.path)
+    except OSError:
+      pass
+
+
+class SignalBridgeClient(object):
+  """
+  Receives the signals published by a SignalBridgeServer. signal(name)
+  returns a local Signal that is emitted, on the client thread, for every
+  emit of the remote signal with the same name; slots are connected and
+  disconnected on it exactly as on any Signal.
+  """
+  def __init__(self, path, reconnect_interval=0.1, max_reconnect_interval=5, message_class=JsonMessage):
+    self.path = path
+    self.reconnect_interval = reconnect_interval
+    self.max_reconnect_interval = max_reconnect_interval
+    self.message_class = message_class
+    self.connected = threading.Event()
+    # emits dropped because their data failed message_class.from_dict
+    self.invalid_messages = 0
+
+    self._lock = threading.Lock()
+    self._signals = {}
+    self._sock = None
+    self._unacked = 0
+    self._closing = threading.Event()
+
+    self._thread = threading.Thread(target=self._run, name='SignalBridgeClient(%s)' % path)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def signal(self, name):
+    with self._lock:
+      signal = self._signals.get(name)
+      if signal is not None:
+        return signal
+      signal = self._signals[name] = Signal()
+      sock = self._sock
+    if sock is not None:
+      self._subscribe(sock, [name])
+    return signal
+
+  def connect(self, slot, name, sender=None):
+    self.signal(name).connect(slot, sender)
+
+  def disconnect(self, slot, name, sender=None):
+    signal = self._signals.get(name)
+    if signal is not None:
+      signal.disconnect(slot, sender)
+
+  def wait_connected(self, timeout=None):
+    """Waits until the server acknowledged every subscription"""
+    return self.connected.wait(timeout)
+
+  def _subscribe(self, sock, names):
+    try:
+      with self._lock:
+        self._unacked += 1
+        self.connected.clear()
+        sock.sendall(_encode_frame((_SUBSCRIBE, names)))
+    except socket.error:
+      # the reader notices it and reconnects
+      pass
+
+  def _acked(self):
+    with self._lock:
+      self._unacked -= 1
+      if not self._unacked:
+        self.connected.set()
+
+  def _run(self):
+    interval = self.reconnect_interval
+    while not self._closing.is_set():
+      sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      try:
+        sock.connect(self.path)
+      except socket.error:
+        sock.close()
+        self._closing.wait(interval)
+        interval = min(interval*2, self.max_reconnect_interval)
+        continue
+      interval = self.reconnect_interval
+
+      with self._lock:
+        if self._closing.is_set():
+          # close() ran while connecting and could not see this socket
+          _close_socket(sock)
+          return
+        self._sock = sock
+        self._unacked = 0
+        names = list(self._signals)
+      self._subscribe(sock, names)
+      try:
+        self._read(sock)
+      except (socket.error, binary_codec.InvalidBinaryMessageException):
+        pass
+
+      self.connected.clear()
+      with self._lock:
+        self._sock = None
+      _close_socket(sock)
+
+  def _read(self, sock):
+    while True:
+      values = _read_frame(sock)
+      if values is None:
+        return
+      if values[0] == _EMIT:
+        _, name, sender, data, msg_type = values
+        signal = self._signals.get(name)
+        if signal is None:
+          continue
+        if msg_type is not None:
+          data['MsgType'] = msg_type
+          try:
+            data = self.message_class.from_dict(data)
+          except InvalidMessageException as e:
+            self.invalid_messages += 1
+            logging.warning('SignalBridgeClient(%s) dropped an invalid %s emit: %s=%r',
+                            self.path, name, e.tag, e.value)
+            continue
+        signal(sender, data)
+      elif values[0] == _SUBSCRIBE:
+        self._acked()
+
+  def close(self):
+    with self._lock:
+      self._closing.set()
+      sock = self._sock
+    if sock is not None:
+      _close_socket(sock)
+    self._thread.join()
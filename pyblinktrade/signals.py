@@ -1,113 +1,599 @@
+import sys
+import time
 import weakref
 import inspect
 import traceback
 import logging
 import threading
+from collections import deque
+from timeit import default_timer as _timer
+
+try:
+  from concurrent.futures import Future, CancelledError
+except ImportError:
+  Future = CancelledError = None
+
+def _call_receivers(receivers, sender, data):
+  # runs on the executor, so errors are sent back, as formatted tracebacks
+  # by receiver index, instead of reported here, along with the time spent
+  # in every receiver
+  sent = False
+  errors = []
+  times = []
+  for index, receiver in enumerate(receivers):
+    start = _timer()
+    try:
+      receiver(sender, data)
+      sent = True
+
+    # pylint: disable=W0702
+    except:
+      errors.append((index, traceback.format_exc()))
+    times.append(_timer() - start)
+  return sent, errors, times
+
+def batch_slot(slot):
+  """
+  Marks a slot as taking the whole list of items of Signal.emit_many in a
+  single call, instead of one call per item.
+  """
+  slot.signal_batch = True
+  return slot
+
+def _slot_name(slot):
+  func = getattr(slot, '__func__', slot)
+  name = getattr(func, '__qualname__', None)
+  if name is None:
+    name = getattr(func, '__name__', repr(func))
+    if hasattr(slot, '__self__'):
+      name = '%s.%s' % (type(slot.__self__).__name__, name)
+  return '%s.%s' % (getattr(func, '__module__', None), name)
+
+
+class SlotError(object):
+  """
+  Error raised by a slot, as sent through Signal.slot_error. The traceback
+  is formatted the first time the error is converted to a string, and only
+  kept for the errors picked by the signal's traceback sampling.
+  Signal.signal_error still gets that string.
+  """
+  __slots__ = ('signal', 'slot', 'sender', 'exc_type', 'exc_value', 'time', 'disconnected', '_exc_traceback',
+               '_text')
+
+  def __init__(self, signal, slot, sender, exc_info=(None, None, None), text=None):
+    self.signal = signal
+    self.slot = slot
+    self.sender = sender
+    self.exc_type, self.exc_value, self._exc_traceback = exc_info
+    self.time = time.time()
+    self.disconnected = False
+    self._text = text
+
+  @property
+  def slot_name(self):
+    return _slot_name(self.slot) if self.slot is not None else None
+
+  @property
+  def traceback(self):
+    """The formatted traceback, or None if it wasn't sampled"""
+    if self._text is None and self._exc_traceback is not None:
+      self._text = ''.join(traceback.format_exception(self.exc_type, self.exc_value, self._exc_traceback))
+      self._exc_traceback = None
+    return self._text
+
+  def __str__(self):
+    text = self.traceback
+    if text is None:
+      text = ''.join(traceback.format_exception_only(self.exc_type, self.exc_value)).strip() + \
+             ' (traceback not sampled)'
+    if self.disconnected:
+      text += '\n%s was disconnected' % self.slot_name
+    return text
+
+  def __repr__(self):
+    return 'SlotError(%s, %r)' % (self.slot_name, self.exc_value)
+
+
+class SlotErrorStats(object):
+  __slots__ = ('name', 'errors', 'consecutive_failures', 'window_start', 'window_errors', 'last_error_time',
+               'disconnected')
+
+  def __init__(self, name):
+    self.name = name
+    self.errors = 0
+    self.consecutive_failures = 0
+    self.window_start = 0
+    self.window_errors = 0
+    self.last_error_time = None
+    self.disconnected = False
+
+  def add_error(self, now, window):
+    if now - self.window_start >= window:
+      self.window_start = now
+      self.window_errors = 0
+    self.errors += 1
+    self.window_errors += 1
+    self.consecutive_failures += 1
+    self.last_error_time = now
+
+
+class SlotProfile(object):
+  __slots__ = ('slot', 'sender', 'calls', 'total_time', 'max_time')
+
+  def __init__(self, slot, sender):
+    self.slot = slot
+    self.sender = sender
+    self.calls = 0
+    self.total_time = 0.0
+    self.max_time = 0.0
+
+  def as_dict(self):
+    return {
+      'slot': self.slot,
+      'sender': self.sender,
+      'calls': self.calls,
+      'total_time': self.total_time,
+      'max_time': self.max_time,
+      'mean_time': self.total_time / self.calls if self.calls else 0.0,
+    }
+
+
+class SignalProfiler(object):
+  """
+  Times every slot call of the signals it is enabled on, by slot name and
+  sender. When a call takes longer than latency_budget seconds,
+  on_slow_slot(signal, info) is called, which can also be a Signal.
+  """
+  def __init__(self, latency_budget=None, on_slow_slot=None):
+    self.latency_budget = latency_budget
+    self.on_slow_slot = on_slow_slot
+    self._lock = threading.Lock()
+    self._names = weakref.WeakKeyDictionary()
+    self._profiles = {}
+
+  def record(self, signal, target, func, sender, elapsed):
+    slot_function = target if func is None else func
+    with self._lock:
+      name = self._names.get(slot_function)
+      if name is None:
+        slot = target if func is None else func.__get__(target, type(target))
+        name = self._names[slot_function] = _slot_name(slot)
+
+      key = (name, sender)
+      profile = self._profiles.get(key)
+      if profile is None:
+        profile = self._profiles[key] = SlotProfile(name, sender)
+      profile.calls += 1
+      profile.total_time += elapsed
+      if elapsed > profile.max_time:
+        profile.max_time = elapsed
+
+    if self.latency_budget is not None and elapsed > self.latency_budget and self.on_slow_slot is not None:
+      self.on_slow_slot(signal, {'slot': name, 'sender': sender, 'time': elapsed, 'budget': self.latency_budget})
+
+  def stats(self):
+    with self._lock:
+      return [profile.as_dict() for profile in self._profiles.values()]
+
+  def top_slow_slots(self, n=10, key='max_time'):
+    """Returns the n slowest slots by max_time, total_time, mean_time or calls"""
+    return sorted(self.stats(), key=lambda profile: profile[key], reverse=True)[:n]
+
+  def reset(self):
+    with self._lock:
+      self._profiles = {}
+
 
 class Signal():
+  # slot errors as text, and as SlotError records
   signal_error = None
-  _lock = threading.RLock()
+  slot_error = None
+
+  # per slot, only the first error_traceback_limit errors of every
+  # error_window seconds keep their traceback
+  error_window = 60
+  error_traceback_limit = 10
+  # disconnects a slot after this many failures in a row, None to never
+  max_consecutive_failures = None
 
-  def __init__(self):
+  def __init__(self, executor=None):
+    # connect/disconnect change the subscriptions while holding the lock.
+    # Emits don't lock, they go through an immutable snapshot of the slots,
+    # see _build_slots_cache.
+    self._lock = threading.Lock()
+    self._slots_cache = None
+    # (weakref, function) of a slot -> SlotErrorStats, and the ones which
+    # failed on their last call
+    self._slot_errors = {}
+    self._failing_slots = {}
+    self._profiler = None
     self._functions = weakref.WeakSet()
     self._methods = weakref.WeakKeyDictionary()
 
     self._methods_subs = {}
     self._functions_subs = {}
 
+    # emits submitted to the executor which wait for the previous emit to
+    # the same sender to finish
+    self.executor = executor
+    self._dispatch_lock = threading.Lock()
+    self._dispatch_queues = {}
+
     if not Signal.signal_error:
       Signal.signal_error = 1
       Signal.signal_error = Signal()
+      Signal.slot_error = Signal()
 
   def connect(self, slot, sender=None):
-    if sender:
-      if inspect.ismethod(slot):
-        if sender not in self._methods_subs:
-          self._methods_subs[sender] = weakref.WeakKeyDictionary()
+    with self._lock:
+      if sender:
+        if inspect.ismethod(slot):
+          if sender not in self._methods_subs:
+            self._methods_subs[sender] = weakref.WeakKeyDictionary()
 
-        if slot.__self__ not in self._methods_subs[sender]:
-          self._methods_subs[sender][slot.__self__] = set()
+          if slot.__self__ not in self._methods_subs[sender]:
+            self._methods_subs[sender][slot.__self__] = set()
 
-        self._methods_subs[sender][slot.__self__].add(slot.__func__)
-      else:
-        if sender not in self._functions_subs:
-          self._functions_subs[sender] = weakref.WeakSet()
-        self._functions_subs[sender].add(slot)
-    else:
-      if inspect.ismethod(slot):
-        if slot.__self__ not in self._methods:
-          self._methods[slot.__self__] = set()
-        self._methods[slot.__self__].add(slot.__func__)
+          self._methods_subs[sender][slot.__self__].add(slot.__func__)
+        else:
+          if sender not in self._functions_subs:
+            self._functions_subs[sender] = weakref.WeakSet()
+          self._functions_subs[sender].add(slot)
       else:
-        self._functions.add(slot)
+        if inspect.ismethod(slot):
+          if slot.__self__ not in self._methods:
+            self._methods[slot.__self__] = set()
+          self._methods[slot.__self__].add(slot.__func__)
+        else:
+          self._functions.add(slot)
+      self._slots_cache = None
 
   def disconnect(self, slot, sender=None):
-    if sender:
-      if inspect.ismethod(slot):
-        if sender in self._methods_subs:
-          if slot.__self__ in self._methods_subs[sender]:
-            self._methods_subs[sender][slot.__self__].remove(slot.__func__)
-            if len(self._methods_subs[sender][slot.__self__])== 0:
-              del self._methods_subs[sender][slot.__self__]
-              if len(self._methods_subs[sender]) ==0:
-                del self._methods_subs[sender]
-      else:
-        if sender in self._functions_subs:
-          self._functions_subs[sender].remove(slot)
-          if len(self._functions_subs[sender]) == 0:
-            del self._functions_subs[sender]
-    else:
-      if inspect.ismethod(slot):
-        if slot.__self__ in self._methods:
-          del self._methods[slot.__self__][slot.__func__]
+    with self._lock:
+      if sender:
+        if inspect.ismethod(slot):
+          if sender in self._methods_subs:
+            if slot.__self__ in self._methods_subs[sender]:
+              self._methods_subs[sender][slot.__self__].discard(slot.__func__)
+              if len(self._methods_subs[sender][slot.__self__])== 0:
+                del self._methods_subs[sender][slot.__self__]
+                if len(self._methods_subs[sender]) ==0:
+                  del self._methods_subs[sender]
+        else:
+          if sender in self._functions_subs:
+            self._functions_subs[sender].discard(slot)
+            if len(self._functions_subs[sender]) == 0:
+              del self._functions_subs[sender]
       else:
-        self._functions.remove(slot)
+        if inspect.ismethod(slot):
+          if slot.__self__ in self._methods:
+            self._methods[slot.__self__].discard(slot.__func__)
+            if not self._methods[slot.__self__]:
+              del self._methods[slot.__self__]
+        else:
+          self._functions.discard(slot)
+      self._slots_cache = None
+
+  def _build_slots_cache(self):
+    """
+    Flattens the subscriptions into (weakref, function) tuples: one for the
+    slots connected to every sender and one per sender with subscriptions,
+    which starts with the former. function is None for function slots and
+    the unbound function of method slots. The cache is dropped whenever a
+    slot is connected, disconnected or garbage collected.
+    """
+    self_ref = weakref.ref(self)
+    def on_slot_collected(ref):
+      signal = self_ref()
+      if signal is not None:
+        signal._slots_cache = None
+
+    def flatten(functions, methods):
+      slots = [(weakref.ref(func, on_slot_collected), None) for func in functions]
+      for obj, funcs in list(methods.items()):
+        ref = weakref.ref(obj, on_slot_collected)
+        slots.extend((ref, func) for func in funcs)
+      return tuple(slots)
 
-  def __call__(self, sender, data=None, error_signal_on_error=True):
     with self._lock:
-      sent = False
-      errors = []
-
-      def publish_functions(functions):
-        for func in functions:
-          try:
-            func(sender, data)
-            sent = True
-
-          # pylint: disable=W0702
-          except:
-            errors.append(traceback.format_exc())
-      publish_functions(self._functions)
-      if sender in self._functions_subs:
-        publish_functions(self._functions_subs[sender])
-        if not self._functions_subs[sender]:
-          del self._functions_subs[sender]
-
-
-
-      def publish_methods( methods ):
-        for obj, funcs in methods.items():
-          for func in funcs:
-            try:
-              func(obj, sender, data)
-              sent = True
-
-            # pylint: disable=W0702
-            except:
-              errors.append(traceback.format_exc())
-      publish_methods(self._methods)
-
-      if sender in self._methods_subs:
-        publish_methods(self._methods_subs[sender])
-        if not self._methods_subs[sender]:
-          del self._methods_subs[sender]
-
-
-      for error in errors:
-        if error_signal_on_error:
-          Signal.signal_error(self, (error), False)
+      # forget senders whose slots were all garbage collected
+      for subs in (self._functions_subs, self._methods_subs):
+        for sender in [sender for sender, slots in subs.items() if not slots]:
+          del subs[sender]
+      for key in [key for key in self._slot_errors if key[0]() is None]:
+        del self._slot_errors[key]
+        self._failing_slots.pop(key, None)
+
+      slots = flatten(self._functions, self._methods)
+      sender_slots = {}
+      for sender in set(self._functions_subs) | set(self._methods_subs):
+        sender_slots[sender] = slots + flatten(self._functions_subs.get(sender, ()),
+                                               self._methods_subs.get(sender, {}))
+      self._slots_cache = (slots, sender_slots)
+      return self._slots_cache
+
+  def _slots(self, sender):
+    cache = self._slots_cache
+    if cache is None:
+      cache = self._build_slots_cache()
+    return cache[1].get(sender, cache[0])
+
+  def _receivers(self, sender):
+    """Returns the (target, func) of the slots currently connected for a sender"""
+    receivers = []
+    for ref, func in self._slots(sender):
+      target = ref()
+      if target is not None:
+        receivers.append((target, func))
+    return receivers
+
+  def __call__(self, sender, data=None, error_signal_on_error=True):
+    if self._profiler is not None:
+      return self._emit_profiled(sender, (data,), False, error_signal_on_error)
+
+    cache = self._slots_cache
+    if cache is None:
+      cache = self._build_slots_cache()
+
+    sent = False
+    errors = None
+    failing_slots = self._failing_slots
+    for ref, func in cache[1].get(sender, cache[0]):
+      target = ref()
+      if target is None:
+        continue
+      try:
+        if func is None:
+          target(sender, data)
         else:
-          logging.critical(error)
+          func(target, sender, data)
+        sent = True
+        if failing_slots:
+          self._slot_succeeded(target, func)
+
+      # pylint: disable=W0702
+      except:
+        if errors is None:
+          errors = []
+        errors.append((target, func, sys.exc_info()))
+
+    if errors:
+      self._slots_failed(sender, errors, error_signal_on_error)
+    return sent
+
+  def emit_many(self, sender, items, error_signal_on_error=True):
+    """
+    Emits every item of a list, looking the slots up once. Slots decorated
+    with batch_slot are called once with the list, the others once per item.
+    """
+    if not items:
+      return False
+    if self._profiler is not None:
+      return self._emit_profiled(sender, items, True, error_signal_on_error)
+
+    cache = self._slots_cache
+    if cache is None:
+      cache = self._build_slots_cache()
+
+    sent = False
+    errors = None
+    failing_slots = self._failing_slots
+    batch = (items,)
+    for ref, func in cache[1].get(sender, cache[0]):
+      target = ref()
+      if target is None:
+        continue
+      for data in (batch if getattr(target if func is None else func, 'signal_batch', False) else items):
+        try:
+          if func is None:
+            target(sender, data)
+          else:
+            func(target, sender, data)
+          sent = True
+          if failing_slots:
+            self._slot_succeeded(target, func)
+
+        # pylint: disable=W0702
+        except:
+          if errors is None:
+            errors = []
+          errors.append((target, func, sys.exc_info()))
+
+    if errors:
+      self._slots_failed(sender, errors, error_signal_on_error)
+    return sent
+
+  def enable_profiling(self, latency_budget=None, on_slow_slot=None, profiler=None):
+    """Starts timing every slot call, see SignalProfiler. A profiler can be shared by several signals"""
+    if profiler is None:
+      profiler = SignalProfiler(latency_budget, on_slow_slot)
+    self._profiler = profiler
+    return profiler
+
+  def disable_profiling(self):
+    self._profiler = None
+
+  def top_slow_slots(self, n=10, key='max_time'):
+    if self._profiler is None:
+      return []
+    return self._profiler.top_slow_slots(n, key)
+
+  def _emit_profiled(self, sender, items, batched, error_signal_on_error):
+    profiler = self._profiler
+    sent = False
+    errors = None
+    batch = (items,)
+    for ref, func in self._slots(sender):
+      target = ref()
+      if target is None:
+        continue
+      calls = batch if batched and getattr(target if func is None else func, 'signal_batch', False) else items
+
+      for data in calls:
+        start = _timer()
+        try:
+          if func is None:
+            target(sender, data)
+          else:
+            func(target, sender, data)
+          sent = True
+          if self._failing_slots:
+            self._slot_succeeded(target, func)
+
+        # pylint: disable=W0702
+        except:
+          if errors is None:
+            errors = []
+          errors.append((target, func, sys.exc_info()))
+        profiler.record(self, target, func, sender, _timer() - start)
+
+    if errors:
+      self._slots_failed(sender, errors, error_signal_on_error)
+    return sent
+
+  def _slot_succeeded(self, target, func):
+    stats = self._failing_slots.pop((weakref.ref(target), func), None)
+    if stats is not None:
+      stats.consecutive_failures = 0
+
+  def _slots_failed(self, sender, errors, error_signal_on_error):
+    """
+    errors are (target, func, exc_info), or the formatted traceback instead
+    of exc_info for the errors sent back by an executor.
+    """
+    now = time.time()
+    records = []
+    for target, func, exc_info in errors:
+      slot = target if func is None else func.__get__(target, type(target))
+      key = (weakref.ref(target), func)
+      with self._lock:
+        stats = self._slot_errors.get(key)
+        if stats is None:
+          stats = self._slot_errors[key] = SlotErrorStats(_slot_name(slot))
+        stats.add_error(now, self.error_window)
+        self._failing_slots[key] = stats
+        sampled = stats.window_errors <= self.error_traceback_limit
+        trip = self.max_consecutive_failures is not None and \
+               stats.consecutive_failures >= self.max_consecutive_failures
+
+      if not isinstance(exc_info, tuple):
+        text = exc_info if sampled else exc_info.rstrip().splitlines()[-1] + ' (traceback not sampled)'
+        record = SlotError(self, slot, sender, text=text)
+      else:
+        record = SlotError(self, slot, sender, exc_info if sampled else exc_info[:2] + (None,))
+      if trip:
+        self.disconnect(slot)
+        self.disconnect(slot, sender)
+        stats.disconnected = record.disconnected = True
+      records.append(record)
+    self._report_errors(records, error_signal_on_error)
+
+  def slot_error_stats(self):
+    """Returns the error counters of every slot which failed, by slot name"""
+    now = time.time()
+    with self._lock:
+      stats = list(self._slot_errors.values())
+
+    report = {}
+    for slot_stats in stats:
+      window_errors = slot_stats.window_errors if now - slot_stats.window_start < self.error_window else 0
+      report[slot_stats.name] = {
+        'errors': slot_stats.errors,
+        'consecutive_failures': slot_stats.consecutive_failures,
+        'window_errors': window_errors,
+        'error_rate': float(window_errors) / self.error_window,
+        'last_error_time': slot_stats.last_error_time,
+        'disconnected': slot_stats.disconnected,
+      }
+    return report
+
+  def _report_errors(self, errors, error_signal_on_error):
+    for error in errors:
+      if error_signal_on_error:
+        Signal.slot_error(self, error, False)
+        # only formatted when someone listens
+        if Signal.signal_error._slots(self):
+          Signal.signal_error(self, str(error), False)
+      else:
+        logging.critical('%s', error)
+
+  def submit(self, sender, data=None, error_signal_on_error=True, executor=None):
+    """
+    Emits the signal on an executor instead of the calling thread, returning a
+    Future with the result of the emit. Emits to the same sender are delivered
+    in the order they were submitted. With a process pool, slots and data must
+    be picklable.
+    """
+    executor = executor or self.executor
+    future = Future()
+    if executor is None:
+      future.set_result(self(sender, data, error_signal_on_error))
+      return future
+
+    job = (executor, self._receivers(sender), data, error_signal_on_error, future)
+    with self._dispatch_lock:
+      queue = self._dispatch_queues.get(sender)
+      if queue is not None:
+        queue.append(job)
+        return future
+      self._dispatch_queues[sender] = deque()
+
+    self._dispatch(sender, job)
+    return future
+
+  def _dispatch(self, sender, job):
+    while job is not None:
+      executor, receivers, data, error_signal_on_error, future = job
+      if not future.set_running_or_notify_cancel():
+        job = self._next_job(sender)
+        continue
+      try:
+        callables = [target if func is None else func.__get__(target, type(target)) for target, func in receivers]
+        result = executor.submit(_call_receivers, callables, sender, data)
+      except Exception as e:
+        future.set_exception(e)
+        job = self._next_job(sender)
+        continue
+
+      if not result.done():
+        result.add_done_callback(lambda result, job=job: self._on_dispatched(sender, job, result))
+        return
+      # finished already, carry on here instead of recursing from the callback
+      self._complete(sender, job, result)
+      job = self._next_job(sender)
+
+  def _on_dispatched(self, sender, job, result):
+    self._complete(sender, job, result)
+    self._dispatch(sender, self._next_job(sender))
+
+  def _complete(self, sender, job, result):
+    receivers, error_signal_on_error, future = job[1], job[3], job[4]
+    if result.cancelled():
+      future.set_exception(CancelledError())
+      return
+    if result.exception() is not None:
+      future.set_exception(result.exception())
+      return
 
-      return sent
+    sent, errors, times = result.result()
+    profiler = self._profiler
+    if profiler is not None:
+      for (target, func), elapsed in zip(receivers, times):
+        profiler.record(self, target, func, sender, elapsed)
+    failed = dict(errors)
+    if self._failing_slots:
+      for index, (target, func) in enumerate(receivers):
+        if index not in failed:
+          self._slot_succeeded(target, func)
+    if failed:
+      self._slots_failed(sender, [receivers[index] + (failed[index],) for index in sorted(failed)],
+                         error_signal_on_error)
+    future.set_result(sent)
 
+  def _next_job(self, sender):
+    with self._dispatch_lock:
+      queue = self._dispatch_queues[sender]
+      if not queue:
+        del self._dispatch_queues[sender]
+        return None
+      return queue.popleft()
@@ -0,0 +1,168 @@
+import unittest
+import threading
+
+try:
+  import asyncio
+  from pyblinktrade.async_signals import AsyncSignal
+except ImportError:
+  asyncio = None
+
+from pyblinktrade.signals import Signal, batch_slot
+
+# slots return awaitables instead of being coroutine functions, so that this
+# module still imports on interpreters without async syntax
+calls = []
+
+def on_signal(sender, data):
+  calls.append(('function', sender, data))
+  return asyncio.sleep(0.01)
+
+class Subscriber(object):
+  def __init__(self, delay=0.01):
+    self.delay = delay
+
+  def on_signal(self, sender, data):
+    calls.append(('method', sender, data))
+    return asyncio.sleep(self.delay)
+
+def on_signal_error(sender, data):
+  calls.append(('error', sender, data))
+  raise ValueError('slot failed')
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncSignal(unittest.TestCase):
+  def setUp(self):
+    del calls[:]
+    self.errors = []
+    self.loop = asyncio.new_event_loop()
+    # Signal.signal_error is created along with the first signal
+    Signal()
+    Signal.signal_error.connect(self.on_error)
+
+  def tearDown(self):
+    Signal.signal_error.disconnect(self.on_error)
+    self.loop.close()
+
+  def on_error(self, sender, error):
+    self.errors.append(str(error))
+
+  def emit(self, signal, *args, **kwargs):
+    return self.loop.run_until_complete(signal(*args, **kwargs))
+
+  def test_await_all(self):
+    signal = AsyncSignal(loop=self.loop)
+    subscriber = Subscriber()
+    signal.connect(on_signal)
+    signal.connect(subscriber.on_signal)
+
+    self.assertTrue(self.emit(signal, 'sender1', 'data1'))
+    self.assertEqual([('function', 'sender1', 'data1'), ('method', 'sender1', 'data1')], calls)
+
+    del subscriber
+    self.emit(signal, 'sender1', 'data2')
+    self.assertEqual(3, len(calls))
+
+  def test_slots_run_concurrently(self):
+    signal = AsyncSignal(loop=self.loop)
+    subscribers = [Subscriber(0.1) for _ in range(10)]
+    for subscriber in subscribers:
+      signal.connect(subscriber.on_signal)
+
+    start = self.loop.time()
+    self.emit(signal, 'sender1', 'data1')
+    self.assertEqual(10, len(calls))
+    self.assertTrue(self.loop.time() - start < 0.5)
+
+  def test_per_sender(self):
+    signal = AsyncSignal(loop=self.loop)
+    subscriber = Subscriber()
+    signal.connect(subscriber.on_signal, 'sender1')
+    self.emit(signal, 'sender2', 'data1')
+    self.assertEqual([], calls)
+    self.emit(signal, 'sender1', 'data2')
+    self.assertEqual([('method', 'sender1', 'data2')], calls)
+
+  def test_fire_and_forget(self):
+    signal = AsyncSignal(loop=self.loop)
+    signal.connect(on_signal)
+    signal.fire('sender1', 'data1')
+    self.assertEqual(1, len(calls))
+    self.assertEqual(1, len(signal._pending))
+    self.loop.run_until_complete(asyncio.sleep(0.05))
+    self.assertEqual(0, len(signal._pending))
+
+  def test_timeout_and_errors(self):
+    signal = AsyncSignal(timeout=0.05, loop=self.loop)
+    slow = Subscriber(5)
+    fast = Subscriber(0)
+    signal.connect(slow.on_signal)
+    signal.connect(fast.on_signal)
+    signal.connect(on_signal_error)
+
+    start = self.loop.time()
+    self.assertTrue(self.emit(signal, 'sender1', 'data1'))
+    self.assertTrue(self.loop.time() - start < 1)
+    self.assertEqual(2, len(self.errors))
+    self.assertTrue(any('ValueError' in error for error in self.errors))
+    self.assertTrue(any('TimeoutError' in error for error in self.errors))
+
+    signal.disconnect(fast.on_signal)
+    self.assertFalse(self.emit(signal, 'sender1', 'data1', timeout=0.01))
+
+  def test_emit_many(self):
+    signal = AsyncSignal(loop=self.loop)
+    batches = []
+    @batch_slot
+    def on_batch(sender, items):
+      batches.append(items)
+      return asyncio.sleep(0)
+    signal.connect(on_signal)
+    signal.connect(on_batch)
+
+    self.assertTrue(self.loop.run_until_complete(signal.emit_many('sender1', ['data1', 'data2'])))
+    self.assertEqual([('function', 'sender1', 'data1'), ('function', 'sender1', 'data2')], calls)
+    self.assertEqual([['data1', 'data2']], batches)
+    self.assertFalse(self.loop.run_until_complete(signal.emit_many('sender1', [])))
+
+  def test_submit_from_another_thread(self):
+    signal = AsyncSignal(loop=self.loop)
+    signal.connect(on_signal)
+    futures = []
+    thread = threading.Thread(target=lambda: futures.append(signal.submit('sender1', 'data1')))
+    thread.start()
+    thread.join()
+
+    self.assertEqual([], calls)
+    self.assertTrue(self.loop.run_until_complete(asyncio.wrap_future(futures[0], loop=self.loop)))
+    self.assertEqual([('function', 'sender1', 'data1')], calls)
+    self.assertRaises(TypeError, signal.submit, 'sender1', 'data1', executor=object())
+
+  def test_profiling(self):
+    signal = AsyncSignal(loop=self.loop)
+    subscriber = Subscriber(0.05)
+    signal.connect(subscriber.on_signal)
+    signal.connect(on_signal_error)
+    profiler = signal.enable_profiling()
+
+    self.emit(signal, 'sender1', 'data1')
+    self.loop.run_until_complete(signal.emit_many('sender1', ['data2', 'data3']))
+    stats = dict((p['slot'].split('.')[-1], p) for p in profiler.stats())
+    self.assertEqual(3, stats['on_signal']['calls'])
+    self.assertTrue(stats['on_signal']['max_time'] >= 0.05)
+    self.assertEqual(3, stats['on_signal_error']['calls'])
+
+  def test_running_loop(self):
+    signal = AsyncSignal()
+    signal.connect(on_signal)
+    self.assertRaises(RuntimeError, signal, 'sender1', 'data1')
+    self.assertEqual([], calls)
+
+    # emitted from a callback of the running loop, with no loop given
+    emitted = self.loop.create_future()
+    self.loop.call_soon(lambda: emitted.set_result(signal('sender1', 'data2')))
+    done = self.loop.run_until_complete(emitted)
+    self.assertTrue(self.loop.run_until_complete(done))
+    self.assertEqual([('function', 'sender1', 'data2')], calls)
+
+if __name__ == '__main__':
+  unittest.main()
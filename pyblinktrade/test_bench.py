@@ -0,0 +1,63 @@
+import unittest
+
+from pyblinktrade.bench import suite, json_backends
+from pyblinktrade.bench.messages import sample_messages
+from pyblinktrade.binary_codec import MSG_TYPES_V1
+from pyblinktrade.message import JsonMessage
+from pyblinktrade.message_builder import MessageBuilder
+from pyblinktrade import json_backend
+
+
+class TestBench(unittest.TestCase):
+  def setUp(self):
+    self.benchmarks = suite.load()
+
+  def test_coverage(self):
+    for msg_type in ('0', 'D', '8', 'X', 'U0', 'U3', 'U31', 'B6', 'S36', 'ERROR'):
+      self.assertTrue('message.parse.%s' % msg_type in self.benchmarks)
+      self.assertTrue('message.validate.%s' % msg_type in self.benchmarks)
+
+    for name in dir(MessageBuilder):
+      if not name.startswith('_'):
+        self.assertTrue('message_builder.%s' % name in self.benchmarks, name)
+
+    for count in (1, 10, 1000):
+      self.assertTrue('signal.functions.%d' % count in self.benchmarks)
+      self.assertTrue('signal.methods.%d' % count in self.benchmarks)
+      self.assertTrue('signal.per_sender_functions.%d' % count in self.benchmarks)
+
+  def test_sample_messages_are_valid(self):
+    samples = sample_messages()
+    self.assertTrue(set(MSG_TYPES_V1) <= set(samples))
+    for msg_type, message in samples.items():
+      self.assertEqual(msg_type, JsonMessage(json_backend.dumps(message)).type)
+
+  def test_benchmarks_run(self):
+    for factory in self.benchmarks.values():
+      factory()()
+
+  def test_json_backends_keep_the_selected_backend(self):
+    previous = json_backend.set_backend('json')
+    try:
+      results = json_backends.run(number=1, repeat=1)
+      self.assertEqual(set(json_backend.available_backends()), set(row[0] for row in results))
+      self.assertEqual('json', json_backend.get_backend().name)
+    finally:
+      json_backend.set_backend(previous.name)
+
+  def test_run_and_compare(self):
+    results = suite.run(r'^message_builder\.login$|^signal\.functions\.1$', repeat=1, min_time=0.001)
+    self.assertEqual(['message_builder.login', 'signal.functions.1'], list(results['benchmarks']))
+    self.assertTrue(results['benchmarks']['signal.functions.1']['seconds'] > 0)
+
+    baseline = {'benchmarks': {
+      'message_builder.login': {'seconds': results['benchmarks']['message_builder.login']['seconds'] / 2},
+      'signal.functions.1': {'seconds': results['benchmarks']['signal.functions.1']['seconds'] * 2},
+      'removed': {'seconds': 1},
+    }}
+    rows = suite.compare(results, baseline, threshold=0.1)
+    self.assertEqual([('message_builder.login', True), ('signal.functions.1', False)],
+                     [(row[0], row[4]) for row in rows])
+
+if __name__ == '__main__':
+  unittest.main()
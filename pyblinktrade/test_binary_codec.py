@@ -0,0 +1,102 @@
+import json
+import decimal
+import datetime
+import unittest
+
+from pyblinktrade import binary_codec
+from pyblinktrade.binary_codec import encode, decode, decode_message, is_binary, loads, \
+  InvalidBinaryMessageException
+from pyblinktrade.json_encoder import JsonEncoder
+from pyblinktrade.bench.messages import MESSAGES, NEW_ORDER_SINGLE
+from pyblinktrade.message import JsonMessage
+from pyblinktrade.message_builder import MessageBuilder
+from pyblinktrade.typed_messages import NewOrderSingle
+
+
+class TestBinaryCodec(unittest.TestCase):
+  def test_round_trip(self):
+    for _, message in MESSAGES:
+      data = encode(message)
+      self.assertTrue(is_binary(data))
+      self.assertEqual(json.loads(json.dumps(message)), decode(data))
+      self.assertTrue(len(data) < len(json.dumps(message)))
+
+  def test_message_builder_round_trip(self):
+    messages = [
+      MessageBuilder.testRequestMessage(),
+      MessageBuilder.login(5, 'user', 'abc12345'),
+      MessageBuilder.getDepositList(['0', '1'], page_size=20),
+      MessageBuilder.requestBalances(client_id=90000001),
+    ]
+    for message in messages:
+      self.assertEqual(json.loads(json.dumps(message)), decode(encode(message)))
+
+  def test_json_message(self):
+    msg = JsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    decoded = decode_message(encode(msg))
+    self.assertTrue(decoded.isNewOrderSingle())
+    self.assertEqual(msg.message, decoded.message)
+
+    typed = NewOrderSingle.from_dict(NEW_ORDER_SINGLE)
+    self.assertEqual(NEW_ORDER_SINGLE, decode(encode(typed)))
+
+  def test_integers(self):
+    values = [0, 1, -1, 63, 64, -64, -65, 127, 128, 2**31, -2**31, 2**63, -2**63 - 1, 2**100]
+    message = {'MsgType': 'D', 'Values': values, 'Price': -41030000000000}
+    self.assertEqual(message, decode(encode(message)))
+
+  def test_unknown_tags_and_types(self):
+    message = {'MsgType': 'Z9', 'SomeNewTag': u'\u20ac', 'Symbol': 'BTCUSD', 'Nested': {'Inner': [None, True]}}
+    decoded = decode(encode(message))
+    self.assertEqual(message, decoded)
+    self.assertEqual(u'\u20ac', decoded['SomeNewTag'])
+
+  def test_values(self):
+    message = {'MsgType': 'U3', 'Float': 0.5, 'Empty': '', 'None': None, 'True': True, 'False': False,
+               'Tuple': (1, 2), 'IntKeys': {1: 'a'}}
+    decoded = decode(encode(message))
+    self.assertEqual(0.5, decoded['Float'])
+    self.assertTrue(decoded['True'] is True)
+    self.assertTrue(decoded['False'] is False)
+    self.assertEqual([1, 2], decoded['Tuple'])
+    self.assertEqual({'1': 'a'}, decoded['IntKeys'])
+
+    self.assertRaises(TypeError, encode, {'MsgType': '0', 'TestReqID': object()})
+    self.assertRaises(TypeError, encode, {'MsgType': '0', 'Data': {(1, 2): 1}})
+
+  def test_decimal_and_datetime(self):
+    message = {'MsgType': 'U3', 'Amount': decimal.Decimal('1.50000000'),
+               'Created': datetime.datetime(2014, 1, 2, 3, 4, 5), 'Date': datetime.date(2014, 1, 2),
+               'Time': datetime.time(3, 4, 5), 'Fees': [decimal.Decimal('-0.1')]}
+    decoded = decode(encode(message))
+    self.assertEqual(json.loads(json.dumps(message, cls=JsonEncoder)), decoded)
+    self.assertEqual('1.50000000', decoded['Amount'])
+    self.assertEqual('2014-01-02 03:04:05', decoded['Created'])
+
+  def test_invalid(self):
+    data = encode(NEW_ORDER_SINGLE)
+    self.assertRaises(InvalidBinaryMessageException, decode, data[:-1])
+    self.assertRaises(InvalidBinaryMessageException, decode, data + b'\x00')
+    self.assertRaises(InvalidBinaryMessageException, decode, b'{}')
+    self.assertRaises(InvalidBinaryMessageException, decode, data[:1] + b'\xff' + data[2:])
+
+  def test_dictionary_is_append_only(self):
+    self.assertEqual('ClOrdID', binary_codec.TAGS_V1[0])
+    self.assertEqual('0', binary_codec.MSG_TYPES_V1[0])
+    self.assertEqual(len(binary_codec.TAGS_V1), len(set(binary_codec.TAGS_V1)))
+    self.assertEqual(len(binary_codec.MSG_TYPES_V1), len(set(binary_codec.MSG_TYPES_V1)))
+
+  def test_values_round_trip(self):
+    values = ['order_book', 7, {'Symbol': 'BTCUSD', 'Price': -0.5, 'Custom': [None, True]}]
+    data = binary_codec.encode_values(values)
+    self.assertEqual(values, binary_codec.decode_values(data))
+    self.assertRaises(InvalidBinaryMessageException, binary_codec.decode_values, data[:-1])
+    self.assertRaises(InvalidBinaryMessageException, binary_codec.decode_values, b'')
+
+  def test_loads_any(self):
+    self.assertEqual(NEW_ORDER_SINGLE, loads(encode(NEW_ORDER_SINGLE)))
+    self.assertEqual(NEW_ORDER_SINGLE, loads(json.dumps(NEW_ORDER_SINGLE)))
+    self.assertFalse(is_binary(json.dumps(NEW_ORDER_SINGLE)))
+
+if __name__ == '__main__':
+  unittest.main()
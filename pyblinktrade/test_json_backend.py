@@ -0,0 +1,93 @@
+import json
+import decimal
+import datetime
+import unittest
+
+from pyblinktrade import json_backend
+from pyblinktrade.json_encoder import JsonEncoder, json_default
+from pyblinktrade.message import JsonMessage
+
+
+class TestJsonBackend(unittest.TestCase):
+  def setUp(self):
+    self.default_backend = json_backend.get_backend().name
+
+  def tearDown(self):
+    json_backend.set_backend(self.default_backend)
+
+  def test_backends_encode_decimal_and_datetime(self):
+    data = {
+      'MsgType': 'U3',
+      'Amount': decimal.Decimal('1.50000000'),
+      'Created': datetime.datetime(2014, 1, 2, 3, 4, 5),
+      'Date': datetime.date(2014, 1, 2),
+      'Time': datetime.time(3, 4, 5),
+      4: [1, 2.5, None, True, u'caf\xe9']
+    }
+    expected = {
+      'MsgType': 'U3',
+      'Amount': '1.50000000',
+      'Created': '2014-01-02 03:04:05',
+      'Date': '2014-01-02',
+      'Time': '03:04:05',
+      '4': [1, 2.5, None, True, u'caf\xe9']
+    }
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      self.assertEqual(expected, backend.loads(json_backend.dumps(data)), name)
+      self.assertEqual(expected, json.loads(json.dumps(data, cls=JsonEncoder)), name)
+      self.assertRaises(TypeError, json_backend.dumps, {'a': object()})
+
+  def test_json_message_uses_backend(self):
+    for name in json_backend.available_backends():
+      json_backend.set_backend(name)
+      msg = JsonMessage('{"MsgType": "0", "TestReqID": 1}')
+      msg.set('Amount', decimal.Decimal('0.1'))
+      self.assertEqual({'MsgType': '0', 'TestReqID': 1, 'Amount': '0.1'}, json.loads(msg.raw_message))
+
+  def test_json_encoder_options(self):
+    self.assertEqual('{\n  "a": 1\n}', json.dumps({'a': 1}, cls=JsonEncoder, indent=2))
+    self.assertEqual('{"a":1,"b":2}', json.dumps({'b': 2, 'a': 1}, cls=JsonEncoder, sort_keys=True, separators=(',', ':')))
+
+  def test_json_encoder_output_does_not_depend_on_backend(self):
+    data = {'Text': u'caf\xe9 \u20ac', 'Price': float('nan'), 'Qty': float('inf'), 'Big': 2 ** 70,
+            'Amount': decimal.Decimal('0.1')}
+    expected = json.dumps(data, default=json_default)
+    for name in json_backend.available_backends():
+      json_backend.set_backend(name)
+      self.assertEqual(expected, json.dumps(data, cls=JsonEncoder), name)
+      self.assertEqual(expected, JsonEncoder().encode(data), name)
+
+  def test_big_integers_keep_the_backend_format(self):
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      small = backend.dumps({'Text': u'caf\xe9', 'ReqID': 1})
+      big = backend.dumps({'Text': u'caf\xe9', 'ReqID': 2 ** 70})
+      self.assertEqual(small.replace('1', str(2 ** 70)), big, name)
+
+  def test_loads_what_the_json_module_loads(self):
+    raws = ['{"ReqID": %d}' % 2 ** 64, '[%d, -%d]' % (2 ** 70, 2 ** 63 + 1), '{"Price": NaN}',
+            '[Infinity, -Infinity, 1e400]', '{"Text": "caf\\u00e9", "Qty": 12345678901234567890}']
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      for raw in raws:
+        self.assertEqual(repr(json.loads(raw)), repr(backend.loads(raw)), name)
+        self.assertEqual(repr(json.loads(raw)), repr(backend.loads(raw.encode('utf-8'))), name)
+      self.assertRaises(ValueError, backend.loads, '{"a": }')
+
+  def test_register_backend(self):
+    self.addCleanup(json_backend.unregister_backend, 'test')
+    json_backend.register_backend('test', json.loads, json.dumps)
+    json_backend.register_backend('test', json.loads, lambda obj: json.dumps(obj, cls=JsonEncoder, sort_keys=True))
+    self.assertEqual(1, json_backend.available_backends().count('test'))
+    json_backend.set_backend('test')
+    self.assertEqual('{"a": 1, "b": 2}', json_backend.dumps({'b': 2, 'a': 1}))
+    self.assertRaises(ValueError, json_backend.set_backend, 'unknown')
+
+  def test_unregister_backend(self):
+    json_backend.register_backend('test', json.loads, json.dumps, preferred=True)
+    self.assertEqual('test', json_backend.set_backend().name)
+    json_backend.unregister_backend('test')
+    self.assertFalse('test' in json_backend.available_backends())
+    self.assertEqual(json_backend.available_backends()[0], json_backend.get_backend().name)
+    self.assertRaises(ValueError, json_backend.set_backend, 'test')
@@ -0,0 +1,242 @@
+import json
+import unittest
+
+from pyblinktrade import json_backend
+from pyblinktrade.message import JsonMessage, LazyJsonMessage, peek_field, peek_message_type, MESSAGE_SCHEMAS, MESSAGE_TYPES, compile_message_schema, register_message_type, \
+  unregister_message_type, InvalidMessageTypeException, InvalidMessageMissingTagException, InvalidMessageFieldException
+
+
+def new_order_single(**kwargs):
+  msg = {
+    'MsgType': 'D',
+    'ClOrdID': '1234',
+    'Symbol': 'BTCUSD',
+    'Side': '1',
+    'OrdType': '2',
+    'Price': 4000000000000,
+    'OrderQty': 50000000
+  }
+  msg.update(kwargs)
+  return json.dumps(dict((k, v) for k, v in msg.items() if v is not None))
+
+
+class TestJsonMessageValidation(unittest.TestCase):
+  def test_heartbeat(self):
+    msg = JsonMessage('{"MsgType": "0", "TestReqID": 1}')
+    self.assertEqual('0', msg.type)
+    self.assertEqual(1, msg.get('TestReqID'))
+
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage('{"MsgType": "0"}')
+    self.assertEqual('TestReqID', ctx.exception.tag)
+
+  def test_invalid_message_type(self):
+    self.assertRaises(InvalidMessageTypeException, JsonMessage, '{"TestReqID": 1}')
+    self.assertRaises(InvalidMessageTypeException, JsonMessage, '{"MsgType": "ZZ"}')
+
+  def test_message_type_without_schema(self):
+    msg = JsonMessage('{"MsgType": "8", "OrderID": 1}')
+    self.assertEqual(1, msg.get('OrderID'))
+
+  def test_new_order_single(self):
+    msg = JsonMessage(new_order_single())
+    self.assertEqual('BTCUSD', msg.get('Symbol'))
+
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage(new_order_single(Symbol=None))
+    self.assertEqual('Symbol', ctx.exception.tag)
+
+    with self.assertRaises(InvalidMessageFieldException) as ctx:
+      JsonMessage(new_order_single(Side='3'))
+    self.assertEqual('Side', ctx.exception.tag)
+    self.assertEqual('3', ctx.exception.value)
+
+    with self.assertRaises(InvalidMessageFieldException) as ctx:
+      JsonMessage(new_order_single(OrderQty=-1))
+    self.assertEqual('OrderQty', ctx.exception.tag)
+
+  def test_new_order_single_conditional_rules(self):
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage(new_order_single(Price=None))
+    self.assertEqual('Price', ctx.exception.tag)
+
+    # market orders don't carry a price
+    JsonMessage(new_order_single(OrdType='1', Price=None))
+
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage(new_order_single(OrdType='4'))
+    self.assertEqual('StopPx', ctx.exception.tag)
+
+    with self.assertRaises(InvalidMessageFieldException) as ctx:
+      JsonMessage(new_order_single(OrdType='3', StopPx=1.5))
+    self.assertEqual('StopPx', ctx.exception.tag)
+
+  def test_order_cancel_request(self):
+    JsonMessage('{"MsgType": "F", "OrderID": 10}')
+    JsonMessage('{"MsgType": "F", "Side": "1"}')
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage('{"MsgType": "F"}')
+    self.assertEqual('Side', ctx.exception.tag)
+
+    with self.assertRaises(InvalidMessageFieldException) as ctx:
+      JsonMessage('{"MsgType": "F", "ClOrdID": 10}')
+    self.assertEqual('ClOrdID', ctx.exception.tag)
+
+  def test_deposit_request_requires_any_of(self):
+    JsonMessage('{"MsgType": "U18", "DepositReqID": 1, "Currency": "BTC"}')
+    with self.assertRaises(InvalidMessageMissingTagException) as ctx:
+      JsonMessage('{"MsgType": "U18", "DepositReqID": 1}')
+    self.assertEqual('DepositID,DepositMethodID,Currency', ctx.exception.tag)
+
+  def test_all_schemas_compile(self):
+    for msg_type, rules in MESSAGE_SCHEMAS.items():
+      self.assertTrue(callable(compile_message_schema(rules)), msg_type)
+
+  def test_unknown_rule(self):
+    self.assertRaises(ValueError, compile_message_schema, [('bogus', 'Tag')])
+
+
+class TestMessageTypeRegistry(unittest.TestCase):
+  def test_predicates(self):
+    msg = JsonMessage('{"MsgType": "0", "TestReqID": 1}')
+    self.assertTrue(msg.isHeartbeat())
+    self.assertFalse(msg.isNewOrderSingle())
+    self.assertTrue(JsonMessage(new_order_single()).isNewOrderSingle())
+
+  def test_registry_is_not_rebuilt_per_message(self):
+    JsonMessage('{"MsgType": "0", "TestReqID": 1}')
+    predicate = JsonMessage.__dict__['isHeartbeat']
+    JsonMessage('{"MsgType": "0", "TestReqID": 2}')
+    self.assertTrue(predicate is JsonMessage.__dict__['isHeartbeat'])
+    self.assertTrue(JsonMessage.valid_message_types is MESSAGE_TYPES)
+
+  def test_register_message_type(self):
+    register_message_type('Z900', 'PrivateTestRequest', [
+      ('required', 'PrivateReqID'),
+      ('int', 'PrivateReqID'),
+    ])
+    self.addCleanup(unregister_message_type, 'Z900')
+    self.assertEqual('PrivateTestRequest', MESSAGE_TYPES['Z900'])
+
+    msg = JsonMessage('{"MsgType": "Z900", "PrivateReqID": 1}')
+    self.assertTrue(msg.isPrivateTestRequest())
+    self.assertFalse(msg.isHeartbeat())
+    self.assertRaises(InvalidMessageFieldException, JsonMessage, '{"MsgType": "Z900", "PrivateReqID": "1"}')
+
+    self.assertRaises(ValueError, register_message_type, 'Z900', 'Other')
+    self.assertRaises(ValueError, register_message_type, 'Z901', 'Heartbeat')
+
+  def test_register_message_type_with_function(self):
+    def validate(raw_message, message):
+      if message.get('Value') != 42:
+        raise InvalidMessageFieldException(raw_message, message, 'Value', message.get('Value'))
+
+    register_message_type('Z902', 'PrivateAnswer', validate)
+    self.addCleanup(unregister_message_type, 'Z902')
+    JsonMessage('{"MsgType": "Z902", "Value": 42}')
+    self.assertRaises(InvalidMessageFieldException, JsonMessage, '{"MsgType": "Z902", "Value": 1}')
+
+  def test_unregister_message_type(self):
+    register_message_type('Z903', 'PrivateGone', [('required', 'GoneReqID')])
+    unregister_message_type('Z903')
+    self.assertFalse('Z903' in MESSAGE_TYPES)
+    self.assertFalse('Z903' in MESSAGE_SCHEMAS)
+    self.assertFalse(hasattr(JsonMessage, 'isPrivateGone'))
+    self.assertRaises(InvalidMessageTypeException, JsonMessage, '{"MsgType": "Z903"}')
+    self.assertRaises(ValueError, unregister_message_type, 'Z903')
+
+
+class TestLazyJsonMessage(unittest.TestCase):
+  def test_peek_field(self):
+    raw = '{"MsgType": "D", "Symbol": "BTCUSD", "Instruments": [{"Symbol": "BTCBRL"}]}'
+    self.assertEqual('D', peek_message_type(raw))
+    self.assertEqual('BTCUSD', peek_field(raw, 'Symbol'))
+    self.assertEqual(None, peek_field(raw, 'ClientID'))
+    self.assertEqual(10, peek_field(raw, 'ClientID', 10))
+
+  def test_peek_field_ignores_nested_and_string_values(self):
+    raw = '{"Text": "\\"Symbol\\": 1", "MDIncGrp": [{"Symbol": "BTCBRL"}], "MsgType": "X"}'
+    self.assertEqual(None, peek_field(raw, 'Symbol'))
+    self.assertEqual('X', peek_message_type(raw))
+
+    raw = '{"MsgType": "B", "Headline": "Symbol", "Text": "{", "Symbol": "BTCUSD"}'
+    self.assertEqual('BTCUSD', peek_field(raw, 'Symbol'))
+
+    raw = b'{"MsgType": "0", "TestReqID": 1}'
+    self.assertEqual('0', peek_message_type(raw))
+
+  def test_lazy_decode(self):
+    msg = LazyJsonMessage(new_order_single())
+    self.assertEqual('D', msg.type)
+    self.assertTrue(msg.isNewOrderSingle())
+    self.assertEqual('BTCUSD', msg.peek('Symbol'))
+    self.assertFalse(msg.decoded)
+
+    self.assertEqual('1234', msg.get('ClOrdID'))
+    self.assertTrue(msg.decoded)
+    self.assertTrue(msg.is_valid())
+
+  def test_lazy_validation(self):
+    self.assertRaises(InvalidMessageTypeException, LazyJsonMessage, '{"TestReqID": 1}')
+    self.assertRaises(InvalidMessageTypeException, LazyJsonMessage, '{"MsgType": "ZZ"}')
+
+    msg = LazyJsonMessage(new_order_single(OrderQty=0))
+    self.assertEqual('D', msg.type)
+    self.assertFalse(msg.is_valid())
+    self.assertRaises(InvalidMessageFieldException, msg.get, 'ClOrdID')
+
+  def test_lazy_bad_message_types(self):
+    for raw in ('{"MsgType": [1]}', '{"MsgType": {"0": 1}}', '{"MsgType": 0}', '[{"MsgType": "0"}]', '5'):
+      self.assertRaises(InvalidMessageTypeException, LazyJsonMessage, raw)
+
+  def test_lazy_from_dict(self):
+    msg = LazyJsonMessage.from_dict(json.loads(new_order_single()))
+    self.assertTrue(isinstance(msg, LazyJsonMessage))
+    self.assertTrue(msg.decoded)
+    self.assertTrue(msg.is_valid())
+    self.assertEqual('BTCUSD', msg.peek('Symbol'))
+    self.assertEqual('1234', msg.get('ClOrdID'))
+    self.assertEqual('D', json.loads(msg.raw_message)['MsgType'])
+    self.assertRaises(InvalidMessageFieldException, LazyJsonMessage.from_dict,
+                      json.loads(new_order_single(OrderQty=0)))
+
+
+class TestJsonMessageSet(unittest.TestCase):
+  def setUp(self):
+    self.dumps = json_backend.dumps
+    self.dumps_calls = 0
+    def counting_dumps(obj):
+      self.dumps_calls += 1
+      return self.dumps(obj)
+    json_backend.dumps = counting_dumps
+
+  def tearDown(self):
+    json_backend.dumps = self.dumps
+
+  def test_set_serializes_on_demand(self):
+    msg = JsonMessage(new_order_single())
+    msg.set('BrokerID', 5).set('UserID', 90800003)
+    msg['Username'] = 'trader'
+    self.assertEqual(0, self.dumps_calls)
+
+    raw = json.loads(msg.raw_message)
+    self.assertEqual('D', raw['MsgType'])
+    self.assertEqual(5, raw['BrokerID'])
+    self.assertEqual('trader', raw['Username'])
+    self.assertEqual(90800003, msg.get('UserID'))
+
+    msg.raw_message
+    self.assertEqual(1, self.dumps_calls)
+
+  def test_update(self):
+    msg = JsonMessage(new_order_single())
+    self.assertTrue(msg.update({'BrokerID': 5, 'SessionID': 'abc'}) is msg)
+    self.assertEqual('abc', msg.get('SessionID'))
+    self.assertEqual('abc', json.loads(msg.raw_message)['SessionID'])
+    self.assertEqual(1, self.dumps_calls)
+
+  def test_untouched_message_keeps_raw_message(self):
+    raw = new_order_single()
+    msg = JsonMessage(raw)
+    self.assertTrue(msg.raw_message is raw)
+    self.assertEqual(0, self.dumps_calls)
@@ -0,0 +1,101 @@
+import decimal
+import unittest
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from pyblinktrade import json_backend
+from pyblinktrade.message_builder import MessageBuilder
+
+ORDERS = [
+  ('BTCUSD', 25000000, 41030000000000, 8374382),
+  ('BTCUSD', 25000000, 41030000000000, '8374382-a'),
+  ('BTCBRL', 1.5, 2.25, 'with "quotes" and \\'),
+  (u'BTC\u20ac', 10**20, 1e16, 1),
+  ('BTC%sUSD', decimal.Decimal('0.5'), 100, 'abc-1'),
+  ('BTCUSD', True, 100, 1),
+]
+
+class TestOrderBytes(unittest.TestCase):
+  def setUp(self):
+    self.default_backend = json_backend.get_backend().name
+
+  def tearDown(self):
+    json_backend.set_backend(self.default_backend)
+
+  def test_same_bytes_as_json_path(self):
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      for order in ORDERS:
+        self.assertEqual(backend.dumps(MessageBuilder.sendLimitedBuyOrder(*order)).encode('utf-8'),
+                         MessageBuilder.sendLimitedBuyOrderBytes(*order), (name, order))
+        self.assertEqual(backend.dumps(MessageBuilder.sendLimitedSellOrder(*order)).encode('utf-8'),
+                         MessageBuilder.sendLimitedSellOrderBytes(*order), (name, order))
+
+  def test_template_follows_backend(self):
+    json_backend.set_backend('json')
+    self.assertTrue(b'"MsgType": "D"' in MessageBuilder.sendLimitedBuyOrderBytes('BTCUSD', 1, 2, 3))
+
+  def test_invalid_orders(self):
+    self.assertRaises(ValueError, MessageBuilder.sendLimitedBuyOrderBytes, 'BTCUSD', 0, 100, 1)
+    self.assertRaises(ValueError, MessageBuilder.sendLimitedSellOrderBytes, 'BTCUSD', 1, -100, 1)
+    self.assertRaises(ValueError, MessageBuilder.sendLimitedSellOrderBytes, None, 1, 100, 1)
+
+
+class TestBulkOrders(unittest.TestCase):
+  def setUp(self):
+    self.default_backend = json_backend.get_backend().name
+
+  def tearDown(self):
+    json_backend.set_backend(self.default_backend)
+
+  def expected(self, symbols, sides, qtys, prices, ids):
+    return [(MessageBuilder.sendLimitedBuyOrder if side == '1' else MessageBuilder.sendLimitedSellOrder)
+            (symbol, qty, price, cl_ord_id) for symbol, side, qty, price, cl_ord_id
+            in zip(symbols, sides, qtys, prices, ids)]
+
+  def test_orders(self):
+    columns = (['BTCUSD', 'BTCBRL', 'BTCUSD'], ['1', '2', '2'], [1, 2, 3], [100, 200, 10**20], [7, 'a-8', 9])
+    self.assertEqual(self.expected(*columns), MessageBuilder.sendLimitedOrders(*columns))
+
+    orders = MessageBuilder.sendLimitedOrders('BTCUSD', '2', (1, 2), (100, 101), (1, 2))
+    self.assertEqual(self.expected(['BTCUSD'] * 2, ['2'] * 2, (1, 2), (100, 101), (1, 2)), orders)
+    self.assertEqual([], MessageBuilder.sendLimitedOrders('BTCUSD', '1', [], [], []))
+
+  def test_wire(self):
+    for name in json_backend.available_backends():
+      backend = json_backend.set_backend(name)
+      for columns in ((['BTCUSD', 'BTCBRL'], ['1', '2'], [1, 2], [100, 200], [7, 8]),
+                      (['BTCUSD', 'BTCBRL'], ['1', '2'], [1, 2], [100, 10**20], [7, 'a"8'])):
+        expected = b'\n'.join(backend.dumps(order).encode('utf-8') for order in self.expected(*columns))
+        self.assertEqual(expected, MessageBuilder.sendLimitedOrders(*columns, wire=True), name)
+      self.assertEqual(b'', MessageBuilder.sendLimitedOrders('BTCUSD', '1', [], [], [], wire=True))
+
+  def test_invalid(self):
+    build = MessageBuilder.sendLimitedOrders
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1, 0], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1, 1], [100, -100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1, 1.5], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1, True], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '3', [1, 1], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, ['BTCUSD', ''], '1', [1, 1], [100, 100], [1, 2])
+    self.assertRaises(ValueError, build, 'BTCUSD', '1', [1, 1], [100, 100], [1, None])
+
+  @unittest.skipIf(numpy is None, 'numpy is not installed')
+  def test_numpy_columns(self):
+    qtys = numpy.array([1, 2, 3], dtype=numpy.int64)
+    prices = numpy.arange(100, 103)
+    orders = MessageBuilder.sendLimitedOrders('BTCUSD', numpy.array(['1', '2', '1']), qtys, prices,
+                                              numpy.arange(1, 4))
+    self.assertEqual(self.expected(['BTCUSD'] * 3, ['1', '2', '1'], [1, 2, 3], [100, 101, 102], [1, 2, 3]), orders)
+    self.assertTrue(all(type(order['Price']) is int for order in orders))
+
+    self.assertRaises(ValueError, MessageBuilder.sendLimitedOrders, 'BTCUSD', '1', qtys * 1.5, prices, [1, 2, 3])
+    self.assertRaises(ValueError, MessageBuilder.sendLimitedOrders, 'BTCUSD', '1', qtys - 1, prices, [1, 2, 3])
+
+
+if __name__ == '__main__':
+  unittest.main()
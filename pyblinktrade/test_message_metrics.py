@@ -0,0 +1,89 @@
+import json
+import unittest
+
+from pyblinktrade import message_metrics
+from pyblinktrade.message import JsonMessage, LazyJsonMessage, InvalidMessageException, get_message_metrics
+from pyblinktrade.message_metrics import MessageMetrics, Histogram
+from pyblinktrade.signals import Signal
+
+NEW_ORDER_SINGLE = {'MsgType': 'D', 'ClOrdID': '1', 'Symbol': 'BTCUSD', 'Side': '1', 'OrdType': '2',
+                    'Price': 4000000000000, 'OrderQty': 50000000}
+
+def _parse(message_class, raw_message):
+  try:
+    return message_class(raw_message)
+  except (InvalidMessageException, ValueError):
+    return None
+
+class TestMessageMetrics(unittest.TestCase):
+  def setUp(self):
+    self.metrics = message_metrics.enable()
+
+  def tearDown(self):
+    message_metrics.disable()
+
+  def test_disabled_by_default(self):
+    message_metrics.disable()
+    self.assertTrue(get_message_metrics() is None)
+    JsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    self.assertEqual({}, self.metrics.snapshot()['message_types'])
+
+  def test_counters(self):
+    self.assertTrue(message_metrics.get_metrics() is self.metrics)
+    raw_message = json.dumps(NEW_ORDER_SINGLE)
+    for x in range(3):
+      JsonMessage(raw_message)
+    JsonMessage(json.dumps({'MsgType': '0', 'TestReqID': 1}))
+    LazyJsonMessage(raw_message).get('Price')
+
+    snapshot = self.metrics.snapshot()['message_types']
+    self.assertEqual(4, snapshot['D']['accepted'])
+    self.assertEqual(0, snapshot['D']['rejected'])
+    self.assertEqual(1, snapshot['0']['accepted'])
+    self.assertEqual(4, snapshot['D']['size']['count'])
+    self.assertEqual(4 * len(raw_message), snapshot['D']['size']['sum'])
+    self.assertEqual(4, snapshot['D']['parse_latency']['count'])
+    self.assertEqual(4, sum(count for _, count in snapshot['D']['validation_latency']['buckets']))
+    self.assertEqual(None, snapshot['D']['parse_latency']['buckets'][-1][0])
+
+  def test_rejections(self):
+    _parse(JsonMessage, json.dumps(dict(NEW_ORDER_SINGLE, Price=-1)))
+    _parse(JsonMessage, json.dumps(dict(NEW_ORDER_SINGLE, Price=-2)))
+    _parse(JsonMessage, json.dumps(dict(NEW_ORDER_SINGLE, Side='3')))
+    _parse(JsonMessage, json.dumps({'MsgType': '0'}))
+    _parse(JsonMessage, json.dumps({'MsgType': 'ZZ'}))
+    _parse(JsonMessage, '{"MsgType": ')
+    _parse(JsonMessage, 'x' * (JsonMessage.MAX_MESSAGE_LENGTH + 1))
+
+    snapshot = self.metrics.snapshot()['message_types']
+    self.assertEqual(3, snapshot['D']['rejected'])
+    self.assertEqual({'InvalidMessageFieldException': {'Price': 2, 'Side': 1}}, snapshot['D']['rejections'])
+    self.assertEqual({'InvalidMessageMissingTagException': {'TestReqID': 1}}, snapshot['0']['rejections'])
+    self.assertEqual(3, snapshot[None]['rejected'])
+    self.assertEqual({'InvalidMessageTypeException': {None: 1}, 'ValueError': {None: 1},
+                      'InvalidMessageLengthException': {None: 1}}, snapshot[None]['rejections'])
+
+    self.metrics.reset()
+    self.assertEqual({}, self.metrics.snapshot()['message_types'])
+
+  def test_signal(self):
+    signal = Signal()
+    snapshots = []
+    def on_metrics(sender, snapshot):
+      snapshots.append(snapshot)
+    signal.connect(on_metrics)
+
+    message_metrics.enable(MessageMetrics(signal=signal, publish_interval=0))
+    JsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    self.assertEqual(1, len(snapshots))
+    self.assertEqual(1, snapshots[0]['message_types']['D']['accepted'])
+
+  def test_histogram(self):
+    histogram = Histogram((1, 10))
+    for value in (0, 1, 5, 10, 11, 100):
+      histogram.add(value)
+    self.assertEqual([[1, 2], [10, 2], [None, 2]], histogram.snapshot()['buckets'])
+    self.assertEqual(100, histogram.snapshot()['max'])
+
+if __name__ == '__main__':
+  unittest.main()
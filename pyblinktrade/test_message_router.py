@@ -0,0 +1,84 @@
+import json
+import unittest
+
+from pyblinktrade.message import JsonMessage, LazyJsonMessage
+from pyblinktrade.message_router import MessageRouter
+from pyblinktrade.typed_messages import NewOrderSingle
+
+NEW_ORDER_SINGLE = {'MsgType': 'D', 'ClOrdID': '1', 'Symbol': 'BTCUSD', 'Side': '1', 'OrdType': '2',
+                    'Price': 4000000000000, 'OrderQty': 50000000, 'BrokerID': 5}
+
+class Handler(object):
+  def __init__(self, name, calls):
+    self.name = name
+    self.calls = calls
+
+  def on_message(self, sender, msg):
+    self.calls.append((self.name, sender, msg))
+
+class TestMessageRouter(unittest.TestCase):
+  def setUp(self):
+    self.calls = []
+    self.router = MessageRouter()
+
+  def handler(self, name, msg_type, key=None, sender=None):
+    handler = Handler(name, self.calls)
+    self.router.connect(handler.on_message, msg_type, key, sender)
+    return handler
+
+  def names(self):
+    return sorted(call[0] for call in self.calls)
+
+  def test_route_by_msg_type(self):
+    handlers = [
+      self.handler('orders', 'D'),
+      self.handler('btcusd', 'D', ('Symbol', 'BTCUSD')),
+      self.handler('btcbrl', 'D', ('Symbol', 'BTCBRL')),
+      self.handler('broker5', 'D', ('BrokerID', 5)),
+      self.handler('heartbeat', '0'),
+      self.handler('all', None),
+    ]
+
+    msg = JsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    self.assertTrue(self.router('session1', msg))
+    self.assertEqual(['all', 'broker5', 'btcusd', 'orders'], self.names())
+    self.assertTrue(all(call[2] is msg for call in self.calls))
+
+    del self.calls[:]
+    self.assertTrue(self.router('session1', {'MsgType': '0', 'TestReqID': 1}))
+    self.assertEqual(['all', 'heartbeat'], self.names())
+
+    del self.calls[:]
+    self.router('session1', {'MsgType': 'U2', 'BalanceReqID': 1})
+    self.assertEqual(['all'], self.names())
+
+  def test_lazy_and_typed_messages(self):
+    handlers = [self.handler('btcusd', 'D', ('Symbol', 'BTCUSD'))]
+    msg = LazyJsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    self.router('session1', msg)
+    self.assertEqual(['btcusd'], self.names())
+    self.assertFalse(msg.decoded)
+
+    self.router('session1', NewOrderSingle.from_dict(NEW_ORDER_SINGLE))
+    self.assertEqual(['btcusd', 'btcusd'], self.names())
+
+  def test_sender_and_weak_references(self):
+    session = self.handler('session1', 'D', sender='session1')
+    broker = self.handler('broker', 'D', ('BrokerID', 5))
+    self.router('session2', NEW_ORDER_SINGLE)
+    self.assertEqual(['broker'], self.names())
+    self.router('session1', NEW_ORDER_SINGLE)
+    self.assertEqual(['broker', 'broker', 'session1'], self.names())
+
+    del self.calls[:]
+    del broker
+    self.router.disconnect(session.on_message, 'D', sender='session1')
+    self.assertFalse(self.router('session1', NEW_ORDER_SINGLE))
+    self.assertEqual([], self.calls)
+
+  def test_unhashable_values(self):
+    handler = self.handler('symbol', 'D', ('Symbol', 'BTCUSD'))
+    self.assertFalse(self.router('session1', dict(NEW_ORDER_SINGLE, Symbol=['BTCUSD'])))
+
+if __name__ == '__main__':
+  unittest.main()
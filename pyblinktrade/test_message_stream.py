@@ -0,0 +1,105 @@
+import io
+import json
+import unittest
+
+from pyblinktrade.message import JsonMessage, InvalidMessageLengthException, InvalidMessageMissingTagException, \
+  InvalidMessageTypeException, InvalidMessageFieldException
+from pyblinktrade.message_stream import JsonMessageStream, InvalidFrameException
+
+
+def heartbeat(test_req_id):
+  return json.dumps({'MsgType': '0', 'TestReqID': test_req_id})
+
+
+class TestJsonMessageStream(unittest.TestCase):
+  def test_newline_delimited(self):
+    stream = JsonMessageStream()
+    messages = list(stream.feed('\n'.join(heartbeat(i) for i in range(3)) + '\n'))
+    self.assertEqual([0, 1, 2], [msg.get('TestReqID') for msg in messages])
+    self.assertEqual([], stream.close())
+
+  def test_concatenated_frames_split_across_reads(self):
+    raw = heartbeat(1) + '{"MsgType": "B", "Headline": "a {\\"b\\"}", "LinesOfText": 1, "Text": "}"}' + heartbeat(2)
+    stream = JsonMessageStream()
+    messages = []
+    for pos in range(len(raw)):
+      messages.extend(stream.feed(raw[pos]))
+    messages.extend(stream.close())
+
+    self.assertEqual(3, len(messages))
+    self.assertTrue(all(isinstance(msg, JsonMessage) for msg in messages))
+    self.assertEqual('a {"b"}', messages[1].get('Headline'))
+    self.assertEqual('}', messages[1].get('Text'))
+
+  def test_bytes_split_inside_utf8_character(self):
+    raw = json.dumps({'MsgType': 'B', 'Headline': u'caf\xe9', 'LinesOfText': 1, 'Text': u'\u20ac'}, ensure_ascii=False).encode('utf-8')
+    stream = JsonMessageStream()
+    messages = []
+    for pos in range(len(raw)):
+      messages.extend(stream.feed(raw[pos:pos + 1]))
+    self.assertEqual(u'caf\xe9', messages[0].get('Headline'))
+    self.assertEqual(u'\u20ac', messages[0].get('Text'))
+
+  def test_errors_are_yielded(self):
+    raw = heartbeat(1) + ' garbage ' + '{"MsgType": "0"}' + '{"MsgType": "0" "TestReqID": 1}' + heartbeat(2) + '{"MsgType": "0"'
+    items = list(JsonMessageStream([raw]))
+
+    self.assertEqual(1, items[0].get('TestReqID'))
+    self.assertTrue(isinstance(items[1], InvalidFrameException))
+    self.assertEqual('garbage ', items[1].raw_message)
+    self.assertTrue(isinstance(items[2], InvalidMessageMissingTagException))
+    self.assertTrue(isinstance(items[3], InvalidFrameException))
+    self.assertEqual(2, items[4].get('TestReqID'))
+    self.assertTrue(isinstance(items[5], InvalidFrameException))
+    self.assertEqual(6, len(items))
+
+  def test_bad_message_types_are_yielded(self):
+    raw = '{"MsgType": [1]}' + heartbeat(1) + ' 5 null {"MsgType": {"0": 1}}' + heartbeat(2)
+    items = list(JsonMessageStream([raw]))
+
+    self.assertTrue(isinstance(items[0], InvalidMessageTypeException))
+    self.assertEqual(1, items[1].get('TestReqID'))
+    self.assertTrue(isinstance(items[2], InvalidFrameException))
+    self.assertTrue(isinstance(items[3], InvalidMessageTypeException))
+    self.assertEqual(2, items[4].get('TestReqID'))
+    self.assertEqual(5, len(items))
+
+  def test_wrongly_typed_fields_are_yielded(self):
+    stream = JsonMessageStream()
+    items = list(stream.feed(b'{"MsgType":"U30","DepositListReqID":1,"StatusList":5}{"MsgType":"1","TestReqID":1}'))
+    self.assertEqual(2, len(items))
+    self.assertTrue(isinstance(items[0], InvalidMessageFieldException))
+    self.assertEqual('StatusList', items[0].tag)
+    self.assertEqual(1, items[1].get('TestReqID'))
+
+  def test_unexpected_errors_are_yielded(self):
+    class BrokenMessage(JsonMessage):
+      def __init__(self, raw_message):
+        raise KeyError('broken validator')
+    items = list(JsonMessageStream([heartbeat(1)], message_class=BrokenMessage))
+    self.assertEqual(1, len(items))
+    self.assertTrue(isinstance(items[0], InvalidFrameException))
+    self.assertTrue('KeyError' in items[0].value)
+
+  def test_raise_errors(self):
+    stream = JsonMessageStream(raise_errors=True)
+    frames = stream.feed('{"MsgType": "0"}' + heartbeat(1))
+    self.assertRaises(InvalidMessageMissingTagException, list, frames)
+    self.assertEqual(1, list(stream.feed(''))[0].get('TestReqID'))
+
+  def test_max_frame_length(self):
+    stream = JsonMessageStream(max_frame_length=64)
+    items = list(stream.feed('{"MsgType": "B", "Text": "' + 'x' * 50))
+    items.extend(stream.feed('x' * 1000))
+    self.assertTrue(len(stream._buffer) <= 64)
+    items.extend(stream.feed('"}' + heartbeat(1)))
+
+    self.assertEqual(2, len(items))
+    self.assertTrue(isinstance(items[0], InvalidMessageLengthException))
+    self.assertEqual(1, items[1].get('TestReqID'))
+
+  def test_file_source(self):
+    source = io.BytesIO(('\n'.join(heartbeat(i) for i in range(1000))).encode('utf-8'))
+    stream = JsonMessageStream(source)
+    stream.CHUNK_SIZE = 100
+    self.assertEqual(list(range(1000)), [msg.get('TestReqID') for msg in stream])
@@ -0,0 +1,123 @@
+import unittest
+import threading
+
+from pyblinktrade.message_builder import MessageBuilder
+from pyblinktrade.pending_requests import PendingRequests, RequestTimeoutException
+from pyblinktrade.page_iterator import PageIterator, InMemoryTransport, RequestTransport
+
+COLUMNS = ['DepositID', 'Value']
+ROWS = [['deposit%d' % i, i] for i in range(250)]
+
+class GatedTransport(InMemoryTransport):
+  """Holds every response back until gate is set, sent is set once wait_for requests were sent"""
+  def __init__(self, rows, columns, wait_for):
+    InMemoryTransport.__init__(self, rows, columns)
+    self.gate = threading.Event()
+    self.sent = threading.Event()
+    self.wait_for = wait_for
+
+  def __call__(self, request):
+    self.requests.append(request)
+    waiter = self.pending.add(request)
+    response = self.response(request)
+    def answer():
+      self.gate.wait()
+      self.pending.complete(response)
+    thread = threading.Thread(target=answer)
+    thread.daemon = True
+    thread.start()
+    if len(self.requests) == self.wait_for:
+      self.sent.set()
+    return waiter
+
+
+class TestPageIterator(unittest.TestCase):
+  def test_walks_all_pages(self):
+    transport = InMemoryTransport(ROWS, COLUMNS)
+    rows = list(PageIterator(transport, MessageBuilder.getDepositList(['4']), page_size=100))
+    self.assertEqual(ROWS, rows)
+
+    # pages 0, 1 and 2, plus the prefetched page 3 sent before page 2 turned out short
+    self.assertEqual([0, 1, 2, 3], [request['Page'] for request in transport.requests])
+    self.assertTrue(all(request['PageSize'] == 100 for request in transport.requests))
+    req_ids = [request['DepositListReqID'] for request in transport.requests]
+    self.assertEqual(len(req_ids), len(set(req_ids)))
+
+  def test_stops_on_short_or_empty_page(self):
+    transport = InMemoryTransport(ROWS[:200], COLUMNS)
+    pages = list(PageIterator(transport, MessageBuilder.getWithdrawList(['1']), page_size=100, prefetch=0).pages())
+    self.assertEqual([100, 100, 0], [len(page['WithdrawListGrp']) for page in pages])
+    self.assertEqual([0, 1, 2], [request['Page'] for request in transport.requests])
+
+  def test_as_dicts(self):
+    transport = InMemoryTransport(ROWS[:3], COLUMNS)
+    rows = list(PageIterator(transport, MessageBuilder.getBrokerList(['1']), as_dicts=True))
+    self.assertEqual({'DepositID': 'deposit2', 'Value': 2}, rows[2])
+
+  def test_as_dicts_without_columns(self):
+    request = MessageBuilder.getBrokerList(['1'])
+    self.assertEqual([], list(PageIterator(InMemoryTransport([]), request, as_dicts=True)))
+    self.assertRaises(ValueError, list, PageIterator(InMemoryTransport(ROWS[:3]), request, as_dicts=True))
+
+  def test_prefetch_overlaps_round_trips(self):
+    transport = GatedTransport(ROWS * 2, COLUMNS, wait_for=5)
+    rows = []
+    consumer = threading.Thread(target=lambda: rows.extend(
+      PageIterator(transport, MessageBuilder.getDepositList(['4']), page_size=50, prefetch=4)))
+    consumer.start()
+
+    # the first page and the 4 prefetched ones are all sent before any answer
+    self.assertTrue(transport.sent.wait(5))
+    self.assertEqual([0, 1, 2, 3, 4], [request['Page'] for request in transport.requests])
+    transport.gate.set()
+    consumer.join(5)
+    self.assertEqual(ROWS * 2, rows)
+
+  def test_cancels_prefetched_pages(self):
+    pending = PendingRequests()
+    server = InMemoryTransport(ROWS[:150], COLUMNS)
+    def send(request):
+      # pages past the short one are never answered
+      if request['Page'] <= 1:
+        pending.complete(server.response(request))
+
+    rows = list(PageIterator(RequestTransport(send, pending), MessageBuilder.getDepositList(['4']), prefetch=3))
+    self.assertEqual(ROWS[:150], rows)
+    self.assertEqual(0, len(pending))
+
+  def test_cancels_on_early_break(self):
+    pending = PendingRequests()
+    server = InMemoryTransport(ROWS, COLUMNS)
+    def send(request):
+      if request['Page'] <= 1:
+        pending.complete(server.response(request))
+
+    for row in PageIterator(RequestTransport(send, pending), MessageBuilder.getDepositList(['4']), prefetch=2):
+      break
+    self.assertEqual(0, len(pending))
+
+  def test_request_transport(self):
+    pending = PendingRequests()
+    server = InMemoryTransport(ROWS, COLUMNS)
+    sent = []
+    def send(request):
+      sent.append(request)
+      pending.complete(server.response(request))
+
+    rows = list(PageIterator(RequestTransport(send, pending), MessageBuilder.getDepositList(['4']), page_size=100))
+    self.assertEqual(ROWS, rows)
+    self.assertEqual(4, len(sent))
+    self.assertEqual(0, len(pending))
+
+  def test_timeout(self):
+    pending = PendingRequests()
+    pages = PageIterator(RequestTransport(lambda request: None, pending), MessageBuilder.getDepositList(['4']),
+                         timeout=0.01)
+    self.assertRaises(RequestTimeoutException, list, pages)
+
+  def test_not_paginated(self):
+    self.assertRaises(ValueError, PageIterator, InMemoryTransport([]), MessageBuilder.requestBalances())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,99 @@
+import json
+import unittest
+
+from pyblinktrade.message import JsonMessage, InvalidMessageException, \
+  InvalidMessageFieldException, InvalidMessageMissingTagException, InvalidMessageTypeException
+from pyblinktrade.parallel_validator import ParallelMessageValidator
+
+
+def _raw_messages(count):
+  raw_messages = []
+  for x in range(count):
+    if x % 5 == 1:
+      raw_messages.append(json.dumps({'MsgType': 'D', 'ClOrdID': str(x), 'Symbol': 'BTCUSD', 'Side': '1',
+                                      'OrdType': '2', 'Price': -1, 'OrderQty': 1}))
+    elif x % 5 == 2:
+      raw_messages.append(json.dumps({'MsgType': 'ZZ'}))
+    elif x % 5 == 3:
+      raw_messages.append('{"MsgType": "0", ')
+    elif x % 5 == 4:
+      raw_messages.append(json.dumps({'MsgType': '0'}))
+    else:
+      raw_messages.append(json.dumps({'MsgType': '0', 'TestReqID': x}))
+  return raw_messages
+
+class BrokenMessage(object):
+  def __init__(self, raw_message):
+    raise KeyError('broken validator')
+
+class TestParallelMessageValidator(unittest.TestCase):
+  def check_results(self, raw_messages, results, validate_only=False):
+    self.assertEqual(len(raw_messages), len(results))
+    for x, result in enumerate(results):
+      if x % 5 == 0:
+        if validate_only:
+          self.assertTrue(result is True)
+        else:
+          self.assertTrue(isinstance(result, JsonMessage))
+          self.assertEqual(x, result.get('TestReqID'))
+      elif x % 5 == 1:
+        self.assertTrue(isinstance(result, InvalidMessageFieldException))
+        self.assertEqual('Price', result.tag)
+        self.assertEqual(raw_messages[x], result.raw_message)
+      elif x % 5 == 2:
+        self.assertTrue(isinstance(result, InvalidMessageTypeException))
+      elif x % 5 == 3:
+        self.assertTrue(isinstance(result, InvalidMessageException))
+      else:
+        self.assertTrue(isinstance(result, InvalidMessageMissingTagException))
+        self.assertEqual('TestReqID', result.tag)
+
+  def test_in_process(self):
+    raw_messages = _raw_messages(53)
+    validator = ParallelMessageValidator(workers=1, chunk_size=7)
+    self.check_results(raw_messages, validator.validate(raw_messages))
+
+  def test_process_pool(self):
+    raw_messages = _raw_messages(503)
+    with ParallelMessageValidator(workers=2, chunk_size=10) as validator:
+      self.check_results(raw_messages, validator.validate(iter(raw_messages)))
+      self.assertEqual([], validator.validate([]))
+
+  def test_validate_only(self):
+    raw_messages = _raw_messages(40)
+    with ParallelMessageValidator(workers=2, chunk_size=3, validate_only=True) as validator:
+      self.check_results(raw_messages, validator.validate(raw_messages), validate_only=True)
+
+  def test_not_an_object(self):
+    raw_messages = ['5', 'null', '[]', '"0"', '{"MsgType": [1]}', '{"MsgType": {"0": 1}}', '{"MsgType": 0}',
+                    json.dumps({'MsgType': '0', 'TestReqID': 1})]
+    with ParallelMessageValidator(workers=2, chunk_size=3) as validator:
+      results = validator.validate(raw_messages)
+    for result in results[:-1]:
+      self.assertTrue(isinstance(result, InvalidMessageTypeException), result)
+    self.assertEqual(1, results[-1].get('TestReqID'))
+
+  def test_wrong_field_types(self):
+    raw_messages = [
+      json.dumps({'MsgType': 'BE', 'BrokerID': 5, 'UserReqID': 1, 'Username': 'user', 'UserReqTyp': '1',
+                  'Password': 'abc', 'Token': 5}),
+      json.dumps({'MsgType': 'U30', 'DepositListReqID': 1, 'StatusList': 5}),
+      json.dumps({'MsgType': '0', 'TestReqID': 1}),
+    ]
+    with ParallelMessageValidator(workers=2, chunk_size=1) as validator:
+      results = validator.validate(raw_messages)
+    self.assertTrue(isinstance(results[0], InvalidMessageFieldException))
+    self.assertEqual('Token', results[0].tag)
+    self.assertTrue(isinstance(results[1], InvalidMessageFieldException))
+    self.assertEqual('StatusList', results[1].tag)
+    self.assertEqual(1, results[2].get('TestReqID'))
+
+  def test_unexpected_validator_errors(self):
+    with ParallelMessageValidator(workers=2, chunk_size=1, message_class=BrokenMessage) as validator:
+      results = validator.validate(['{}', '{}'])
+    for result in results:
+      self.assertTrue(isinstance(result, InvalidMessageException))
+      self.assertTrue('KeyError' in result.value)
+
+if __name__ == '__main__':
+  unittest.main()
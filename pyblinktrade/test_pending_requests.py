@@ -0,0 +1,158 @@
+import json
+import socket
+import unittest
+import threading
+
+from pyblinktrade.message import JsonMessage
+from pyblinktrade.message_builder import MessageBuilder
+from pyblinktrade.message_stream import JsonMessageStream
+from pyblinktrade.pending_requests import PendingRequests, RequestTimeoutException, RequestCancelledException
+
+class FakeServer(object):
+  """Answers balance and position requests over a socket, ignores the rest"""
+  RESPONSES = {
+    'U2': ('U3', 'BalanceReqID'),
+    'U42': ('U43', 'PositionReqID'),
+  }
+
+  def __init__(self, sock):
+    self.sock = sock
+    self.thread = threading.Thread(target=self.run)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def run(self):
+    stream = JsonMessageStream()
+    while True:
+      data = self.sock.recv(4096)
+      if not data:
+        return
+      for msg in stream.feed(data):
+        response = self.RESPONSES.get(msg.type)
+        if response is not None:
+          msg_type, tag = response
+          reply = {'MsgType': msg_type, tag: msg.get(tag), 'ClientID': msg.get('ClientID')}
+          self.sock.sendall((json.dumps(reply) + '\n').encode('utf-8'))
+
+class Client(object):
+  def __init__(self, sock, pending):
+    self.sock = sock
+    self.pending = pending
+    self.thread = threading.Thread(target=self.run)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def send(self, request, timeout=None):
+    waiter = self.pending.add(request, timeout)
+    self.sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+    return waiter
+
+  def run(self):
+    stream = JsonMessageStream()
+    while True:
+      data = self.sock.recv(4096)
+      if not data:
+        return
+      for msg in stream.feed(data):
+        self.pending.complete(msg)
+
+
+class TestPendingRequests(unittest.TestCase):
+  def setUp(self):
+    client_sock, server_sock = socket.socketpair()
+    self.socks = (client_sock, server_sock)
+    self.server = FakeServer(server_sock)
+    self.pending = PendingRequests(timeout=5)
+    self.client = Client(client_sock, self.pending)
+
+  def tearDown(self):
+    self.pending.stop_timer()
+    for sock in self.socks:
+      sock.shutdown(socket.SHUT_RDWR)
+    self.client.thread.join(5)
+    self.server.thread.join(5)
+    for sock in self.socks:
+      sock.close()
+
+  def test_responses_complete_their_requests(self):
+    waiters = []
+    for client_id in range(20):
+      waiters.append(self.client.send(MessageBuilder.requestBalances(client_id=client_id + 1)))
+      waiters.append(self.client.send(MessageBuilder.requestPositions(client_id=client_id + 1)))
+
+    for waiter in waiters:
+      response = waiter.result(5)
+      self.assertTrue(isinstance(response, JsonMessage))
+      self.assertEqual(waiter.req_id, response.get(waiter.tag))
+      self.assertEqual(waiter.request['ClientID'], response.get('ClientID'))
+    self.assertEqual(0, len(self.pending))
+
+  def test_unanswered_requests_expire(self):
+    self.pending.start_timer(0.01)
+    waiter = self.client.send(MessageBuilder.getDepositList(['0']), timeout=0.05)
+    answered = self.client.send(MessageBuilder.requestBalances(), timeout=0.05)
+
+    self.assertTrue(answered.result(5) is not None)
+    self.assertRaises(RequestTimeoutException, waiter.result, 5)
+    self.assertEqual('DepositListReqID', waiter.exception.tag)
+    self.assertEqual(0, len(self.pending))
+
+  def test_expire(self):
+    pending = PendingRequests(timeout=10)
+    first = pending.add({'MsgType': 'U2', 'BalanceReqID': 1})
+    second = pending.add({'MsgType': 'U2', 'BalanceReqID': 2}, timeout=20)
+    pending.add({'MsgType': 'U2', 'BalanceReqID': 3}, timeout=30)
+    self.assertEqual(first.deadline, pending.next_deadline())
+
+    self.assertTrue(pending.complete({'MsgType': 'U3', 'BalanceReqID': 1}) is first)
+    self.assertEqual(second.deadline, pending.next_deadline())
+    self.assertEqual([second], pending.expire(second.deadline))
+    self.assertTrue(isinstance(second.exception, RequestTimeoutException))
+    self.assertEqual(1, len(pending))
+
+  def test_unknown_responses(self):
+    pending = PendingRequests()
+    waiter = pending.add({'MsgType': 'U30', 'DepositListReqID': 7})
+    self.assertTrue(pending.complete({'MsgType': 'U3', 'BalanceReqID': 7}) is None)
+    self.assertTrue(pending.complete({'MsgType': 'U31', 'DepositListReqID': 8}) is None)
+    self.assertTrue(pending.complete({'MsgType': 'U31', 'DepositListReqID': [7]}) is None)
+    self.assertFalse(waiter.done())
+
+    self.assertRaises(ValueError, pending.add, {'MsgType': 'U30', 'DepositListReqID': 7})
+    self.assertRaises(ValueError, pending.add, {'MsgType': 'D', 'ClOrdID': '1'})
+
+  def test_cancel_and_callbacks(self):
+    pending = PendingRequests()
+    waiter = pending.add({'MsgType': 'U2', 'BalanceReqID': 1})
+    done = []
+    waiter.add_done_callback(done.append)
+
+    self.assertTrue(pending.cancel(waiter))
+    self.assertFalse(pending.cancel(waiter))
+    self.assertEqual([waiter], done)
+    self.assertRaises(RequestCancelledException, waiter.result)
+
+  def test_callbacks_race_with_completion(self):
+    pending = PendingRequests()
+    waiters = [pending.add({'MsgType': 'U2', 'BalanceReqID': req_id}) for req_id in range(2000)]
+    calls = []
+    def complete():
+      for req_id in range(2000):
+        pending.complete({'MsgType': 'U3', 'BalanceReqID': req_id})
+    thread = threading.Thread(target=complete)
+    thread.start()
+    for waiter in waiters:
+      waiter.add_done_callback(calls.append)
+    thread.join()
+    self.assertEqual(2000, len(calls))
+    self.assertEqual(2000, len(set(id(waiter) for waiter in calls)))
+
+  def test_slot(self):
+    pending = PendingRequests()
+    waiter = pending.add({'MsgType': 'U2', 'BalanceReqID': 1})
+    pending('sender', JsonMessage('{"MsgType": "U3", "BalanceReqID": 1}'))
+    self.assertEqual(1, waiter.result(0).get('BalanceReqID'))
+
+
+if __name__ == '__main__':
+  unittest.main()
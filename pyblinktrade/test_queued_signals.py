@@ -0,0 +1,318 @@
+import gc
+import time
+import unittest
+import threading
+
+from pyblinktrade.signals import Signal, batch_slot
+from pyblinktrade.queued_signals import QueuedSignal
+
+class Subscriber(object):
+  def __init__(self):
+    self.calls = []
+    self.gate = threading.Event()
+    self.gate.set()
+    self.thread = None
+
+  def on_signal(self, sender, data):
+    self.gate.wait()
+    self.thread = threading.current_thread()
+    self.calls.append((sender, data))
+
+class FailingSubscriber(object):
+  def on_signal(self, sender, data):
+    raise ValueError('slot failed %s' % data)
+
+
+class TestQueuedSignal(unittest.TestCase):
+  def setUp(self):
+    self.signals = []
+
+  def tearDown(self):
+    for signal in self.signals:
+      signal.close(wait=False)
+
+  def make_signal(self, **kw):
+    signal = QueuedSignal(**kw)
+    self.signals.append(signal)
+    return signal
+
+  def test_slots_run_on_their_own_worker(self):
+    signal = self.make_signal()
+    sub1 = Subscriber()
+    sub2 = Subscriber()
+    signal.connect(sub1.on_signal)
+    signal.connect(sub2.on_signal)
+
+    for i in range(100):
+      self.assertTrue(signal('sender', i))
+    self.assertTrue(signal.join(5))
+
+    self.assertEqual([('sender', i) for i in range(100)], sub1.calls)
+    self.assertEqual(sub1.calls, sub2.calls)
+    self.assertNotEqual(threading.current_thread(), sub1.thread)
+    self.assertNotEqual(sub1.thread, sub2.thread)
+
+  def test_slow_slot_does_not_delay_others(self):
+    signal = self.make_signal(maxsize=10, policy='drop_newest')
+    slow = Subscriber()
+    slow.gate.clear()
+    fast = Subscriber()
+    signal.connect(slow.on_signal)
+    signal.connect(fast.on_signal)
+
+    for i in range(5):
+      signal('sender', i)
+    deadline = time.time() + 5
+    while len(fast.calls) < 5 and time.time() < deadline:
+      time.sleep(0.001)
+    self.assertEqual(5, len(fast.calls))
+    self.assertEqual([], slow.calls)
+
+    slow.gate.set()
+    self.assertTrue(signal.join(5))
+    self.assertEqual(fast.calls, slow.calls)
+
+  def fill(self, policy, senders=('sender',)):
+    signal = self.make_signal(maxsize=3, policy=policy)
+    sub = Subscriber()
+    sub.gate.clear()
+    signal.connect(sub.on_signal)
+
+    # the worker takes the first item and waits on the gate with it
+    signal('sender', -1)
+    while signal.queue_stats()[0]['depth']:
+      time.sleep(0.001)
+
+    for i in range(6):
+      signal(senders[i % len(senders)], i)
+    stats = signal.queue_stats()[0]
+    sub.gate.set()
+    self.assertTrue(signal.join(5))
+    return sub.calls[1:], stats
+
+  def test_drop_oldest(self):
+    calls, stats = self.fill('drop_oldest')
+    self.assertEqual([('sender', 3), ('sender', 4), ('sender', 5)], calls)
+    self.assertEqual(3, stats['dropped'])
+    self.assertEqual(3, stats['depth'])
+    self.assertEqual(3, stats['max_depth'])
+
+  def test_drop_newest(self):
+    calls, stats = self.fill('drop_newest')
+    self.assertEqual([('sender', 0), ('sender', 1), ('sender', 2)], calls)
+    self.assertEqual(3, stats['dropped'])
+
+  def test_coalesce_keeps_latest_value_per_sender(self):
+    calls, stats = self.fill('coalesce', ('BTCUSD', 'BTCBRL'))
+    self.assertEqual([('BTCUSD', 4), ('BTCBRL', 5)], calls)
+    self.assertEqual(4, stats['coalesced'])
+    self.assertEqual(2, stats['depth'])
+    self.assertEqual(0, stats['dropped'])
+
+  def test_block_waits_for_room(self):
+    signal = self.make_signal(maxsize=2, policy='block')
+    sub = Subscriber()
+    sub.gate.clear()
+    signal.connect(sub.on_signal)
+
+    emitter = threading.Thread(target=lambda: [signal('sender', i) for i in range(10)])
+    emitter.start()
+    emitter.join(0.1)
+    self.assertTrue(emitter.is_alive())
+    self.assertTrue(signal.queue_stats()[0]['depth'] <= 2)
+
+    sub.gate.set()
+    emitter.join(5)
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender', i) for i in range(10)], sub.calls)
+    self.assertEqual(0, signal.queue_stats()[0]['dropped'])
+
+  def test_unknown_policy(self):
+    self.assertRaises(ValueError, QueuedSignal, policy='drop_everything')
+
+  def test_per_sender_slots(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal, 'sender1')
+
+    self.assertFalse(signal('sender2', 1))
+    self.assertTrue(signal('sender1', 2))
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender1', 2)], sub.calls)
+
+  def test_emit_many(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+
+    self.assertTrue(signal.emit_many('sender', range(5)))
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender', i) for i in range(5)], sub.calls)
+
+  def test_emit_many_batch_slot(self):
+    signal = self.make_signal()
+    batches = []
+    @batch_slot
+    def on_batch(sender, items):
+      batches.append((sender, items))
+    sub = Subscriber()
+    signal.connect(on_batch)
+    signal.connect(sub.on_signal)
+
+    items = list(range(5))
+    self.assertTrue(signal.emit_many('sender', items))
+    del items[:]
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender', [0, 1, 2, 3, 4])], batches)
+    self.assertEqual([('sender', i) for i in range(5)], sub.calls)
+    self.assertFalse(signal.emit_many('sender', []))
+
+  def test_join_times_out(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    sub.gate.clear()
+    signal.connect(sub.on_signal)
+    signal('sender', 1)
+    start = time.time()
+    self.assertFalse(signal.join(0.05))
+    self.assertTrue(time.time() - start >= 0.05)
+    sub.gate.set()
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender', 1)], sub.calls)
+
+  def test_closed_signal_drops_emits(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+    signal('sender', 1)
+    signal.close()
+    self.assertFalse(signal('sender', 2))
+    self.assertFalse(signal.emit_many('sender', [3, 4]))
+    self.assertEqual([], signal.queue_stats())
+    self.assertTrue(signal.join(5))
+    self.assertEqual([('sender', 1)], sub.calls)
+
+  def test_slot_errors_are_reported(self):
+    Signal()
+    errors = []
+    def on_error(sender, data):
+      errors.append(str(data))
+    Signal.signal_error.connect(on_error)
+    try:
+      signal = self.make_signal()
+      sub = FailingSubscriber()
+      signal.connect(sub.on_signal)
+      signal('sender', 1)
+      self.assertTrue(signal.join(5))
+    finally:
+      Signal.signal_error.disconnect(on_error)
+
+    self.assertEqual(1, len(errors))
+    self.assertTrue('slot failed 1' in errors[0])
+
+  def test_worker_stops_with_its_slot(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+    signal('sender', 1)
+    self.assertTrue(signal.join(5))
+    queue = list(signal._queues.values())[0]
+
+    del sub
+    gc.collect()
+    self.assertFalse(signal('sender', 2))
+    queue.close()
+    queue.join(5)
+    self.assertFalse(queue._thread.is_alive())
+
+  def test_close_drains_queues(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+    for i in range(50):
+      signal('sender', i)
+    signal.close()
+    self.assertEqual(50, len(sub.calls))
+    self.assertEqual([], signal.queue_stats())
+
+  def test_disconnect_stops_the_worker(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    sub.gate.clear()
+    signal.connect(sub.on_signal)
+    signal.connect(sub.on_signal, 'sender2')
+    for i in range(5):
+      signal('sender', i)
+    queue = list(signal._queues.values())[0]
+    deadline = time.time() + 5
+    while queue.depth > 4 and time.time() < deadline:
+      time.sleep(0.001)
+
+    # still connected for sender2
+    signal.disconnect(sub.on_signal)
+    self.assertTrue(queue in signal._queues.values())
+
+    signal.disconnect(sub.on_signal, 'sender2')
+    self.assertEqual({}, signal._queues)
+    sub.gate.set()
+    queue.join(5)
+    self.assertFalse(queue._thread.is_alive())
+    # the item being processed when it was disconnected, not the queued ones
+    self.assertEqual([('sender', 0)], sub.calls)
+    self.assertEqual(4, queue.stats()['dropped'])
+
+  def test_worker_stops_with_its_signal(self):
+    signal = QueuedSignal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+    signal('sender', 1)
+    self.assertTrue(signal.join(5))
+    queue = list(signal._queues.values())[0]
+
+    del signal
+    gc.collect()
+    queue.join(5)
+    self.assertFalse(queue._thread.is_alive())
+
+  def test_context_manager(self):
+    sub = Subscriber()
+    with QueuedSignal() as signal:
+      signal.connect(sub.on_signal)
+      signal('sender', 1)
+      queue = list(signal._queues.values())[0]
+    self.assertFalse(queue._thread.is_alive())
+    self.assertEqual([('sender', 1)], sub.calls)
+
+  def test_block_slot_emitting_on_its_own_signal(self):
+    signal = self.make_signal(maxsize=1, policy='block')
+    calls = []
+    def on_signal(sender, data):
+      calls.append(data)
+      if data == 0:
+        # the second emit finds the queue full
+        signal(sender, 1)
+        signal(sender, 2)
+    signal.connect(on_signal)
+
+    signal('sender', 0)
+    self.assertTrue(signal.join(5))
+    self.assertEqual([0, 1], calls)
+    self.assertEqual(1, signal.queue_stats()[0]['dropped'])
+
+  def test_profiling(self):
+    signal = self.make_signal()
+    sub = Subscriber()
+    signal.connect(sub.on_signal)
+    profiler = signal.enable_profiling()
+    signal('sender', 1)
+    signal.emit_many('sender', [2, 3])
+    self.assertTrue(signal.join(5))
+
+    stats = profiler.stats()
+    self.assertEqual(1, len(stats))
+    self.assertTrue(stats[0]['slot'].endswith('Subscriber.on_signal'))
+    self.assertEqual(3, stats[0]['calls'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,135 @@
+import os
+import unittest
+import itertools
+import threading
+import multiprocessing
+
+from pyblinktrade import request_ids
+from pyblinktrade.request_ids import RequestIdAllocator
+from pyblinktrade.message_builder import MessageBuilder
+
+def allocate_default(_):
+  try:
+    return request_ids.next_request_id()
+  except RuntimeError as e:
+    return 'error: %s' % e
+
+def allocate_with_shard(shard):
+  request_ids.set_request_id_allocator(RequestIdAllocator(shard=shard))
+  return request_ids.next_request_id()
+
+class TestRequestIdAllocator(unittest.TestCase):
+  def test_monotonic_and_sharded(self):
+    allocator = RequestIdAllocator(shard=3, shard_bits=4)
+    ids = [allocator() for _ in range(100)]
+    self.assertEqual(sorted(set(ids)), ids)
+    self.assertTrue(all(req_id & 0xf == 3 for req_id in ids))
+
+    other = RequestIdAllocator(shard=4, shard_bits=4)
+    self.assertFalse(set(ids) & set(other() for _ in range(100)))
+
+  def test_threads(self):
+    allocator = RequestIdAllocator()
+    ids = []
+    def allocate():
+      ids.extend([allocator() for _ in range(1000)])
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(4000, len(set(ids)))
+
+  def fork(self, allocator, count=10):
+    """Returns the ids allocated by a forked child, or the error it got"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+      os.close(read_fd)
+      try:
+        result = ','.join(str(allocator()) for _ in range(count))
+      except RuntimeError as e:
+        result = 'error: %s' % e
+      os.write(write_fd, result.encode('ascii'))
+      os._exit(0)
+
+    os.close(write_fd)
+    data = os.read(read_fd, 4096).decode('ascii')
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    if data.startswith('error'):
+      return data
+    return [int(req_id) for req_id in data.split(',')]
+
+  @unittest.skipIf(not hasattr(os, 'fork'), 'needs fork')
+  def test_fork(self):
+    allocator = RequestIdAllocator()
+    parent_ids = [allocator() for _ in range(10)]
+    self.assertTrue(all(req_id & 0x3ff == 0 for req_id in parent_ids))
+
+    first_child = self.fork(allocator)
+    second_child = self.fork(allocator)
+    self.assertTrue(all(req_id & 0x3ff == 1 for req_id in first_child))
+    self.assertTrue(all(req_id & 0x3ff == 2 for req_id in second_child))
+    self.assertEqual(sorted(first_child), first_child)
+    self.assertEqual(30, len(set(parent_ids) | set(first_child) | set(second_child)))
+    self.assertEqual(0, allocator() & 0x3ff)
+
+  @unittest.skipIf(not hasattr(os, 'register_at_fork'), 'needs os.register_at_fork')
+  def test_fork_before_first_id(self):
+    allocator = RequestIdAllocator()
+    self.assertEqual(None, allocator._shared_shards)
+    self.assertTrue(all(req_id & 0x3ff == 1 for req_id in self.fork(allocator)))
+    self.assertEqual(0, allocator() & 0x3ff)
+    self.assertTrue(all(req_id & 0x3ff == 2 for req_id in self.fork(allocator)))
+
+  @unittest.skipIf(not hasattr(multiprocessing, 'get_all_start_methods'), 'needs start methods')
+  def test_not_forked(self):
+    for method in set(['spawn', 'forkserver']) & set(multiprocessing.get_all_start_methods()):
+      pool = multiprocessing.get_context(method).Pool(2)
+      try:
+        for result in pool.map(allocate_default, range(2)):
+          self.assertTrue('was not forked' in result, result)
+        self.assertEqual(1 << 10 | 7, pool.apply(allocate_with_shard, (7,)))
+      finally:
+        pool.terminate()
+        pool.join()
+
+  @unittest.skipIf(not hasattr(os, 'fork'), 'needs fork')
+  def test_fork_with_explicit_shard(self):
+    allocator = RequestIdAllocator(shard=3)
+    allocator()
+    self.assertTrue('belongs to process' in self.fork(allocator))
+
+  @unittest.skipIf(not hasattr(os, 'fork'), 'needs fork')
+  def test_out_of_shards(self):
+    allocator = RequestIdAllocator(shard_bits=1)
+    self.assertEqual(1, self.fork(allocator, 1)[0] & 1)
+    self.assertTrue('shards are taken' in self.fork(allocator, 1))
+
+  def test_wraps_before_max_request_id(self):
+    allocator = RequestIdAllocator(shard=5, max_request_id=2 ** 31 - 1)
+    allocator._counter = itertools.count(2 ** 21 - 2)
+    self.assertEqual(2 ** 31 - 1 - 1023 + 5, allocator())
+    self.assertEqual(1 << 10 | 5, allocator())
+
+    allocator = RequestIdAllocator(shard=1, shard_bits=2, max_request_id=15)
+    ids = [allocator() for _ in range(6)]
+    self.assertEqual([5, 9, 13, 5, 9, 13], ids)
+    self.assertRaises(ValueError, RequestIdAllocator, shard=4, shard_bits=2)
+    self.assertRaises(ValueError, RequestIdAllocator, shard_bits=4, max_request_id=15)
+
+  def test_message_builder(self):
+    previous = request_ids.set_request_id_allocator(RequestIdAllocator(shard=5))
+    try:
+      first = MessageBuilder.requestBalances()['BalanceReqID']
+      second = MessageBuilder.getDepositList(['0'])['DepositListReqID']
+      self.assertEqual(5, first & 0x3ff)
+      self.assertTrue(second > first)
+      self.assertEqual(7, MessageBuilder.requestBalances(7)['BalanceReqID'])
+    finally:
+      request_ids.set_request_id_allocator(previous)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,208 @@
+import os
+import time
+import errno
+import shutil
+import socket
+import logging
+import tempfile
+import unittest
+import threading
+
+from pyblinktrade.message import JsonMessage, InvalidMessageException
+from pyblinktrade.signals import Signal
+from pyblinktrade.signal_bridge import SignalBridgeServer, SignalBridgeClient
+
+class Subscriber(object):
+  def __init__(self):
+    self.calls = []
+    self.received = threading.Event()
+
+  def on_signal(self, sender, data):
+    self.calls.append((sender, data))
+    self.received.set()
+
+class StrictMessage(JsonMessage):
+  @classmethod
+  def from_dict(cls, message):
+    if message.get('Price', 0) > 1000:
+      raise InvalidMessageException(None, message, 'Price', message['Price'])
+    return super(StrictMessage, cls).from_dict(message)
+
+def wait_for(condition, timeout=5):
+  deadline = time.time() + timeout
+  while not condition():
+    if time.time() > deadline:
+      return False
+    time.sleep(0.005)
+  return True
+
+
+@unittest.skipIf(not hasattr(socket, 'AF_UNIX'), 'needs unix domain sockets')
+class TestSignalBridge(unittest.TestCase):
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'bridge.sock')
+    self.order_book = Signal()
+    self.ticker = Signal()
+    self.server = SignalBridgeServer(self.path, {'order_book': self.order_book, 'ticker': self.ticker})
+    self.clients = []
+
+  def tearDown(self):
+    for client in self.clients:
+      client.close()
+    self.server.close()
+    shutil.rmtree(self.dir)
+
+  def make_client(self, *names):
+    client = SignalBridgeClient(self.path, reconnect_interval=0.01)
+    self.clients.append(client)
+    subscriber = Subscriber()
+    for name in names:
+      client.signal(name).connect(subscriber.on_signal)
+    self.assertTrue(client.wait_connected(5))
+    return client, subscriber
+
+  def test_emits_reach_subscribers(self):
+    client1, sub1 = self.make_client('order_book')
+    client2, sub2 = self.make_client('order_book', 'ticker')
+
+    self.order_book('BTCUSD', {'bids': [[100.5, 1]], 'asks': []})
+    self.ticker('BTCUSD', 101)
+    self.assertTrue(wait_for(lambda: len(sub2.calls) == 2))
+    self.assertTrue(wait_for(lambda: len(sub1.calls) == 1))
+
+    self.assertEqual([('BTCUSD', {'bids': [[100.5, 1]], 'asks': []})], sub1.calls)
+    self.assertEqual(('BTCUSD', 101), sub2.calls[1])
+
+  def test_messages(self):
+    client, sub = self.make_client('order_book')
+    msg = JsonMessage('{"MsgType": "D", "ClOrdID": "1", "Symbol": "BTCUSD", "Side": "1", "OrdType": "2",'
+                      ' "Price": 100, "OrderQty": 1}')
+    self.order_book(None, msg)
+    self.assertTrue(sub.received.wait(5))
+
+    sender, data = sub.calls[0]
+    self.assertTrue(isinstance(data, JsonMessage))
+    self.assertEqual('D', data.type)
+    self.assertEqual(100, data.get('Price'))
+
+  def test_counts_invalid_messages(self):
+    client = SignalBridgeClient(self.path, reconnect_interval=0.01, message_class=StrictMessage)
+    self.clients.append(client)
+    sub = Subscriber()
+    client.connect(sub.on_signal, 'order_book')
+    self.assertTrue(client.wait_connected(5))
+
+    order = '{"MsgType": "D", "ClOrdID": "1", "Symbol": "BTCUSD", "Side": "1", "OrdType": "2", "OrderQty": 1, '
+    logging.disable(logging.WARNING)
+    try:
+      self.order_book(None, JsonMessage(order + '"Price": 5000}'))
+      self.order_book(None, JsonMessage(order + '"Price": 100}'))
+      self.assertTrue(sub.received.wait(5))
+    finally:
+      logging.disable(logging.NOTSET)
+    self.assertEqual(1, client.invalid_messages)
+    self.assertEqual([100], [data.get('Price') for _, data in sub.calls])
+
+  def test_close_while_connecting(self):
+    self.server.close()
+    client = SignalBridgeClient(self.path, reconnect_interval=0.01)
+    self.clients.append(client)
+    # the client connects but cannot publish its socket before close() runs
+    with client._lock:
+      self.server = SignalBridgeServer(self.path, {'ticker': self.ticker})
+      self.assertTrue(wait_for(lambda: self.server.client_count == 1))
+      client._closing.set()
+    client._thread.join(5)
+    self.assertFalse(client._thread.is_alive())
+    self.assertTrue(wait_for(lambda: self.server.client_count == 0))
+
+  def test_subscribe_after_connect(self):
+    client, sub = self.make_client()
+    client.connect(sub.on_signal, 'ticker')
+    self.assertTrue(wait_for(lambda: self.server.subscriber_count('ticker') == 1))
+
+    self.ticker('BTCUSD', 1)
+    self.assertTrue(sub.received.wait(5))
+    self.assertEqual([('BTCUSD', 1)], sub.calls)
+
+  def test_per_sender_and_disconnect(self):
+    client, sub = self.make_client()
+    client.connect(sub.on_signal, 'ticker', 'BTCBRL')
+    self.assertTrue(wait_for(lambda: self.server.subscriber_count('ticker') == 1))
+
+    self.ticker('BTCUSD', 1)
+    self.ticker('BTCBRL', 2)
+    self.assertTrue(sub.received.wait(5))
+    self.assertEqual([('BTCBRL', 2)], sub.calls)
+
+    client.disconnect(sub.on_signal, 'ticker', 'BTCBRL')
+    self.ticker('BTCBRL', 3)
+    time.sleep(0.05)
+    self.assertEqual([('BTCBRL', 2)], sub.calls)
+
+  def test_reconnects(self):
+    client, sub = self.make_client('ticker')
+    self.server.close()
+    self.assertTrue(wait_for(lambda: not client.connected.is_set()))
+
+    self.server = SignalBridgeServer(self.path, {'ticker': self.ticker})
+    self.assertTrue(client.wait_connected(5))
+    self.ticker('BTCUSD', 1)
+    self.assertTrue(sub.received.wait(5))
+    self.assertEqual([('BTCUSD', 1)], sub.calls)
+
+  def test_does_not_take_over_a_live_socket(self):
+    self.assertRaises(socket.error, SignalBridgeServer, self.path, {'ticker': self.ticker})
+    client, sub = self.make_client('ticker')
+    self.ticker('BTCUSD', 1)
+    self.assertTrue(sub.received.wait(5))
+
+  def test_replaces_a_stale_socket(self):
+    path = os.path.join(self.dir, 'stale.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    SignalBridgeServer(path, {}).close()
+    self.assertFalse(os.path.exists(path))
+
+    with open(path, 'w'):
+      pass
+    self.assertRaises(socket.error, SignalBridgeServer, path, {})
+    self.assertTrue(os.path.exists(path))
+
+  def test_accept_backs_off_and_stops_on_errors(self):
+    errors = [errno.EMFILE, errno.EMFILE, errno.ECONNABORTED, errno.EBADF]
+    calls = []
+    class FailingListener(object):
+      def accept(self):
+        calls.append(time.time())
+        error = errors.pop(0)
+        raise socket.error(error, os.strerror(error))
+
+    # a server without its accept thread
+    server = SignalBridgeServer.__new__(SignalBridgeServer)
+    server.path = self.path
+    server._closed = False
+    server._sock = FailingListener()
+    logging.disable(logging.CRITICAL)
+    try:
+      # returns on EBADF instead of spinning on it
+      server._accept()
+    finally:
+      logging.disable(logging.NOTSET)
+    self.assertEqual(4, len(calls))
+    self.assertTrue(calls[1] - calls[0] >= 0.01)
+    self.assertTrue(calls[2] - calls[1] >= 0.02)
+
+  def test_closed_clients_are_dropped(self):
+    client, sub = self.make_client('ticker')
+    self.assertEqual(1, self.server.client_count)
+    client.close()
+    self.clients.remove(client)
+    self.assertTrue(wait_for(lambda: self.server.client_count == 0))
+    self.assertFalse(self.ticker('BTCUSD', 1) and self.server.queue_stats())
+
+
+if __name__ == '__main__':
+  unittest.main()
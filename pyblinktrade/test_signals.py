@@ -1,11 +1,29 @@
 __author__ = 'rodrigo'
 
+import time
+import random
 import unittest
+import threading
 
-from signals import Signal
+import logging
+import contextlib
+
+from signals import Signal, SlotError, Future, batch_slot
+if Future is not None:
+  from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 signal_calls = []
 
+@contextlib.contextmanager
+def mock_logging():
+  messages = []
+  critical = logging.critical
+  logging.critical = lambda msg, *args: messages.append(msg % args)
+  try:
+    yield messages
+  finally:
+    logging.critical = critical
+
 def onSignalFunction(sender, data):
   signal_calls.append( ( 'function', sender, data   ) )
 
@@ -102,3 +120,410 @@ class TestSignal(unittest.TestCase):
 
     self.sig_method('sender2', 'data2')
     self.assertEqual(1, len(signal_calls))
+
+  def test_disconnect(self):
+    a = A()
+    self.sig_method.connect(a.onSignalMethod)
+    self.sig_method.connect(a.onSignalMethod, 'sender1')
+    self.sig_method.disconnect(a.onSignalMethod)
+    self.sig_method('sender2', 'data1')
+    self.assertEqual(0, len(signal_calls))
+
+    self.sig_method('sender1', 'data1')
+    self.assertEqual(1, len(signal_calls))
+    self.sig_method.disconnect(a.onSignalMethod, 'sender1')
+    self.sig_method('sender1', 'data1')
+    self.assertEqual(1, len(signal_calls))
+
+    self.sig_function.disconnect(onSignalFunction)
+    self.sig_function('sender1', 'data1')
+    self.assertEqual(1, len(signal_calls))
+
+  def test_connect_while_emitting(self):
+    def on_signal_func(sender, data):
+      signal_calls.append( ( 'function', sender, data   ) )
+      self.sig_function.disconnect(onSignalFunction)
+      self.sig_function.connect(on_signal_func)
+
+    self.sig_function.connect(on_signal_func)
+    self.sig_function('sender1', 'data1')
+    self.sig_function('sender1', 'data2')
+    self.assertEqual(['data1', 'data2'], [call[2] for call in signal_calls if call[0] == 'function'][-2:])
+
+  def test_signals_do_not_block_each_other(self):
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow_slot(sender, data):
+      entered.set()
+      release.wait(5)
+
+    slow_signal = Signal()
+    slow_signal.connect(slow_slot)
+    thread = threading.Thread(target=slow_signal, args=('sender1', 'data1'))
+    thread.start()
+    try:
+      self.assertTrue(entered.wait(5))
+      # a slot still running on another signal must not hold this emit back
+      self.sig_function('sender2', 'data2')
+      self.assertEqual(1, len(signal_calls))
+    finally:
+      release.set()
+      thread.join()
+
+def record_call(sender, data):
+  signal_calls.append( ( 'function', sender, data ) )
+
+def fail_on_odd(sender, data):
+  if data % 2:
+    raise ValueError('odd')
+
+@unittest.skipIf(Future is None, 'concurrent.futures is not available')
+class TestSignalExecutor(unittest.TestCase):
+  def setUp(self):
+    global signal_calls
+    signal_calls = []
+    self.errors = []
+    self.signal = Signal()
+    Signal.signal_error.connect(self.on_error)
+
+  def tearDown(self):
+    Signal.signal_error.disconnect(self.on_error)
+
+  def on_error(self, sender, error):
+    self.errors.append(str(error))
+
+  def test_without_executor(self):
+    self.signal.connect(record_call)
+    future = self.signal.submit('sender1', 'data1')
+    self.assertTrue(future.done())
+    self.assertEqual(1, len(signal_calls))
+
+  def test_in_order_per_sender(self):
+    def slot(sender, data):
+      time.sleep(random.random() / 1000)
+      signal_calls.append( ( 'function', sender, data ) )
+
+    executor = ThreadPoolExecutor(4)
+    signal = Signal(executor=executor)
+    signal.connect(slot)
+    futures = [signal.submit('sender%d' % (x % 3), x) for x in range(150)]
+    self.assertTrue(all(future.result(5) for future in futures))
+    executor.shutdown()
+
+    self.assertEqual(150, len(signal_calls))
+    for sender in ('sender0', 'sender1', 'sender2'):
+      data = [call[2] for call in signal_calls if call[1] == sender]
+      self.assertEqual(sorted(data), data)
+    self.assertEqual({}, signal._dispatch_queues)
+
+  def test_process_pool(self):
+    executor = ProcessPoolExecutor(1)
+    self.signal.connect(fail_on_odd)
+    futures = [self.signal.submit('sender1', x, executor=executor) for x in range(4)]
+    self.assertEqual([True, False, True, False], [future.result(30) for future in futures])
+    executor.shutdown()
+    self.assertEqual(2, len(self.errors))
+    self.assertTrue('ValueError' in self.errors[0])
+
+  def test_executor_errors_are_tracked_like_emits(self):
+    records = []
+    def on_slot_error(sender, error):
+      records.append(error)
+    Signal.slot_error.connect(on_slot_error)
+    executor = ThreadPoolExecutor(1)
+    try:
+      self.signal.max_consecutive_failures = 3
+      self.signal.error_traceback_limit = 1
+      profiler = self.signal.enable_profiling()
+      failing = Failing()
+      self.signal.connect(failing.onSignalMethod)
+      # the slots are looked up on submit, wait for each emit before the next
+      results = [self.signal.submit('sender1', x, executor=executor).result(5) for x in range(4)]
+      self.assertEqual([False] * 4, results)
+    finally:
+      executor.shutdown()
+      Signal.slot_error.disconnect(on_slot_error)
+
+    self.assertEqual(3, len(records))
+    self.assertTrue(records[0].slot_name.endswith('Failing.onSignalMethod'))
+    self.assertTrue('Traceback' in str(records[0]))
+    self.assertEqual('ValueError: failed with 1 (traceback not sampled)', str(records[1]).split('\n')[0])
+    self.assertEqual([False, False, True], [record.disconnected for record in records])
+    self.assertTrue(list(self.signal.slot_error_stats().values())[0]['disconnected'])
+    self.assertEqual([3], [stats['calls'] for stats in profiler.stats()])
+
+class TestSignalSlotsCache(unittest.TestCase):
+  def setUp(self):
+    global signal_calls
+    signal_calls = []
+    self.signal = Signal()
+
+  def test_sent(self):
+    self.assertFalse(self.signal('sender1', 'data1'))
+    a = A()
+    self.signal.connect(a.onSignalMethod, 'sender1')
+    self.assertFalse(self.signal('sender2', 'data1'))
+    self.assertTrue(self.signal('sender1', 'data1'))
+
+    def on_signal_error(sender, data):
+      raise ValueError()
+    self.signal.connect(on_signal_error)
+    self.assertFalse(self.signal('sender2', 'data1', False))
+    self.assertTrue(self.signal('sender1', 'data1', False))
+
+  def test_cache_is_rebuilt(self):
+    a = A()
+    self.signal.connect(a.onSignalMethod)
+    self.signal('sender1', 'data1')
+    cache = self.signal._slots_cache
+    self.signal('sender1', 'data2')
+    self.assertTrue(cache is self.signal._slots_cache)
+    self.assertEqual(2, len(signal_calls))
+
+    self.signal.connect(onSignalFunction)
+    self.assertTrue(self.signal._slots_cache is None)
+    self.signal('sender1', 'data3')
+    self.assertEqual(4, len(signal_calls))
+
+    self.signal.disconnect(onSignalFunction)
+    self.signal('sender1', 'data4')
+    self.assertEqual(5, len(signal_calls))
+
+    del a
+    self.assertTrue(self.signal._slots_cache is None)
+    self.signal('sender1', 'data5')
+    self.assertEqual(5, len(signal_calls))
+    self.assertEqual((), self.signal._slots_cache[0])
+
+  def test_dead_sender_subscriptions_are_dropped(self):
+    a = A()
+    self.signal.connect(a.onSignalMethod, 'sender1')
+    self.signal('sender1', 'data1')
+    del a
+    self.signal('sender1', 'data2')
+    self.assertEqual(1, len(signal_calls))
+    self.assertEqual({}, self.signal._methods_subs)
+
+class Failing(object):
+  def __init__(self):
+    self.fail = True
+
+  def onSignalMethod(self, sender, data):
+    if self.fail:
+      raise ValueError('failed with %s' % data)
+
+class TestSignalErrors(unittest.TestCase):
+  def setUp(self):
+    self.signal = Signal()
+    self.errors = []
+    Signal.slot_error.connect(self.on_error)
+
+  def tearDown(self):
+    Signal.slot_error.disconnect(self.on_error)
+
+  def on_error(self, sender, error):
+    self.errors.append(error)
+
+  def test_signal_error_gets_text(self):
+    texts = []
+    def on_signal_error(sender, text):
+      texts.append((sender, text))
+    Signal.signal_error.connect(on_signal_error)
+    try:
+      failing = Failing()
+      self.signal.connect(failing.onSignalMethod)
+      self.signal('sender1', 1)
+    finally:
+      Signal.signal_error.disconnect(on_signal_error)
+
+    self.assertEqual(1, len(texts))
+    self.assertTrue(texts[0][0] is self.signal)
+    self.assertTrue(isinstance(texts[0][1], str))
+    self.assertTrue(texts[0][1].startswith('Traceback'))
+    self.assertTrue('ValueError: failed with 1' in texts[0][1])
+    self.assertEqual(str(self.errors[0]), texts[0][1])
+
+  def test_error_record(self):
+    failing = Failing()
+    self.signal.connect(failing.onSignalMethod)
+    self.assertFalse(self.signal('sender1', 1))
+
+    self.assertEqual(1, len(self.errors))
+    error = self.errors[0]
+    self.assertTrue(isinstance(error, SlotError))
+    self.assertTrue(error.signal is self.signal)
+    self.assertEqual('sender1', error.sender)
+    self.assertTrue(error.exc_type is ValueError)
+    self.assertTrue(error.slot_name.endswith('Failing.onSignalMethod'))
+    self.assertTrue('ValueError: failed with 1' in error.traceback)
+    self.assertTrue('Traceback' in str(error))
+
+  def test_traceback_sampling(self):
+    self.signal.error_traceback_limit = 2
+    failing = Failing()
+    self.signal.connect(failing.onSignalMethod)
+    for x in range(5):
+      self.signal('sender1', x)
+
+    self.assertEqual(5, len(self.errors))
+    self.assertEqual([True, True, False, False, False], [error.traceback is not None for error in self.errors])
+    self.assertEqual('ValueError: failed with 4 (traceback not sampled)', str(self.errors[4]))
+
+    stats = self.signal.slot_error_stats()
+    self.assertEqual(1, len(stats))
+    slot_stats = list(stats.values())[0]
+    self.assertEqual(5, slot_stats['errors'])
+    self.assertEqual(5, slot_stats['consecutive_failures'])
+    self.assertEqual(5, slot_stats['window_errors'])
+    self.assertFalse(slot_stats['disconnected'])
+
+    failing.fail = False
+    self.assertTrue(self.signal('sender1', 5))
+    slot_stats = list(self.signal.slot_error_stats().values())[0]
+    self.assertEqual(5, slot_stats['errors'])
+    self.assertEqual(0, slot_stats['consecutive_failures'])
+
+  def test_circuit_breaker(self):
+    self.signal.max_consecutive_failures = 3
+    failing = Failing()
+    other = Failing()
+    other.fail = False
+    self.signal.connect(failing.onSignalMethod, 'sender1')
+    self.signal.connect(other.onSignalMethod)
+
+    for x in range(2):
+      self.signal('sender1', x)
+    failing.fail = False
+    self.signal('sender1', 2)
+    failing.fail = True
+    for x in range(3):
+      self.signal('sender1', x)
+    self.assertEqual(5, len(self.errors))
+    self.assertEqual([False] * 4 + [True], [error.disconnected for error in self.errors])
+    self.assertTrue('was disconnected' in str(self.errors[-1]))
+
+    self.assertTrue(self.signal('sender1', 3))
+    self.assertEqual(5, len(self.errors))
+    self.assertTrue(list(self.signal.slot_error_stats().values())[0]['disconnected'])
+
+  def test_log_without_error_signal(self):
+    failing = Failing()
+    self.signal.connect(failing.onSignalMethod)
+    with mock_logging() as messages:
+      self.signal('sender1', 1, False)
+    self.assertEqual([], self.errors)
+    self.assertEqual(1, len(messages))
+    self.assertTrue('failed with 1' in messages[0])
+
+class BatchSubscriber(object):
+  def __init__(self):
+    self.calls = []
+
+  @batch_slot
+  def on_batch(self, sender, items):
+    self.calls.append((sender, items))
+
+  def on_item(self, sender, item):
+    if item == 'bad':
+      raise ValueError(item)
+    self.calls.append((sender, item))
+
+class TestSignalEmitMany(unittest.TestCase):
+  def setUp(self):
+    self.signal = Signal()
+
+  def test_emit_many(self):
+    subscriber = BatchSubscriber()
+    batches = []
+    @batch_slot
+    def on_batch(sender, items):
+      batches.append((sender, items))
+
+    self.signal.connect(subscriber.on_batch)
+    self.signal.connect(subscriber.on_item, 'sender1')
+    self.signal.connect(on_batch)
+
+    items = ['a', 'b', 'c']
+    self.assertTrue(self.signal.emit_many('sender1', items))
+    self.assertEqual([('sender1', items), ('sender1', 'a'), ('sender1', 'b'), ('sender1', 'c')],
+                     subscriber.calls)
+    self.assertEqual([('sender1', items)], batches)
+
+    del subscriber.calls[:]
+    self.signal.emit_many('sender2', items)
+    self.assertEqual([('sender2', items)], subscriber.calls)
+
+  def test_errors_do_not_stop_the_batch(self):
+    subscriber = BatchSubscriber()
+    self.signal.connect(subscriber.on_item)
+    with mock_logging() as messages:
+      self.assertTrue(self.signal.emit_many('sender1', ['a', 'bad', 'c'], False))
+    self.assertEqual([('sender1', 'a'), ('sender1', 'c')], subscriber.calls)
+    self.assertEqual(1, len(messages))
+
+  def test_empty(self):
+    subscriber = BatchSubscriber()
+    self.signal.connect(subscriber.on_item)
+    self.assertFalse(self.signal.emit_many('sender1', []))
+
+class SlowSubscriber(object):
+  def __init__(self, delay):
+    self.delay = delay
+
+  def onSignalMethod(self, sender, data):
+    time.sleep(self.delay)
+
+class TestSignalProfiling(unittest.TestCase):
+  def setUp(self):
+    global signal_calls
+    signal_calls = []
+    self.signal = Signal()
+
+  def test_disabled(self):
+    self.signal.connect(onSignalFunction)
+    self.signal('sender1', 'data1')
+    self.assertEqual([], self.signal.top_slow_slots())
+
+  def test_top_slow_slots(self):
+    slow = SlowSubscriber(0.02)
+    self.signal.connect(onSignalFunction)
+    self.signal.connect(slow.onSignalMethod, 'sender2')
+    profiler = self.signal.enable_profiling()
+
+    self.signal('sender1', 'data1')
+    self.signal('sender1', 'data2')
+    self.signal('sender2', 'data3')
+    self.assertEqual(3, len(signal_calls))
+
+    top = self.signal.top_slow_slots(2)
+    self.assertEqual(2, len(top))
+    self.assertTrue(top[0]['slot'].endswith('SlowSubscriber.onSignalMethod'))
+    self.assertEqual('sender2', top[0]['sender'])
+    self.assertTrue(top[0]['max_time'] >= 0.02)
+    self.assertTrue(top[1]['slot'].endswith('onSignalFunction'))
+    self.assertEqual(2, dict(((p['slot'].split('.')[-1], p['sender']), p['calls'])
+                             for p in profiler.stats())[('onSignalFunction', 'sender1')])
+    self.assertEqual('onSignalFunction', self.signal.top_slow_slots(1, 'calls')[0]['slot'].split('.')[-1])
+
+    self.signal.disable_profiling()
+    self.signal('sender1', 'data4')
+    self.assertEqual(4, len(signal_calls))
+    # onSignalFunction on both senders and SlowSubscriber.onSignalMethod
+    self.assertEqual(3, len(profiler.stats()))
+
+  def test_latency_budget(self):
+    slow_slots = []
+    def on_slow_slot(signal, info):
+      slow_slots.append(info)
+
+    slow = SlowSubscriber(0.02)
+    self.signal.connect(onSignalFunction)
+    self.signal.connect(slow.onSignalMethod)
+    self.signal.enable_profiling(latency_budget=0.01, on_slow_slot=on_slow_slot)
+    self.signal.emit_many('sender1', ['data1', 'data2'])
+
+    self.assertEqual(2, len(slow_slots))
+    self.assertTrue(slow_slots[0]['slot'].endswith('SlowSubscriber.onSignalMethod'))
+    self.assertEqual(0.01, slow_slots[0]['budget'])
+    self.assertEqual(2, len(signal_calls))
@@ -0,0 +1,100 @@
+import json
+import unittest
+
+from pyblinktrade.message import JsonMessage, register_message_type, unregister_message_type, \
+  InvalidMessageFieldException, InvalidMessageTypeException
+from pyblinktrade.typed_messages import NewOrderSingle, ExecutionReport, OrderCancelRequest, \
+  MarketDataIncrementalRefresh, TypedMessage, typed_message_class, to_typed_message, parse_typed_message
+
+
+NEW_ORDER_SINGLE = {
+  'MsgType': 'D',
+  'ClOrdID': '1234',
+  'Symbol': 'BTCUSD',
+  'Side': '1',
+  'OrdType': '2',
+  'Price': 4000000000000,
+  'OrderQty': 50000000,
+  'SessionTag': 'abc'
+}
+
+class TestTypedMessages(unittest.TestCase):
+  def test_generated_classes(self):
+    self.assertEqual('D', NewOrderSingle.type)
+    self.assertEqual('8', ExecutionReport.type)
+    self.assertEqual('F', OrderCancelRequest.type)
+    self.assertEqual('X', MarketDataIncrementalRefresh.type)
+    self.assertTrue(issubclass(NewOrderSingle, TypedMessage))
+    self.assertTrue('Price' in NewOrderSingle.__slots__)
+    self.assertTrue(typed_message_class('D') is NewOrderSingle)
+
+  def test_parse(self):
+    msg = parse_typed_message(json.dumps(NEW_ORDER_SINGLE))
+    self.assertTrue(isinstance(msg, NewOrderSingle))
+    self.assertFalse(hasattr(msg, '__dict__'))
+    self.assertTrue(msg.isNewOrderSingle())
+    self.assertFalse(msg.isExecutionReport())
+
+    self.assertEqual(4000000000000, msg.Price)
+    self.assertEqual(4000000000000, msg.get('Price'))
+    self.assertEqual(4000000000000, msg['Price'])
+    self.assertTrue(msg.has('Symbol'))
+    self.assertTrue('SessionTag' in msg)
+    self.assertEqual('abc', msg['SessionTag'])
+
+    self.assertFalse(msg.has('StopPx'))
+    self.assertEqual(None, msg.get('StopPx'))
+    self.assertEqual(1, msg.get('Unknown', 1))
+    self.assertRaises(KeyError, lambda: msg['StopPx'])
+
+    self.assertEqual(NEW_ORDER_SINGLE, json.loads(msg.raw_message))
+
+  def test_parse_validates(self):
+    self.assertRaises(InvalidMessageFieldException, parse_typed_message,
+                      json.dumps(dict(NEW_ORDER_SINGLE, OrderQty=0)))
+    self.assertRaises(InvalidMessageTypeException, parse_typed_message, '{"MsgType": "ZZZ"}')
+    self.assertRaises(InvalidMessageFieldException, to_typed_message, dict(NEW_ORDER_SINGLE, Side='5'))
+
+  def test_not_a_message_object(self):
+    for raw in ('5', '[]', 'null', '"D"', '{"MsgType": [1]}', '{"MsgType": {"D": 1}}', '{"Symbol": "BTCUSD"}'):
+      self.assertRaises(InvalidMessageTypeException, parse_typed_message, raw)
+    for message in ({'MsgType': [1]}, {'MsgType': None}, {'Symbol': 'BTCUSD'}, [], 5):
+      self.assertRaises(InvalidMessageTypeException, to_typed_message, message)
+
+    message = dict(NEW_ORDER_SINGLE)
+    self.assertEqual('1234', to_typed_message(message).ClOrdID)
+    self.assertEqual(NEW_ORDER_SINGLE, message)
+
+  def test_json_message_round_trip(self):
+    json_message = JsonMessage(json.dumps(NEW_ORDER_SINGLE))
+    msg = to_typed_message(json_message)
+    self.assertEqual(json_message.message, msg.toJSON())
+
+    msg.set('BrokerID', 5)
+    json_message = msg.to_json_message()
+    self.assertEqual('D', json_message.type)
+    self.assertEqual(5, json_message.get('BrokerID'))
+
+  def test_execution_report(self):
+    msg = ExecutionReport(OrderID=1, ExecID=2, OrdStatus='0', Symbol='BTCUSD')
+    self.assertEqual('0', msg.OrdStatus)
+    self.assertEqual(None, msg._extra)
+    self.assertEqual({'OrderID': 1, 'ExecID': 2, 'OrdStatus': '0', 'Symbol': 'BTCUSD'}, msg.toJSON())
+
+  def test_registered_message_type(self):
+    register_message_type('Z910', 'PrivateOrderTag', [
+      ('required', 'TagReqID'),
+      ('int', 'TagReqID'),
+    ])
+    self.addCleanup(unregister_message_type, 'Z910')
+    msg = parse_typed_message('{"MsgType": "Z910", "TagReqID": 1}')
+    self.assertEqual('PrivateOrderTag', msg.__class__.__name__)
+    self.assertEqual(1, msg.TagReqID)
+    self.assertTrue(msg.isPrivateOrderTag())
+
+  def test_unregistered_message_type(self):
+    register_message_type('Z911', 'PrivateUnregistered', [('required', 'TagReqID')])
+    self.assertEqual('PrivateUnregistered', typed_message_class('Z911').__name__)
+    unregister_message_type('Z911')
+    self.assertRaises(InvalidMessageTypeException, typed_message_class, 'Z911')
+    self.assertFalse(hasattr(TypedMessage, 'isPrivateUnregistered'))
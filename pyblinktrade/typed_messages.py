@@ -0,0 +1,192 @@
+import re
+
+from pyblinktrade import json_backend
+from pyblinktrade.message import MESSAGE_TYPES, MESSAGE_SCHEMAS, JsonMessage, InvalidMessageTypeException, \
+  InvalidMessageLengthException, schema_tags, validate_message, _make_message_type_predicate, _pop_message_type
+
+# Well known tags of messages which have no (or a partial) schema. Tags which
+# are not listed here or in the schema are kept in a per message dict.
+MESSAGE_FIELDS = {
+  'D': ('ClOrdID', 'Symbol', 'Side', 'OrdType', 'Price', 'StopPx', 'OrderQty', 'PegPriceType', 'TimeInForce',
+        'BrokerID', 'ClientID'),
+  'F': ('ClOrdID', 'OrigClOrdID', 'OrderID', 'Side', 'Symbol', 'ClientID'),
+  '8': ('OrderID', 'ExecID', 'ExecType', 'OrdStatus', 'CumQty', 'LeavesQty', 'CxlQty', 'LastShares', 'LastPx',
+        'AvgPx', 'Price', 'StopPx', 'OrderQty', 'ClOrdID', 'Symbol', 'Side', 'OrdType', 'TimeInForce', 'Volume',
+        'OrderDate', 'ExecSide', 'OrdRejReason', 'Text', 'UserID', 'BrokerID'),
+  'X': ('MDReqID', 'MDBkTyp', 'MDIncGrp'),
+  'W': ('MDReqID', 'Symbol', 'MarketDepth', 'MDFullGrp'),
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class TypedMessage(object):
+  """
+  Base class of the generated per MsgType classes. Known tags are stored in
+  __slots__, any other tag goes to a dict which is only created when needed.
+  """
+  __slots__ = ('_extra',)
+
+  type = None
+  FIELDS = ()
+  _FIELD_SET = frozenset()
+
+  def __init__(self, **fields):
+    self._extra = None
+    for tag, value in fields.items():
+      self.set(tag, value)
+
+  @classmethod
+  def from_dict(cls, message, validate=True):
+    if validate:
+      validate_message(cls.type, message)
+
+    typed_message = cls.__new__(cls)
+    typed_message._extra = None
+    field_set = cls._FIELD_SET
+    for tag, value in message.items():
+      if tag in field_set:
+        setattr(typed_message, tag, value)
+      elif tag != 'MsgType':
+        if typed_message._extra is None:
+          typed_message._extra = {}
+        typed_message._extra[tag] = value
+    return typed_message
+
+  def has(self, attr):
+    if attr in self._FIELD_SET:
+      return hasattr(self, attr)
+    return self._extra is not None and attr in self._extra
+
+  def get(self, attr, default=None):
+    if attr in self._FIELD_SET:
+      return getattr(self, attr, default)
+    if self._extra is None:
+      return default
+    return self._extra.get(attr, default)
+
+  def set(self, attr, value):
+    if attr in self._FIELD_SET:
+      setattr(self, attr, value)
+    else:
+      if self._extra is None:
+        self._extra = {}
+      self._extra[attr] = value
+    return self
+
+  def update(self, fields):
+    for tag, value in fields.items():
+      self.set(tag, value)
+    return self
+
+  def is_valid(self):
+    return True
+
+  def __contains__(self, attr):
+    return self.has(attr)
+
+  def __getitem__(self, attr):
+    if not self.has(attr):
+      raise KeyError(attr)
+    return self.get(attr)
+
+  def __setitem__(self, attr, value):
+    return self.set(attr, value)
+
+  def toJSON(self):
+    message = {}
+    for tag in self.FIELDS:
+      if hasattr(self, tag):
+        message[tag] = getattr(self, tag)
+    if self._extra:
+      message.update(self._extra)
+    return message
+
+  @property
+  def message(self):
+    return self.toJSON()
+
+  @property
+  def raw_message(self):
+    return json_backend.dumps(dict(self.toJSON(), MsgType=self.type))
+
+  def to_json_message(self):
+    return JsonMessage.from_dict(dict(self.toJSON(), MsgType=self.type))
+
+  def __str__(self):
+    return str(self.toJSON())
+
+  def __repr__(self):
+    return '%s(%s)' % (self.__class__.__name__, self.toJSON())
+
+
+def _message_fields(msg_type):
+  fields = list(MESSAGE_FIELDS.get(msg_type, ()))
+  for tag in schema_tags(MESSAGE_SCHEMAS.get(msg_type, ())):
+    if tag not in fields:
+      fields.append(tag)
+  return tuple(tag for tag in fields if _IDENTIFIER.match(tag) and not hasattr(TypedMessage, tag))
+
+# 'is' + name -> MsgType of the predicates installed on TypedMessage
+_installed_predicates = {}
+
+def _install_message_type_predicates():
+  for attr, msg_type in list(_installed_predicates.items()):
+    if 'is' + MESSAGE_TYPES.get(msg_type, '') != attr:
+      delattr(TypedMessage, attr)
+      del _installed_predicates[attr]
+  for msg_type, name in MESSAGE_TYPES.items():
+    if not hasattr(TypedMessage, 'is' + name):
+      setattr(TypedMessage, 'is' + name, _make_message_type_predicate(msg_type))
+      _installed_predicates['is' + name] = msg_type
+
+def _make_typed_message_class(msg_type, name):
+  fields = _message_fields(msg_type)
+  return type(str(name), (TypedMessage,), {
+    '__slots__': fields,
+    'type': msg_type,
+    'FIELDS': fields,
+    '_FIELD_SET': frozenset(fields),
+  })
+
+_typed_message_classes = {}
+
+def typed_message_class(msg_type):
+  """Returns the generated class for a MsgType, including ones registered after import"""
+  cls = _typed_message_classes.get(msg_type)
+  if cls is not None and MESSAGE_TYPES.get(msg_type) != cls.__name__:
+    # unregistered (and maybe registered again) since the class was made
+    del _typed_message_classes[msg_type]
+    _install_message_type_predicates()
+    cls = None
+  if cls is None:
+    if msg_type not in MESSAGE_TYPES:
+      raise InvalidMessageTypeException(None, None, msg_type)
+    cls = _make_typed_message_class(msg_type, MESSAGE_TYPES[msg_type])
+    _typed_message_classes[msg_type] = cls
+    _install_message_type_predicates()
+  return cls
+
+def to_typed_message(message):
+  """Converts a JsonMessage or a decoded message with a MsgType to its typed class"""
+  if isinstance(message, JsonMessage):
+    return typed_message_class(message.type).from_dict(message.message, validate=False)
+
+  if isinstance(message, dict):
+    message = dict(message)
+  msg_type = _pop_message_type(None, message)
+  return typed_message_class(msg_type).from_dict(message)
+
+def parse_typed_message(raw_message):
+  if len(raw_message) > JsonMessage.MAX_MESSAGE_LENGTH:
+    raise InvalidMessageLengthException(raw_message)
+
+  message = json_backend.loads(raw_message)
+  msg_type = _pop_message_type(raw_message, message)
+  validate_message(msg_type, message, raw_message)
+  return typed_message_class(msg_type).from_dict(message, validate=False)
+
+
+for _msg_type, _name in MESSAGE_TYPES.items():
+  globals()[_name] = typed_message_class(_msg_type)
+del _msg_type, _name
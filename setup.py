@@ -9,6 +9,7 @@ setup(
   version=version,
   packages = [
     "pyblinktrade",
+    "pyblinktrade.bench",
   ],
   author="Rodrigo Souza",
   install_requires=[],